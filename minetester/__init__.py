@@ -3,6 +3,8 @@
 import gymnasium as gym
 
 from minetester.minetest_env import Minetest  # noqa: F401
+from minetester.multi_agent_env import MinetestMultiAgentEnv  # noqa: F401
+from minetester.vector_env import MinetestVectorEnv  # noqa: F401
 
 gym.register(
     id="Minetest-v0",
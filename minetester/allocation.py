@@ -0,0 +1,181 @@
+"""Allocation of ports and X displays shared by many environments."""
+import fcntl
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from minetester.utils import find_free_port, start_xserver
+
+
+class PortAllocator:
+    """Hands out free ports without collisions between environments.
+
+    Ports are picked by the operating system by binding to port 0.
+    Since the port is released again before Minetest binds it, each
+    allocated port is additionally reserved by an exclusive lock on a file in
+    `lock_dir` until it is released. Other processes on the same machine
+    skip reserved ports. Locks are released automatically if the process exits.
+    """
+
+    def __init__(self, lock_dir: Optional[os.PathLike] = None, max_attempts: int = 100):
+        """Initialize port allocator.
+
+        Args:
+            lock_dir: Directory of the lock files shared by all processes.
+                Defaults to `minetester-ports` in the temporary directory.
+            max_attempts: Number of ports tried before giving up.
+        """
+        self.lock_dir = lock_dir or os.path.join(
+            tempfile.gettempdir(),
+            "minetester-ports",
+        )
+        self.max_attempts = max_attempts
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self._locks: Dict[int, int] = {}  # port -> file descriptor of its lock
+        self._mutex = threading.Lock()
+
+    def allocate(self, udp: bool = False) -> int:
+        """Reserve a free port.
+
+        Args:
+            udp: Whether to look for a free UDP instead of TCP port.
+
+        Returns:
+            The port number.
+
+        Raises:
+            RuntimeError: if no free port was found.
+        """
+        for _ in range(self.max_attempts):
+            port = find_free_port(udp=udp)
+            with self._mutex:
+                if port in self._locks:
+                    continue
+                lock_path = os.path.join(self.lock_dir, f"{port}.lock")
+                fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o666)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # reserved by another process
+                    os.close(fd)
+                    continue
+                self._locks[port] = fd
+                return port
+        raise RuntimeError(f"No free port found in {self.max_attempts} attempts!")
+
+    def release(self, port: int):
+        """Release the reservation of a port.
+
+        Args:
+            port: Port returned by `allocate`.
+        """
+        with self._mutex:
+            fd = self._locks.pop(port, None)
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+# Allocator shared by all environments of this process
+_port_allocator = None
+
+
+def allocate_port(udp: bool = False) -> int:
+    """Reserve a free port with the allocator of this process.
+
+    Args:
+        udp: Whether to look for a free UDP instead of TCP port.
+
+    Returns:
+        The reserved port.
+    """
+    global _port_allocator
+    if _port_allocator is None:
+        _port_allocator = PortAllocator()
+    return _port_allocator.allocate(udp=udp)
+
+
+def release_port(port: int):
+    """Release a port reserved by `allocate_port`.
+
+    Args:
+        port: The reserved port.
+    """
+    if _port_allocator is not None:
+        _port_allocator.release(port)
+
+
+class SharedXServer:
+    """Xvfb server with one screen per environment.
+
+    Starting a single X server with many screens is much faster than starting
+    one server per environment. The display number is picked by Xvfb itself,
+    so that concurrently started servers never collide.
+    """
+
+    def __init__(
+        self,
+        num_screens: int,
+        display_size: Tuple[int, int] = (1024, 600),
+        display_depth: int = 24,
+    ):
+        """Start the X server.
+
+        Args:
+            num_screens: Number of screens.
+            display_size: Size of each screen.
+            display_depth: Depth of each screen.
+        """
+        self.num_screens = num_screens
+        self.process = start_xserver(
+            None,
+            display_size,
+            display_depth,
+            num_screens=num_screens,
+        )
+        self.display_idx = self.process.display_idx
+        self._free_screens: List[int] = list(range(num_screens))
+        self._mutex = threading.Lock()
+        logging.info(
+            f"Started Xvfb server :{self.display_idx} with {num_screens} screens",
+        )
+
+    def acquire_screen(self) -> str:
+        """Reserve a screen.
+
+        Returns:
+            The display and screen number, e.g. `7.3`, i.e. the value of the
+            DISPLAY variable without colon.
+
+        Raises:
+            RuntimeError: if all screens are in use.
+        """
+        with self._mutex:
+            if not self._free_screens:
+                raise RuntimeError(
+                    f"All {self.num_screens} screens of the X server are in use!",
+                )
+            screen = self._free_screens.pop(0)
+        return f"{self.display_idx}.{screen}"
+
+    def release_screen(self, display: str):
+        """Release a screen reserved by `acquire_screen`.
+
+        Args:
+            display: Display string returned by `acquire_screen`.
+        """
+        screen = int(str(display).split(".")[1])
+        with self._mutex:
+            if screen not in self._free_screens:
+                self._free_screens.append(screen)
+
+    def close(self):
+        """Terminate the X server."""
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
@@ -0,0 +1,14 @@
+"""Reproducible throughput benchmarks of Minetest environments.
+
+Run `python -m minetester.benchmarks --help` for the command line interface.
+"""
+from minetester.benchmarks.suite import (  # noqa: F401
+    DEFAULT_CONFIG,
+    METRICS,
+    compare_reports,
+    config_to_env_kwargs,
+    expand_grid,
+    get_metadata,
+    run_benchmark,
+    run_suite,
+)
@@ -0,0 +1,154 @@
+"""Command line interface of the Minetest benchmarks.
+
+Examples:
+    Sweep display sizes and the number of parallel environments::
+
+        python -m minetester.benchmarks run --display-size 128x128 1024x600 \
+            --num-envs 1 4 --output results.json
+
+    Check a new report for regressions of more than 10%::
+
+        python -m minetester.benchmarks compare baseline.json results.json
+"""
+import argparse
+import json
+import logging
+import sys
+from typing import Tuple
+
+from minetester.benchmarks.suite import (
+    DISPLAYS,
+    SYNC_MODES,
+    TRANSPORTS,
+    compare_reports,
+    expand_grid,
+    run_suite,
+)
+
+
+def _display_size(value: str) -> Tuple[int, int]:
+    try:
+        width, height = value.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected WIDTHxHEIGHT, got '{value}'")
+
+
+def _run(args: argparse.Namespace) -> int:
+    configs = expand_grid(
+        display_size=args.display_size,
+        display=args.display,
+        sync=args.sync,
+        dtime=args.dtime,
+        num_envs=args.num_envs,
+        transport=args.transport,
+    )
+    env_kwargs = {}
+    if args.minetest_root:
+        env_kwargs["minetest_root"] = args.minetest_root
+    report = run_suite(
+        configs,
+        output_path=args.output,
+        steps=args.steps,
+        warmup_steps=args.warmup_steps,
+        resets=args.resets,
+        seed=args.seed,
+        env_port=args.env_port,
+        server_port=args.server_port,
+        env_kwargs=env_kwargs,
+    )
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return int(any("error" in result for result in report["results"]))
+
+
+def _compare(args: argparse.Namespace) -> int:
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    regressions = compare_reports(baseline, current, args.threshold)
+    json.dump(regressions, sys.stdout, indent=2)
+    print()
+    return int(bool(regressions))
+
+
+def main(argv=None) -> int:
+    """Run the benchmark command line interface.
+
+    Args:
+        argv: Command line arguments, defaults to `sys.argv`.
+
+    Returns:
+        Exit code, 1 if a benchmark failed or a regression was found.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m minetester.benchmarks",
+        description="Benchmark the throughput of Minetest environments.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run",
+        help="Run all combinations of the given parameters.",
+    )
+    run_parser.add_argument(
+        "--display-size",
+        type=_display_size,
+        nargs="+",
+        default=[(1024, 600)],
+        help="Display sizes as WIDTHxHEIGHT.",
+    )
+    run_parser.add_argument(
+        "--display",
+        choices=DISPLAYS,
+        nargs="+",
+        default=["headless"],
+        help="Run the headless client or a client on an Xvfb display.",
+    )
+    run_parser.add_argument("--sync", choices=SYNC_MODES, nargs="+", default=["async"])
+    run_parser.add_argument("--dtime", type=float, nargs="+", default=[0.05])
+    run_parser.add_argument("--num-envs", type=int, nargs="+", default=[1])
+    run_parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        nargs="+",
+        default=["raw"],
+        help="Shared memory ('shm') or codec of observations sent over ZMQ.",
+    )
+    run_parser.add_argument("--steps", type=int, default=1000)
+    run_parser.add_argument("--warmup-steps", type=int, default=50)
+    run_parser.add_argument("--resets", type=int, default=3)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--env-port", type=int, default=0)
+    run_parser.add_argument("--server-port", type=int, default=0)
+    run_parser.add_argument("--minetest-root", default=None)
+    run_parser.add_argument(
+        "--output",
+        default=None,
+        help="Path of the JSON report, printed to stdout if not set.",
+    )
+    run_parser.set_defaults(func=_run)
+
+    compare_parser = subparsers.add_parser(
+        "compare",
+        help="Report metrics that regressed between two JSON reports.",
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change above which a metric counts as regression.",
+    )
+    compare_parser.set_defaults(func=_compare)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+"""Throughput benchmarks of Minetest environments across configurations."""
+import datetime
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from minetester.minetest_env import Minetest
+from minetester.vector_env import MinetestVectorEnv
+
+# Parameters that can be swept and their default values
+DEFAULT_CONFIG = {
+    "display_size": (1024, 600),
+    "display": "headless",
+    "sync": "async",
+    "dtime": 0.05,
+    "num_envs": 1,
+    "transport": "raw",
+}
+DISPLAYS = ["headless", "xvfb"]
+SYNC_MODES = ["async", "sync", "in_process"]
+TRANSPORTS = ["raw", "shm", "zlib", "zstd", "jpeg", "png"]
+
+# Whether larger values of a metric are better, used to detect regressions
+METRICS = {
+    "steps_per_sec": True,
+    "step_latency_p50_ms": False,
+    "step_latency_p99_ms": False,
+    "launch_latency_s": False,
+    "reset_latency_s": False,
+    "rss_per_env_mb": False,
+    "cpu_per_step_ms": False,
+}
+
+
+def expand_grid(**params: Iterable[Any]) -> List[Dict[str, Any]]:
+    """Build the configurations of all combinations of the swept parameters.
+
+    Args:
+        params: Values of each parameter of `DEFAULT_CONFIG`.
+            Parameters that are not given keep their default value.
+
+    Returns:
+        List of benchmark configurations.
+
+    Raises:
+        ValueError: If a parameter is not part of `DEFAULT_CONFIG`.
+    """
+    unknown = set(params) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown benchmark parameters: {sorted(unknown)}")
+    keys = list(DEFAULT_CONFIG)
+    values = [list(params.get(key, [DEFAULT_CONFIG[key]])) for key in keys]
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def config_to_env_kwargs(
+    config: Dict[str, Any],
+    env_kwargs: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Translate a benchmark configuration into `Minetest` keyword arguments.
+
+    Args:
+        config: Benchmark configuration, see `DEFAULT_CONFIG`.
+        env_kwargs: Additional keyword arguments shared by all environments.
+
+    Returns:
+        Keyword arguments of each environment.
+
+    Raises:
+        ValueError: If the display, sync mode or transport is unknown.
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    if config["display"] not in DISPLAYS:
+        raise ValueError(f"Unknown display '{config['display']}', use {DISPLAYS}")
+    if config["sync"] not in SYNC_MODES:
+        raise ValueError(f"Unknown sync mode '{config['sync']}', use {SYNC_MODES}")
+    if config["transport"] not in TRANSPORTS:
+        raise ValueError(
+            f"Unknown transport '{config['transport']}', use {TRANSPORTS}",
+        )
+    kwargs = {
+        **(env_kwargs or {}),
+        "display_size": tuple(config["display_size"]),
+        "dtime": config["dtime"],
+        "headless": config["display"] == "headless",
+        "start_xvfb": config["display"] == "xvfb",
+    }
+    if config["transport"] == "shm":
+        kwargs["shared_memory"] = True
+    else:
+        kwargs["obs_codec"] = config["transport"]
+    if config["sync"] == "in_process":
+        kwargs["in_process_server"] = True
+
+    if config["sync"] == "sync":
+        # every client / server pair allocates its own synchronization port
+        kwargs["sync_port"] = 0
+        kwargs["sync_dtime"] = config["dtime"]
+    return [dict(kwargs) for _ in range(config["num_envs"])]
+
+
+def _proc_cpu_time(pid: int) -> Optional[float]:
+    # User and system CPU time in seconds of a process, None if not available
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # the command name may contain spaces and ends with ')'
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _proc_rss(pid: int) -> Optional[int]:
+    # Resident set size in bytes of a process, None if not available
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _minetest_pids(env: Minetest) -> List[int]:
+    # Processes launched by an environment
+    processes = [env.client_process, env.server_process, env.xserver_process]
+    return [process.pid for process in processes if process is not None]
+
+
+def _cpu_time(pids: Iterable[int]) -> Dict[int, float]:
+    # CPU time of this process (key 0) and the given processes
+    times = {0: time.process_time()}
+    for pid in pids:
+        cpu_time = _proc_cpu_time(pid)
+        if cpu_time is not None:
+            times[pid] = cpu_time
+    return times
+
+
+def run_benchmark(
+    config: Dict[str, Any],
+    steps: int = 1000,
+    warmup_steps: int = 50,
+    resets: int = 3,
+    seed: int = 0,
+    env_port: int = 0,
+    server_port: int = 0,
+    env_kwargs: Optional[Dict[str, Any]] = None,
+) -> Dict[str, float]:
+    """Measure the throughput of an environment configuration.
+
+    Steps random actions and records the latency of each step. The first reset
+    includes launching Minetest and is reported as launch latency.
+    Single environments are stepped with `Minetest`, several environments
+    with `MinetestVectorEnv`.
+
+    Args:
+        config: Benchmark configuration, see `DEFAULT_CONFIG`.
+        steps: Number of measured steps.
+        warmup_steps: Number of steps before the measurement starts.
+        resets: Number of measured resets after stepping.
+        seed: Seed of the (first) environment.
+        env_port: Port of the (first) environment. Allocated if 0.
+        server_port: Server port of the (first) environment. Allocated if 0.
+        env_kwargs: Additional keyword arguments of the environments.
+
+    Returns:
+        Dictionary of the metrics in `METRICS`.
+        RSS and CPU time of the Minetest processes are read from `/proc`
+        and missing on other platforms. CPU time of processes that exit
+        during the measurement is not counted.
+    """
+    all_kwargs = config_to_env_kwargs(config, env_kwargs)
+    num_envs = len(all_kwargs)
+    if num_envs == 1:
+        env = Minetest(
+            **{
+                "env_port": env_port,
+                "server_port": server_port,
+                "base_seed": seed,
+                **all_kwargs[0],
+            },
+        )
+        envs = [env]
+    else:
+        env = MinetestVectorEnv(
+            num_envs,
+            env_kwargs=all_kwargs,
+            base_seed=seed,
+            env_port=env_port,
+            server_port=server_port,
+        )
+        envs = env.envs
+
+    try:
+        start = time.perf_counter()
+        env.reset(seed=seed)
+        launch_latency = time.perf_counter() - start
+
+        for _ in range(warmup_steps):
+            _step(env, num_envs)
+
+        pids = [pid for sub_env in envs for pid in _minetest_pids(sub_env)]
+        cpu_start = _cpu_time(pids)
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(steps):
+            latencies.append(_step(env, num_envs))
+        duration = time.perf_counter() - start
+        cpu_end = _cpu_time(pids)
+
+        rss = [
+            sum(_proc_rss(pid) or 0 for pid in _minetest_pids(sub_env))
+            for sub_env in envs
+        ]
+
+        reset_latencies = []
+        for _ in range(resets):
+            start = time.perf_counter()
+            env.reset()
+            reset_latencies.append(time.perf_counter() - start)
+    finally:
+        env.close()
+
+    latencies = np.array(latencies)
+    cpu_time = sum(cpu_end[pid] - cpu_start[pid] for pid in cpu_end if pid in cpu_start)
+    metrics = {
+        # single and vector environments both include the resets
+        # of finished episodes in the measured duration
+        "steps_per_sec": steps * num_envs / duration,
+        "step_latency_p50_ms": float(np.percentile(latencies, 50)) * 1e3,
+        "step_latency_p99_ms": float(np.percentile(latencies, 99)) * 1e3,
+        "launch_latency_s": launch_latency,
+        "wall_time_s": duration,
+    }
+    if reset_latencies:
+        metrics["reset_latency_s"] = float(np.median(reset_latencies))
+    if len(cpu_end) > 1:
+        metrics["cpu_per_step_ms"] = cpu_time / (steps * num_envs) * 1e3
+    if any(rss):
+        metrics["rss_per_env_mb"] = float(np.mean(rss)) / 2**20
+    return metrics
+
+
+def _step(env, num_envs: int) -> float:
+    # Perform a random step and return its latency. Single environments
+    # are reset at the end of an episode within the step's latency,
+    # like vector environments reset them automatically within `step`
+    action = env.action_space.sample()
+    start = time.perf_counter()
+    _, _, done, truncated, _ = env.step(action)
+    if num_envs == 1 and (done or truncated):
+        env.reset()
+    return time.perf_counter() - start
+
+
+def _git_commit() -> Optional[str]:
+    # Commit of the repository minetester is installed from, if any
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_metadata() -> Dict[str, Any]:
+    """Describe the machine and code version the benchmarks run with.
+
+    Returns:
+        Timestamp, Git commit, host name, platform, processor, CPU count
+        and Python version.
+    """
+    return {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "commit": _git_commit(),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+
+
+def run_suite(
+    configs: List[Dict[str, Any]],
+    output_path: Optional[os.PathLike] = None,
+    **kwargs,
+) -> Dict[str, Any]:
+    """Run the benchmark of each configuration.
+
+    A configuration that fails, e.g. because a codec is not installed,
+    is reported with its error instead of metrics.
+
+    Args:
+        configs: Benchmark configurations, see `expand_grid`.
+        output_path: Path of the JSON file the results are written to
+            after each configuration.
+        kwargs: Keyword arguments passed to `run_benchmark`.
+
+    Returns:
+        Metadata and results of all configurations.
+    """
+    report = {"metadata": get_metadata(), "results": []}
+    for idx, config in enumerate(configs):
+        logging.info(f"Benchmark {idx + 1}/{len(configs)}: {config}")
+        result = {"config": config}
+        try:
+            result["metrics"] = run_benchmark(config, **kwargs)
+        except Exception as e:  # noqa: B902
+            logging.warning(f"Benchmark {config} failed: {e}")
+            result["error"] = repr(e)
+        report["results"].append(result)
+        if output_path is not None:
+            with open(output_path, "w") as f:
+                json.dump(report, f, indent=2)
+    return report
+
+
+def _config_key(config: Dict[str, Any]) -> str:
+    return json.dumps({**DEFAULT_CONFIG, **config}, sort_keys=True)
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 0.1,
+) -> List[Dict[str, Any]]:
+    """Find metrics that got worse between two benchmark reports.
+
+    Results are matched by their configuration.
+
+    Args:
+        baseline: Report of the baseline, see `run_suite`.
+        current: Report to compare against the baseline.
+        threshold: Relative change above which a metric counts as regression.
+
+    Returns:
+        Configuration, metric, baseline and current value as well as
+        relative change of each regression.
+    """
+    baseline_metrics = {
+        _config_key(result["config"]): result["metrics"]
+        for result in baseline["results"]
+        if "metrics" in result
+    }
+    regressions = []
+    for result in current["results"]:
+        reference = baseline_metrics.get(_config_key(result["config"]))
+        if reference is None or "metrics" not in result:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in reference or metric not in result["metrics"]:
+                continue
+            old, new = reference[metric], result["metrics"][metric]
+            if old == 0:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    {
+                        "config": result["config"],
+                        "metric": metric,
+                        "baseline": old,
+                        "current": new,
+                        "change": change,
+                    },
+                )
+    return regressions
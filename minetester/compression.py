@@ -0,0 +1,90 @@
+"""Decoding of compressed observation frames."""
+import io
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+from minetester.proto import objects_pb2 as pb_objects
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    Image = None
+
+# Codecs the Minetest client can compress observations with
+CODECS = {
+    "raw": pb_objects.RAW,
+    "zlib": pb_objects.ZLIB,
+    "zstd": pb_objects.ZSTD,
+    "jpeg": pb_objects.JPEG,
+    "png": pb_objects.PNG,
+}
+
+
+def check_codec(codec: str, channels: int = 3):
+    """Check that frames compressed with a codec can be decoded.
+
+    Args:
+        codec: Name of the codec.
+        channels: Number of color channels of the frames.
+
+    Raises:
+        ValueError: if the codec is unknown or does not support the frames.
+        ImportError: if the library needed for decoding is not installed.
+    """
+    if codec not in CODECS:
+        raise ValueError(
+            f"Unknown codec '{codec}', supported codecs: {list(CODECS.keys())}",
+        )
+    if codec in ["jpeg", "png"]:
+        if channels != 3:
+            raise ValueError(f"Codec '{codec}' only supports RGB frames!")
+        if Image is None:
+            raise ImportError(f"Decoding '{codec}' frames requires Pillow!")
+    if codec == "zstd" and zstandard is None:
+        raise ImportError("Decoding 'zstd' frames requires zstandard!")
+
+
+def decode_frame(
+    data: bytes,
+    codec: int,
+    shape: Tuple[int, int, int],
+) -> np.ndarray:
+    """Decode the pixel data of a compressed frame.
+
+    Args:
+        data: The compressed pixel data.
+        codec: Codec of the frame as `pb_objects.ImageCodec` value.
+        shape: Shape (height, width, channels) of the frame.
+
+    Returns:
+        The decoded frame.
+
+    Raises:
+        ImportError: If the package required by the codec is not installed.
+        ValueError: If the codec is unknown.
+    """
+    size = int(np.prod(shape))
+    if codec == pb_objects.RAW:
+        raw = data
+    elif codec == pb_objects.ZLIB:
+        raw = zlib.decompress(data, bufsize=size)
+    elif codec == pb_objects.ZSTD:
+        if zstandard is None:
+            raise ImportError("Decoding 'zstd' frames requires zstandard!")
+        # the client writes frames without content size
+        raw = zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    elif codec in [pb_objects.JPEG, pb_objects.PNG]:
+        if Image is None:
+            raise ImportError("Decoding image frames requires Pillow!")
+        with Image.open(io.BytesIO(data)) as image:
+            return np.asarray(image.convert("RGB")).reshape(shape)
+    else:
+        raise ValueError(f"Unknown codec {codec}!")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(shape)
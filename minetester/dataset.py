@@ -0,0 +1,320 @@
+"""Columnar offline datasets of recorded trajectories."""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from minetester.recording import TrajectoryReader
+from minetester.utils import KEY_MAP
+
+# Layout of a dataset directory:
+#   meta.json            number of steps, frame shape, chunk size, keys, info columns,
+#                        names of the segmentation IDs if recorded
+#   frames_<i>.npy       uint8 frames of steps [i * chunk_size, (i + 1) * chunk_size)
+#   keys.npy             (T, n_keys) bool key states in the order of `keys` in meta.json
+#                        of the action taken after the frame of each step
+#   mouse.npy            (T, 2) int32 mouse movement of that action
+#   reward.npy           (T,) float32
+#   terminal.npy         (T,) bool
+#   episodes.npy         (E, 2) int64 start and end (exclusive) step of each episode
+#   info/<key>.npy       (T,) float64 numeric info fields, NaN where missing
+#   info_other.json      non-numeric info fields, lists of length T
+META_FILE = "meta.json"
+
+
+def export_dataset(
+    source: Union[os.PathLike, List[os.PathLike], TrajectoryReader],
+    out_dir: os.PathLike,
+    chunk_size: int = 1024,
+) -> Dict[str, Any]:
+    """Convert recorded trajectories into a columnar dataset.
+
+    Each recorded observation stores the action that led to its frame.
+    The action of a step is the action taken from its frame instead, i.e. the
+    action recorded with the next observation of the same episode, so that
+    frames and actions can be used as pairs for imitation learning.
+    The last step of each episode has no next action and gets a noop action.
+    Rewards and terminal flags are the ones received with the frame.
+
+    Args:
+        source: Trajectory files or reader, see `TrajectoryReader`.
+        out_dir: Directory of the dataset.
+        chunk_size: Number of frames per frame chunk.
+
+    Returns:
+        Metadata of the dataset.
+
+    Raises:
+        ValueError: If the frame shape changes within the trajectories.
+    """
+    if not isinstance(source, TrajectoryReader):
+        source = TrajectoryReader(source)
+    os.makedirs(os.path.join(out_dir, "info"), exist_ok=True)
+
+    keys, mouse, rewards, terminals, infos = [], [], [], [], []
+    frame_chunk, frame_shape, num_chunks = [], None, 0
+    segmentation_labels = None
+    for obs, rew, done, info, action in source:
+        if isinstance(obs, dict):
+            # only the frames of multi-modal observations are exported
+            obs = obs["rgb"]
+        if frame_shape is None:
+            frame_shape = obs.shape
+        elif obs.shape != frame_shape:
+            raise ValueError(f"Frame shape changed from {frame_shape} to {obs.shape}!")
+        frame_chunk.append(obs)
+        if len(frame_chunk) == chunk_size:
+            _save_chunk(out_dir, num_chunks, frame_chunk)
+            frame_chunk, num_chunks = [], num_chunks + 1
+        action = action or {}
+        keys.append([bool(action.get(key, 0)) for key in KEY_MAP])
+        mouse.append(action.get("MOUSE", (0, 0)))
+        rewards.append(rew)
+        terminals.append(done)
+        info.pop("minetest_info", None)
+        if "segmentation_labels" in info:
+            segmentation_labels = info.pop("segmentation_labels")
+        infos.append(info)
+    if frame_chunk:
+        _save_chunk(out_dir, num_chunks, frame_chunk)
+        num_chunks += 1
+    num_steps = len(rewards)
+
+    np.save(os.path.join(out_dir, "reward.npy"), np.array(rewards, dtype=np.float32))
+    terminals = np.array(terminals, dtype=np.bool_)
+    np.save(os.path.join(out_dir, "terminal.npy"), terminals)
+    ends = np.flatnonzero(terminals) + 1
+    if num_steps and (not len(ends) or ends[-1] != num_steps):
+        # unfinished last episode
+        ends = np.append(ends, num_steps)
+    starts = np.concatenate([[0], ends[:-1]]).astype(np.int64)
+    np.save(os.path.join(out_dir, "episodes.npy"), np.stack([starts, ends], axis=1))
+
+    # pair each frame with the action taken from it
+    keys = _next_actions(
+        np.array(keys, dtype=np.bool_).reshape(num_steps, len(KEY_MAP)),
+        ends,
+    )
+    np.save(os.path.join(out_dir, "keys.npy"), keys)
+    mouse = _next_actions(np.array(mouse, dtype=np.int32).reshape(num_steps, 2), ends)
+    np.save(os.path.join(out_dir, "mouse.npy"), mouse)
+
+    numeric_columns, other_columns = _save_info_columns(out_dir, infos)
+    meta = {
+        "num_steps": num_steps,
+        "frame_shape": list(frame_shape or ()),
+        "chunk_size": chunk_size,
+        "num_chunks": num_chunks,
+        "keys": list(KEY_MAP),
+        "info_columns": numeric_columns,
+        "info_other_columns": other_columns,
+    }
+    if segmentation_labels is not None:
+        meta["segmentation_labels"] = {
+            str(idx): name for idx, name in segmentation_labels.items()
+        }
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    logging.info(f"Exported {num_steps} steps in {len(starts)} episodes to {out_dir}")
+    return meta
+
+
+def _next_actions(actions: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # Shift the recorded actions one step back within each episode,
+    # the last step of an episode gets a noop (all zeros)
+    shifted = np.zeros_like(actions)
+    shifted[:-1] = actions[1:]
+    shifted[ends - 1] = 0
+    return shifted
+
+
+def _save_chunk(out_dir: os.PathLike, idx: int, frames: List[np.ndarray]):
+    np.save(os.path.join(out_dir, f"frames_{idx:05d}.npy"), np.stack(frames))
+
+
+def _save_info_columns(out_dir: os.PathLike, infos: List[Dict[str, Any]]):
+    # Store numeric and boolean info fields as columns, all others as JSON
+    columns = {}
+    for info in infos:
+        columns.update(dict.fromkeys(info))
+    numeric, other = [], {}
+    for column in columns:
+        values = [info.get(column) for info in infos]
+        present = [value for value in values if value is not None]
+        if all(isinstance(value, (bool, int, float)) for value in present):
+            column_values = np.array(
+                [np.nan if value is None else value for value in values],
+                dtype=np.float64,
+            )
+            np.save(os.path.join(out_dir, "info", f"{column}.npy"), column_values)
+            numeric.append(column)
+        else:
+            other[column] = [
+                value.decode("latin-1") if isinstance(value, bytes) else value
+                for value in values
+            ]
+    if other:
+        with open(os.path.join(out_dir, "info_other.json"), "w") as f:
+            json.dump(other, f)
+    return numeric, list(other)
+
+
+class OfflineDataset:
+    """Random-access dataset of an exported trajectory dataset.
+
+    Frames and columns are memory-mapped, such that only the accessed steps
+    are read from disk. Implements `__len__` and `__getitem__`, so it can be
+    wrapped by a PyTorch `DataLoader`, while `iter_batches` samples minibatches
+    with background prefetching without any further dependencies.
+    """
+
+    def __init__(self, path: os.PathLike):
+        """Initialize the dataset.
+
+        Args:
+            path: Directory of a dataset written by `export_dataset`.
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.chunk_size = self.meta["chunk_size"]
+        self.keys = self.meta["keys"]
+        self.frames = [
+            np.load(os.path.join(path, f"frames_{idx:05d}.npy"), mmap_mode="r")
+            for idx in range(self.meta["num_chunks"])
+        ]
+        self.key_states = self._load("keys.npy")
+        self.mouse = self._load("mouse.npy")
+        self.rewards = self._load("reward.npy")
+        self.terminals = self._load("terminal.npy")
+        self.episodes = self._load("episodes.npy")
+        self.info = {
+            column: self._load(os.path.join("info", f"{column}.npy"))
+            for column in self.meta["info_columns"]
+        }
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    def __len__(self) -> int:
+        """Get the number of steps of the dataset.
+
+        Returns:
+            Number of steps.
+        """
+        return self.meta["num_steps"]
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        """Read a single step.
+
+        Args:
+            idx: Index of the step, negative indices count from the end.
+
+        Returns:
+            Frame (`obs`), key states (`keys`), mouse movement (`mouse`), reward
+            (`reward`), terminal flag (`terminal`) and numeric info fields
+            (`info`) of the step, see `get_batch`.
+
+        Raises:
+            IndexError: If the index is out of range.
+        """
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"Step {idx} out of range for {len(self)} steps!")
+        chunk, offset = divmod(idx, self.chunk_size)
+        return {
+            "obs": np.array(self.frames[chunk][offset]),
+            "keys": np.array(self.key_states[idx]),
+            "mouse": np.array(self.mouse[idx]),
+            "reward": self.rewards[idx],
+            "terminal": self.terminals[idx],
+            "info": {column: values[idx] for column, values in self.info.items()},
+        }
+
+    def get_batch(self, indices: Sequence[int]) -> Dict[str, Any]:
+        """Read a batch of steps.
+
+        Args:
+            indices: Indices of the steps.
+
+        Returns:
+            Batches of frames (`obs`), key states (`keys`), mouse movements
+            (`mouse`), rewards (`reward`), terminal flags (`terminal`) and
+            numeric info fields (`info`).
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        obs = np.empty((len(indices),) + tuple(self.meta["frame_shape"]), np.uint8)
+        chunks, offsets = np.divmod(indices, self.chunk_size)
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            obs[mask] = self.frames[chunk][offsets[mask]]
+        return {
+            "obs": obs,
+            "keys": self.key_states[indices],
+            "mouse": self.mouse[indices],
+            "reward": self.rewards[indices],
+            "terminal": self.terminals[indices],
+            "info": {column: values[indices] for column, values in self.info.items()},
+        }
+
+    def episode(self, idx: int) -> Dict[str, Any]:
+        """Read all steps of an episode.
+
+        Args:
+            idx: Index of the episode.
+
+        Returns:
+            Batch of the steps of the episode, see `get_batch`.
+        """
+        start, end = self.episodes[idx]
+        return self.get_batch(np.arange(start, end))
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        shuffle: bool = True,
+        seed: Optional[int] = None,
+        prefetch: int = 2,
+        drop_last: bool = False,
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over minibatches of one epoch.
+
+        Args:
+            batch_size: Number of steps per batch.
+            shuffle: Whether to sample the steps in random order.
+            seed: Seed of the random order.
+            prefetch: Number of batches read ahead in a background thread.
+                Batches are read in the calling thread if 0.
+            drop_last: Whether to skip the last incomplete batch.
+
+        Yields:
+            Batches of steps, see `get_batch`.
+        """
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(order)
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        batches = [
+            order[start : start + batch_size] for start in range(0, stop, batch_size)
+        ]
+        if prefetch <= 0:
+            for indices in batches:
+                yield self.get_batch(indices)
+            return
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            futures = [
+                executor.submit(self.get_batch, indices)
+                for indices in batches[:prefetch]
+            ]
+            for idx in range(len(batches)):
+                batch = futures[idx].result()
+                if idx + prefetch < len(batches):
+                    futures.append(
+                        executor.submit(self.get_batch, batches[idx + prefetch]),
+                    )
+                futures[idx] = None
+                yield batch
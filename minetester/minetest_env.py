@@ -1,10 +1,13 @@
 """Minetest Gymnasium Environment."""
+import copy
 import datetime
 import logging
 import os
 import shutil
+import tempfile
+import time
 import uuid
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import gymnasium as gym
 import matplotlib.pyplot as plt
@@ -12,16 +15,25 @@ import numpy as np
 import pkg_resources
 import zmq
 
+from minetester.allocation import SharedXServer, allocate_port, release_port
+from minetester.compression import check_codec
+from minetester.process_pool import WarmProcessPool
+from minetester.profiler import StepProfiler
+from minetester.shm import SharedFrameBuffer
 from minetester.utils import (
     KEY_MAP,
+    NOOP_ACTION,
     pack_pb_action,
     read_config_file,
     start_minetest_client,
     start_minetest_server,
     start_xserver,
+    unpack_pb_action,
     unpack_pb_obs,
     write_config_file,
 )
+from minetester.watchdog import ProcessDiedError, ProcessWatchdog
+from minetester.world_cache import WorldCache
 
 
 class Minetest(gym.Env):
@@ -32,13 +44,21 @@ class Minetest(gym.Env):
 
     def __init__(
         self,
-        env_port: int = 5555,
-        server_port: int = 30000,
+        env_port: int = 0,
+        server_port: int = 0,
+        ipc: Optional[bool] = None,
         minetest_root: Optional[os.PathLike] = None,
         artefact_dir: Optional[os.PathLike] = None,
         world_dir: Optional[os.PathLike] = None,
         config_path: Optional[os.PathLike] = None,
         display_size: Tuple[int, int] = default_display_size,
+        render_size: Optional[Tuple[int, int]] = None,
+        obs_size: Optional[Tuple[int, int]] = None,
+        obs_format: str = "rgb",
+        obs_modalities: Sequence[str] = ("rgb",),
+        crop: Optional[Tuple[int, int, int, int]] = None,
+        obs_codec: str = "raw",
+        obs_quality: Optional[int] = None,
         fov: int = 72,
         base_seed: int = 0,
         world_seed: Optional[int] = None,
@@ -50,22 +70,80 @@ class Minetest(gym.Env):
         config_dict: Dict[str, Any] = {},
         sync_port: Optional[int] = None,
         sync_dtime: Optional[float] = None,
+        in_process_server: bool = False,
         dtime: float = 0.05,
+        frame_skip: int = 1,
+        frame_max_pool: bool = False,
+        pipelined: bool = False,
         headless: bool = False,
         start_xvfb: bool = False,
-        x_display: Optional[int] = None,
+        x_display: Optional[Union[int, str]] = None,
+        xserver: Optional[SharedXServer] = None,
         render_mode: str = "human",
+        shared_memory: bool = False,
+        shm_slots: int = 2,
+        fast_reset: bool = False,
+        world_cache: bool = False,
+        world_cache_size: int = 64,
+        world_seed_pool: Optional[List[int]] = None,
+        num_warm_instances: int = 0,
+        warm_launch_timeout: float = 120.0,
+        step_timeout: Optional[float] = 60.0,
+        reset_timeout: Optional[float] = 300.0,
+        max_restarts: int = 3,
+        watchdog_interval: float = 0.5,
+        log_level: int = logging.INFO,
+        trace: bool = False,
+        profile: bool = False,
     ):
         """Initialize Minetest environment.
 
         Args:
-            env_port: Port between gym environment and a Minetest client
-            server_port: Port between Minetest client and server
+            env_port: Port between gym environment and a Minetest client.
+                A free port is allocated if 0, see `allocation.PortAllocator`.
+            server_port: Port between Minetest client and server.
+                A free port is allocated if 0.
+            ipc: Whether the gym environment and the Minetest client communicate
+                through a Unix domain socket (`ipc://`) in `artefact_dir` instead
+                of TCP. Avoids the loopback TCP stack for large frames.
+                Defaults to True if `start_minetest` is set, i.e. the client runs
+                on the same host, and no `env_port` is given.
             minetest_root: Path to Minetest root
             artefact_dir: Artefact directory, e.g. for logs, media cache, etc.
             config_path: Path to minetest.conf
             world_dir: Path to Minetest world directory
             display_size: Size in pixels of the Minetest window
+            render_size: Size (width, height) in pixels the 3D scene is rendered
+                at instead of the display size. HUD and formspecs keep their
+                layout for the display size and are scaled onto the frame.
+                Much cheaper than rendering at the display size and resizing
+                for small observations. Should have the aspect ratio of the
+                display size, requires `headless`.
+            obs_size: Size (width, height) in pixels of the observations.
+                Frames are resized by the client. Defaults to the (cropped)
+                render size or display size.
+            obs_format: Color format of the observations, either 'rgb'
+                or 'gray'. Grayscale observations have a single channel.
+            obs_modalities: Observed modalities, 'rgb' (the frame in `obs_format`)
+                and optionally 'depth' and 'segmentation'. With more than one
+                modality observations are dictionaries keyed by modality.
+                Depth is the uint16 depth buffer of the rendered frame, of shape
+                (height, width, 1), non-linear in the distance with 65535 at the
+                far plane. It is rendered in the same pass as the frame and
+                requires `headless`. Segmentation is the uint16 node content ID
+                of each pixel, of shape (height, width, 1), see
+                `segmentation_labels` for the names of the IDs. It is looked up
+                from the depth buffer with `headless`, otherwise it is raycast
+                at a resolution of at most 128x128.
+            crop: Region (x, y, width, height) in pixels of the Minetest window
+                that is cropped by the client before resizing.
+            obs_codec: Codec the client compresses observations with before
+                sending them: 'raw', 'zlib', 'zstd', 'jpeg' (lossy) or 'png'.
+                Useful if client and environment run on different machines.
+                Not supported with `shared_memory`. 'jpeg' and 'png' require
+                the 'rgb' `obs_format`.
+            obs_quality: JPEG quality (1-100) or zlib/zstd compression level.
+                Uses the codec's default if not set.
             fov: Field of view in degrees of the Minetest window
             base_seed: Seed for the Minetest environment.
             world_seed: Fixed seed for world generation. If not set, world seeds
@@ -77,18 +155,93 @@ class Minetest(gym.Env):
             clientmods: List of client mod names
             servermods: List of server mod names
             config_dict: Dictionary of config options updating the loaded config file
-            sync_port: Port between Minetest client and server for synchronization
+            sync_port: Port between Minetest client and server for synchronization.
+                A free port is allocated if 0. No synchronization if None.
             sync_dtime: In-game time between two steps
+            in_process_server: Whether to run the server inside the client process
+                instead of starting a separate server. The server is then stepped
+                in lock step with the client by `sync_dtime` (defaults to `dtime`)
+                in-game time per step without any synchronization socket.
+                Not supported with `sync_port`.
             dtime: Client-side in-game time between time steps
+            frame_skip: Number of game loop iterations the client repeats each
+                action for. Only the last frame is returned and the rewards
+                of all iterations are summed up.
+            frame_max_pool: Whether to return the pixel-wise maximum of the last
+                two frames of a repeated action.
+            pipelined: Whether to delay actions by one step, such that the client
+                renders the next frame while the caller processes the current one.
+                `step(action_t)` then returns the observation and reward that
+                resulted from `action_{t-1}` and `action_t` is executed
+                while the caller computes `action_{t+1}`. The first step after
+                `reset` executes a noop action. Only supported by `reset` and
+                `step` (`step_async`/`step_wait`) of this class.
             headless: Whether to run Minetest in headless mode
-            start_xvfb: Whether to start X server virtual framebuffer
-            x_display: Display number to use for the X server virtual framebuffer
+            start_xvfb: Whether to start X server virtual framebuffer.
+                If `x_display` is not set, Xvfb picks an unused display number.
+            x_display: Display number to use for the X server virtual framebuffer,
+                optionally with screen number, e.g. `4` or `"4.1"`
+            xserver: Shared X server to run the client on. The environment
+                uses one of its screens instead of starting its own X server.
             render_mode: Gymnasium render mode. Supports 'human' and 'rgb_array'.
+            shared_memory: Whether the client sends images through a shared memory
+                frame buffer instead of the ZMQ socket. Observations are then
+                read-only views into the buffer that remain valid for
+                `shm_slots - 1` further steps.
+            shm_slots: Number of frames in the shared memory ring buffer.
+            fast_reset: Whether to reset episodes in place by respawning the player
+                instead of restarting the Minetest processes. The world is not
+                regenerated, i.e. it keeps its seed, and the initial observation
+                may still show the last frame before the reset.
+            world_cache: Whether to copy pre-generated worlds from a cache
+                in `artefact_dir` instead of generating them at each reset.
+                Worlds missing in the cache are generated on first use.
+            world_cache_size: Maximum number of cached worlds.
+            world_seed_pool: World seeds to sample from at each `reset`
+                if `world_seed` is not set. Use `prepare_world_cache` to
+                pre-generate the corresponding worlds.
+            num_warm_instances: Number of Minetest server/client pairs launched
+                ahead of time in the background. If positive, `reset` switches
+                to an already connected instance instead of launching a new one.
+                Warm instances use automatically chosen ports.
+            warm_launch_timeout: Maximum time in seconds to wait for a warm
+                instance to send its initial observation.
+            step_timeout: Maximum time in seconds to wait for an observation.
+                If Minetest does not respond in time or one of its processes
+                dies, the episode is truncated (with `minetest_error` in the
+                info dictionary) and Minetest is relaunched on the next reset.
+                Waits indefinitely if None.
+            reset_timeout: Maximum time in seconds to wait for the initial
+                observation after (re)launching Minetest. Waits indefinitely
+                if None.
+            max_restarts: Number of times Minetest is relaunched within one
+                reset if it dies or does not respond before `reset` raises.
+            watchdog_interval: Time in seconds between two checks of whether
+                the Minetest processes and Xvfb are still running.
+            log_level: Level of the environment's logger, which writes to
+                `env_<id>.log` in the log directory.
+            trace: Whether to log every action and observation and to start
+                the Minetest client with trace level output. Very verbose,
+                only meant for debugging.
+            profile: Whether to record the durations of the phases of each step,
+                i.e. packing, sending and receiving the action and parsing
+                the observation in Python as well as the game loop phases
+                of the client. See `get_profile` and `dump_profile`.
+
+        Raises:
+            ValueError: If the given options are incompatible with each other
+                or invalid.
         """
         self.unique_env_id = str(uuid.uuid4())
 
         # Graphics settings
-        self._set_graphics(headless, display_size, fov, render_mode)
+        self._set_graphics(headless, display_size, render_size, fov, render_mode)
+        self._set_obs_format(obs_size, obs_format, crop, obs_modalities)
+        check_codec(obs_codec, channels=3 if obs_format == "rgb" else 1)
+        if obs_codec != "raw" and shared_memory:
+            raise ValueError("Compressed observations can not use shared memory!")
+        self.obs_codec = obs_codec
+        self.obs_quality = obs_quality
 
         # Define Minetest paths
         self.start_xvfb = start_xvfb and self.headless
@@ -97,20 +250,67 @@ class Minetest(gym.Env):
             world_dir,
             config_path,
         )  # Stores minetest artefacts and outputs
+        self._set_logger(log_level, trace)
         self._set_minetest_dirs(
             minetest_root,
         )  # Stores actual minetest dirs and executable
 
         # Whether to start minetest server and client
         self.start_minetest = start_minetest
-
-        # Used ports
+        # Whether to reset episodes without restarting minetest
+        self.fast_reset = fast_reset
+
+        # Pool of Minetest instances launched ahead of time
+        if num_warm_instances > 0 and not self.reset_world:
+            raise ValueError("Warm instances can not share a custom world directory!")
+        self.num_warm_instances = num_warm_instances
+        self.warm_launch_timeout = warm_launch_timeout
+        self.process_pool = None
+
+        # Crash and stall detection
+        self.step_timeout = step_timeout
+        self.reset_timeout = reset_timeout
+        self.max_restarts = max_restarts
+        self.watchdog_interval = watchdog_interval
+        self.watchdog = ProcessWatchdog(watchdog_interval)
+
+        # Used ports, ports set to 0 are allocated automatically
+        if in_process_server and sync_port is not None:
+            raise ValueError("An in-process server can not use a sync port!")
+        self.allocated_ports = []
+        # an explicit port means that the client or others connect over TCP
+        self.ipc = start_minetest and not env_port if ipc is None else ipc
         self.env_port = env_port  # MT env <-> MT client
-        self.server_port = server_port  # MT client <-> MT server
+        if not self.ipc and not env_port:
+            self.env_port = self._allocate_port()
+        self.env_address = self._get_env_address(self.unique_env_id)
+        # MT client <-> MT server
+        self.server_port = server_port or self._allocate_port(udp=True)
         self.sync_port = sync_port  # MT client <-> MT server
+        if sync_port == 0:
+            self.sync_port = self._allocate_port()
+        self.in_process_server = in_process_server
 
         self.dtime = dtime
         self.sync_dtime = sync_dtime
+        if in_process_server and sync_dtime is None:
+            self.sync_dtime = dtime
+
+        # Action repeat executed by the client
+        if frame_skip < 1:
+            raise ValueError("frame_skip must be at least 1!")
+        self.frame_skip = frame_skip
+        self.frame_max_pool = frame_max_pool
+
+        # Step profiling
+        self.profiler = StepProfiler() if profile else None
+        self._timings = {}  # phase durations of the current step
+
+        # Asynchronous / pipelined stepping
+        self.pipelined = pipelined
+        self._pending_action = None  # set by step_async
+        self._sent_action = None  # action that produces the next observation
+        self._alive = True
 
         # Client Name
         self.client_name = client_name
@@ -125,6 +325,8 @@ class Minetest(gym.Env):
 
         # Env objects
         self.last_obs = None
+        # Names of the segmentation IDs, received from the client
+        self.segmentation_labels = {}
         self.render_fig = None
         self.render_img = None
 
@@ -140,24 +342,25 @@ class Minetest(gym.Env):
         # Define action and observation space
         self._configure_spaces()
 
+        # Shared memory frame buffer
+        self.frame_buffer = None
+        if shared_memory:
+            self.frame_buffer = SharedFrameBuffer(
+                self.image_space.shape,
+                num_slots=shm_slots,
+            )
+
         # Write minetest.conf
         self.config_dict = config_dict
         self._write_config()
 
-        # Configure logging
-        logging.basicConfig(
-            filename=os.path.join(self.log_dir, f"env_{self.unique_env_id}.log"),
-            filemode="a",
-            format="%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s",
-            datefmt="%H:%M:%S",
-            level=logging.DEBUG,
-        )
-
         # Configure game and mods
         self.game_id = game_id
-        self.clientmods = clientmods
-        self.servermods = servermods
-        if self.sync_port:
+        self.clientmods = list(clientmods)
+        self.servermods = list(servermods)
+        if self.fast_reset:
+            self.servermods += ["reset"]  # require the server reset mod
+        if self.sync_port or self.in_process_server:
             self.servermods += ["rewards"]  # require the server rewards mod
             self._enable_servermods()
         else:
@@ -167,17 +370,49 @@ class Minetest(gym.Env):
             self._enable_clientmods()
             self._enable_servermods()
 
+        # Cache of pre-generated worlds
+        self.world_seed_pool = world_seed_pool
+        self.world_cache = None
+        if world_cache:
+            self.world_cache = WorldCache(
+                os.path.join(self.artefact_dir, "world_cache"),
+                game_id=self.game_id,
+                servermods=self.servermods,
+                max_worlds=world_cache_size,
+            )
+
         # Start X server virtual frame buffer
-        # TODO automatically choose available X display/server number
-        self.default_display = x_display or 0
-        if "DISPLAY" in os.environ:
-            self.default_display = int(os.environ["DISPLAY"].split(":")[1])
-        self.x_display = x_display or self.default_display
+        self.x_display = x_display
+        if x_display is None and "DISPLAY" in os.environ:
+            self.x_display = os.environ["DISPLAY"].split(":")[1]
+        self.xserver = xserver
         self.xserver_process = None
-        if self.start_xvfb:
-            self.x_display = x_display or self.default_display + 4
-            logging.info(f"Starting Xvfb server with number = {self.x_display}")
-            self.xserver_process = start_xserver(self.x_display, self.display_size)
+        if xserver is not None:
+            self.x_display = xserver.acquire_screen()
+            self.logger.info(f"Using screen {self.x_display} of shared X server")
+        elif self.start_xvfb:
+            self._start_xserver(x_display)
+
+    def _start_xserver(self, x_display: Optional[Union[int, str]]):
+        self.xserver_process = start_xserver(x_display, self.display_size)
+        self.x_display = self.xserver_process.display_idx
+        self.logger.info(f"Started Xvfb server with number = {self.x_display}")
+
+    def _get_env_address(self, instance_id: str) -> str:
+        # ZMQ endpoint the environment binds and the client connects to
+        if not self.ipc:
+            return f"tcp://localhost:{self.env_port}"
+        path = os.path.join(self.artefact_dir, f"env_{instance_id}.ipc")
+        if len(path) > 100:
+            # Unix domain socket paths are limited to about 100 characters
+            path = os.path.join(tempfile.gettempdir(), f"minetester_{instance_id}.ipc")
+        return f"ipc://{path}"
+
+    def _allocate_port(self, udp: bool = False) -> int:
+        # Reserve a free port until the instance is closed
+        port = allocate_port(udp=udp)
+        self.allocated_ports.append(port)
+        return port
 
     def _configure_spaces(self):
         # Define action and observation space
@@ -197,18 +432,32 @@ class Minetest(gym.Env):
             },
             seed=self.base_seed,
         )
-        self.observation_space = gym.spaces.Box(
+        height, width = self.obs_size[1], self.obs_size[0]
+        self.image_space = gym.spaces.Box(
             0,
             255,
-            shape=(self.display_size[1], self.display_size[0], 3),
+            shape=(height, width, 3 if self.obs_format == "rgb" else 1),
             dtype=np.uint8,
             seed=self.base_seed,
         )
+        self.observation_space = self.image_space
+        if len(self.obs_modalities) > 1:
+            spaces = {"rgb": self.image_space}
+            for modality in ["depth", "segmentation"]:
+                if modality in self.obs_modalities:
+                    spaces[modality] = gym.spaces.Box(
+                        0,
+                        np.iinfo(np.uint16).max,
+                        shape=(height, width, 1),
+                        dtype=np.uint16,
+                    )
+            self.observation_space = gym.spaces.Dict(spaces, seed=self.base_seed)
 
     def _set_graphics(
         self,
         headless: bool,
         display_size: Tuple[int, int],
+        render_size: Optional[Tuple[int, int]],
         fov: int,
         render_mode: str,
     ):
@@ -217,9 +466,76 @@ class Minetest(gym.Env):
         # minetest graphics settings
         self.headless = headless
         self.display_size = display_size
+        if render_size is not None:
+            if not headless:
+                raise ValueError("A render size requires headless mode!")
+            if render_size[0] <= 0 or render_size[1] <= 0:
+                raise ValueError(f"Invalid render size: {render_size}")
+            render_size = tuple(render_size)
+        self.render_size = render_size
         self.fov_y = fov
         self.fov_x = self.fov_y * self.display_size[0] / self.display_size[1]
 
+    def _set_obs_format(
+        self,
+        obs_size: Optional[Tuple[int, int]],
+        obs_format: str,
+        crop: Optional[Tuple[int, int, int, int]],
+        obs_modalities: Sequence[str],
+    ):
+        if obs_format not in ["rgb", "gray"]:
+            raise ValueError(f"Unsupported observation format: '{obs_format}'")
+        unknown = set(obs_modalities) - {"rgb", "depth", "segmentation"}
+        if unknown or "rgb" not in obs_modalities:
+            raise ValueError(
+                f"Unsupported observation modalities: {list(obs_modalities)},"
+                " use 'rgb' and optionally 'depth' and 'segmentation'",
+            )
+        if "depth" in obs_modalities and not self.headless:
+            raise ValueError("Depth observations require headless mode!")
+        if crop is not None:
+            x, y, width, height = crop
+            if (
+                x < 0
+                or y < 0
+                or width <= 0
+                or height <= 0
+                or x + width > self.display_size[0]
+                or y + height > self.display_size[1]
+            ):
+                raise ValueError(
+                    f"Crop {crop} is not within display of size {self.display_size}",
+                )
+        self.obs_format = obs_format
+        self.obs_modalities = tuple(dict.fromkeys(obs_modalities))
+        self.obs_crop = crop
+        if obs_size is None:
+            obs_size = crop[2:] if crop else self.display_size
+            if self.render_size is not None:
+                # the crop is given in window coordinates
+                obs_size = (
+                    max(1, obs_size[0] * self.render_size[0] // self.display_size[0]),
+                    max(1, obs_size[1] * self.render_size[1] // self.display_size[1]),
+                )
+        self.obs_size = tuple(obs_size)
+
+    def _set_logger(self, log_level: int, trace: bool):
+        # Each environment logs to its own file
+        self.trace = trace
+        self.logger = logging.getLogger(f"{__name__}.{self.unique_env_id}")
+        self.logger.setLevel(min(log_level, logging.DEBUG) if trace else log_level)
+        self.log_handler = logging.FileHandler(
+            os.path.join(self.log_dir, f"env_{self.unique_env_id}.log"),
+            delay=True,
+        )
+        self.log_handler.setFormatter(
+            logging.Formatter(
+                "%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s",
+                datefmt="%H:%M:%S",
+            ),
+        )
+        self.logger.addHandler(self.log_handler)
+
     def _set_minetest_dirs(self, minetest_root):
         self.minetest_root = minetest_root
         if self.minetest_root is None:
@@ -245,7 +561,7 @@ class Minetest(gym.Env):
                         os.path.dirname(candidate_minetest_executable),
                     )
             except Exception as e:  # noqa: B902
-                logging.warning(f"Error loading resource file 'bin.minetest': {e}")
+                self.logger.warning(f"Error loading resource file 'bin.minetest': {e}")
 
         if self.minetest_root is None:
             raise Exception("Unable to locate minetest executable")
@@ -309,7 +625,7 @@ class Minetest(gym.Env):
             for clientmod in self.clientmods:
                 clientmod_folder = os.path.join(clientmods_folder, clientmod)
                 if not os.path.exists(clientmod_folder):
-                    logging.warning(
+                    self.logger.warning(
                         f"Client mod {clientmod} was not found!"
                         f" It must be located at {clientmod_folder}.",
                     )
@@ -331,7 +647,7 @@ class Minetest(gym.Env):
             mod_folder = os.path.join(servermods_folder, mod)
             world_mod_folder = os.path.join(worldmods_folder, mod)
             if not os.path.exists(mod_folder):
-                logging.warning(
+                self.logger.warning(
                     f"Server mod {mod} was not found!"
                     f" It must be located at {mod_folder}.",
                 )
@@ -343,23 +659,39 @@ class Minetest(gym.Env):
             self.socket.close()
         self.context = zmq.Context()
         self.socket = self.context.socket(zmq.REP)
-        self.socket.bind(f"tcp://*:{self.env_port}")
+        if self.ipc:
+            self.socket.bind(self.env_address)
+        else:
+            self.socket.bind(f"tcp://*:{self.env_port}")
 
-    def _reset_minetest(self):
-        # Determine log paths
+    def _get_log_path(self) -> str:
         reset_timestamp = datetime.datetime.now().strftime("%m-%d-%Y,%H:%M:%S")
-        log_path = os.path.join(
+        return os.path.join(
             self.log_dir,
             f"{{}}_{reset_timestamp}_{self.unique_env_id}.log",
         )
 
+    def _reset_minetest(self):
+        # Determine log paths
+        log_path = self._get_log_path()
+
         # Close Mintest processes
         if self.server_process:
             self.server_process.kill()
         if self.client_process:
             self.client_process.kill()
 
-        # (Re)start Minetest server
+        # (Re)start Minetest server and client
+        if self.in_process_server:
+            # the client loads the world itself
+            world_config = os.path.join(self.world_dir, "world.mt")
+            if not os.path.exists(world_config):
+                write_config_file(world_config, {"gameid": self.game_id})
+        else:
+            self._start_server(log_path)
+        self._start_client(log_path)
+
+    def _start_server(self, log_path: str):
         self.server_process = start_minetest_server(
             self.minetest_executable,
             self.config_path,
@@ -371,7 +703,7 @@ class Minetest(gym.Env):
             self.game_id,
         )
 
-        # (Re)start Minetest client
+    def _start_client(self, log_path: str):
         self.client_process = start_minetest_client(
             self.minetest_executable,
             self.config_path,
@@ -385,6 +717,20 @@ class Minetest(gym.Env):
             dtime=self.dtime,
             headless=self.headless,
             display=self.x_display,
+            shm_name=self.frame_buffer.name if self.frame_buffer else None,
+            render_size=self.render_size,
+            obs_size=self.obs_size,
+            obs_crop=self.obs_crop,
+            obs_grayscale=self.obs_format == "gray",
+            obs_depth="depth" in self.obs_modalities,
+            obs_segmentation="segmentation" in self.obs_modalities,
+            obs_codec=self.obs_codec,
+            obs_quality=self.obs_quality,
+            world_dir=self.world_dir if self.in_process_server else None,
+            sync_dtime=self.sync_dtime,
+            trace=self.trace,
+            profile=self.profiler is not None,
+            client_address=self.env_address,
         )
 
     def _check_world_dir(self):
@@ -398,6 +744,46 @@ class Minetest(gym.Env):
         if os.path.exists(self.world_dir):
             shutil.rmtree(self.world_dir, ignore_errors=True)
 
+    def _checkout_world(self):
+        # Copy the world of the current seed from the cache
+        if self.world_cache is None:
+            return
+        if not self.world_cache.contains(self.world_seed):
+            self.prepare_world_cache([self.world_seed])
+        if not self.world_cache.checkout(self.world_seed, self.world_dir):
+            self.logger.warning(
+                f"World with seed {self.world_seed} is not cached,"
+                " generating it from scratch.",
+            )
+
+    def prepare_world_cache(
+        self,
+        seeds: Optional[List[int]] = None,
+        num_workers: int = 1,
+    ) -> List[int]:
+        """Pre-generate and cache worlds.
+
+        Args:
+            seeds: World seeds to generate worlds for.
+                Defaults to `world_seed_pool`.
+            num_workers: Number of worlds to generate in parallel.
+
+        Returns:
+            Seeds of the newly generated worlds.
+
+        Raises:
+            RuntimeError: If the world cache is not enabled.
+        """
+        if self.world_cache is None:
+            raise RuntimeError("World cache is not enabled!")
+        seeds = seeds if seeds is not None else self.world_seed_pool or []
+        return self.world_cache.generate(
+            [int(seed) for seed in seeds],
+            self.minetest_executable,
+            config=read_config_file(self.config_path),
+            num_workers=num_workers,
+        )
+
     def _check_config_path(self):
         if self.config_path is None:
             raise RuntimeError(
@@ -461,7 +847,10 @@ class Minetest(gym.Env):
             self._np_random = np.random.default_rng(seed)
 
     def _sample_world_seed(self):
-        self.world_seed = self._np_random.integers(np.iinfo(np.int64).max)
+        if self.world_seed_pool:
+            self.world_seed = int(self._np_random.choice(self.world_seed_pool))
+        else:
+            self.world_seed = self._np_random.integers(np.iinfo(np.int64).max)
 
     def reset(
         self,
@@ -476,27 +865,263 @@ class Minetest(gym.Env):
             options: Currently unused.
 
         Returns:
-            Tuple of inital observation and empty info dictionary.
+            Tuple of inital observation and info dictionary with the size of the
+            received message (`obs_bytes`) and its decoding time (`decode_time`).
+
+        Raises:
+            RuntimeError: If Minetest died or did not respond after all
+                `max_restarts` relaunches.
         """
         del options
+        for attempt in range(self.max_restarts + 1):
+            # relaunches use fresh seeds in case the world caused the crash
+            self._start_reset(seed=seed if attempt == 0 else None)
+
+            # Receive initial observation
+            self.logger.debug("Waiting for first obs...")
+            try:
+                byte_obs = self._recv(self.reset_timeout)
+                break
+            except (ProcessDiedError, TimeoutError) as e:
+                self._kill_minetest()
+                if attempt == self.max_restarts:
+                    raise RuntimeError(
+                        f"Minetest failed to start {attempt + 1} times!",
+                    ) from e
+                self.logger.warning(f"Relaunching Minetest: {e}")
+        if self.pipelined:
+            # let the client render the first step while the caller
+            # processes the initial observation
+            self._sent_action = dict(NOOP_ACTION)
+            self._alive = self._send_action(self._sent_action)
+        return self._finish_reset(byte_obs)
+
+    def _start_reset(self, seed: Optional[int] = None):
+        # (Re)start Minetest without waiting for the initial observation
         self._seed(seed=seed)
+        self._pending_action = None
+        running = self.fast_reset and self._is_running()
+        self._alive = True
+        if self._sent_action is not None:
+            self._sent_action = None
+            if running:
+                # discard the observation of the action sent ahead of time
+                try:
+                    self._recv(self.step_timeout)
+                except (ProcessDiedError, TimeoutError) as e:
+                    self.logger.warning(f"Relaunching Minetest: {e}")
+                    self._kill_minetest()
+                    running = False
+        if running:
+            # Reply to the pending observation with a reset action
+            self.logger.debug("Sending reset action")
+            pb_action = pack_pb_action(NOOP_ACTION)
+            pb_action.reset = True
+            self.socket.send(pb_action.SerializeToString())
+            return
+        if self.start_minetest and self.num_warm_instances > 0:
+            if self.process_pool is None:
+                self.process_pool = WarmProcessPool(
+                    self._prepare_instance,
+                    Minetest._close_instance,
+                    size=self.num_warm_instances,
+                )
+            elif seed is not None:
+                # warm instances were seeded by the previous RNG
+                self.process_pool.clear()
+            try:
+                instance = self.process_pool.get()
+            except Exception as e:  # noqa: B902
+                # fall back to launching an instance in the foreground
+                self.logger.warning(f"Failed to launch warm instance: {e}")
+            else:
+                self._adopt_instance(instance)
+                self._watch_processes()
+                return
+        if self.xserver_process is not None and self.xserver_process.poll() is not None:
+            self.logger.warning("Relaunching crashed Xvfb server")
+            self._start_xserver(self.x_display)
         if self.start_minetest:
             if self.reset_world:
                 self._delete_world()
                 if self.reseed_on_reset:
                     self._sample_world_seed()
                 self._write_config()
+                self._checkout_world()
             self._enable_servermods()
             self._reset_minetest()
         self._reset_zmq()
+        self._watch_processes()
+
+    def _watch_processes(self):
+        # Monitor the processes of the current instance in the background
+        if self.watchdog is not None:
+            self.watchdog.watch(
+                {
+                    "server": self.server_process,
+                    "client": self.client_process,
+                    "Xvfb": self.xserver_process,
+                },
+            )
+
+    def _check_health(self, start: float, timeout: Optional[float]):
+        # Raise if a Minetest process died or the timeout since `start` passed
+        dead_process = self.watchdog.dead_process if self.watchdog else None
+        if dead_process is not None:
+            raise ProcessDiedError(f"Minetest {dead_process} died!")
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Minetest did not respond within {timeout}s!")
+
+    def _recv(self, timeout: Optional[float]) -> bytes:
+        # Receive a message, checking the watchdog between short polls
+        start = time.monotonic()
+        poll_timeout = max(1, int(self.watchdog_interval * 1000))
+        while not self.socket.poll(poll_timeout):
+            self._check_health(start, timeout)
+        return self.socket.recv()
+
+    def _kill_minetest(self, kill_server: bool = True):
+        # Stop the processes of the current instance after a crash or stall,
+        # such that the next reset relaunches Minetest
+        processes = [self.client_process]
+        if kill_server:
+            processes.append(self.server_process)
+        for process in processes:
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+        self._alive = False
+        self._sent_action = None
+
+    def _abort_episode(
+        self,
+        error: Exception,
+        kill_server: bool = True,
+    ) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        # Truncate the episode with the last observation after a crash or stall
+        self.logger.warning(f"Truncating episode: {error}")
+        self._kill_minetest(kill_server=kill_server)
+        return self.last_obs, 0.0, False, True, {"minetest_error": str(error)}
+
+    # Attributes that belong to a single launched Minetest instance
+    _instance_attributes = (
+        "env_port",
+        "env_address",
+        "server_port",
+        "sync_port",
+        "allocated_ports",
+        "world_dir",
+        "config_path",
+        "clean_config",
+        "world_seed",
+        "server_process",
+        "client_process",
+        "context",
+        "socket",
+        "frame_buffer",
+        "last_obs",
+    )
+
+    def _prepare_instance(self) -> Tuple["Minetest", Callable[[], "Minetest"]]:
+        # Prepare a warm instance in the main thread
+        # and return it with a function that launches it in the background
+        instance = copy.copy(self)
+        instance_id = str(uuid.uuid4())
+        instance.world_dir = os.path.join(self.artefact_dir, instance_id)
+        instance.config_path = os.path.join(self.artefact_dir, f"{instance_id}.conf")
+        if os.path.exists(self.config_path):
+            shutil.copyfile(self.config_path, instance.config_path)
+        instance.allocated_ports = []
+        if not self.ipc:
+            instance.env_port = instance._allocate_port()
+        instance.env_address = instance._get_env_address(instance_id)
+        instance.server_port = instance._allocate_port(udp=True)
+        if self.sync_port:
+            instance.sync_port = instance._allocate_port()
+        if self.frame_buffer is not None:
+            instance.frame_buffer = SharedFrameBuffer(
+                self.frame_buffer.frame_shape,
+                num_slots=self.frame_buffer.num_slots,
+            )
+        for attr in ["server_process", "client_process", "context", "socket"]:
+            setattr(instance, attr, None)
+        # X server and watchdog stay with this environment
+        instance.xserver_process = None
+        instance.watchdog = None
+        instance.last_obs = None
+        instance.process_pool = None
+        instance.num_warm_instances = 0
+        instance.clean_config = True
+        # seeds are sampled here to keep them deterministic
+        if self.reseed_on_reset:
+            instance._sample_world_seed()
+            instance.reseed_on_reset = False
+
+        def _launch():
+            try:
+                instance._start_reset()
+                # wait until the initial observation arrived
+                if not instance.socket.poll(int(self.warm_launch_timeout * 1000)):
+                    raise TimeoutError("Warm Minetest instance did not respond!")
+            except Exception:  # noqa: B902
+                instance._close_instance()
+                raise
+            return instance
+
+        return instance, _launch
+
+    def _adopt_instance(self, instance: "Minetest"):
+        # Switch to a warm instance and release the current one in the background
+        old_instance = copy.copy(self)
+        for attr in self._instance_attributes:
+            setattr(self, attr, getattr(instance, attr))
+        self.process_pool.submit(old_instance._close_instance)
+
+    def _close_instance(self):
+        # Release the resources of the launched Minetest instance
+        if self.socket is not None:
+            self.socket.close()
+        if self.ipc and os.path.exists(self.env_address[len("ipc://") :]):
+            os.remove(self.env_address[len("ipc://") :])
+        # TODO improve process termination
+        # i.e. don't kill, but close signal
+        if self.client_process is not None:
+            self.client_process.kill()
+        if self.server_process is not None:
+            self.server_process.kill()
+        if self.frame_buffer is not None:
+            self.frame_buffer.close()
+            self.frame_buffer = None
+        for port in self.allocated_ports:
+            release_port(port)
+        self.allocated_ports = []
+        if self.reset_world:
+            self._delete_world()
+        if self.clean_config:
+            self._delete_config()
+
+    def _is_running(self) -> bool:
+        # Whether Minetest is running and waiting for an action
+        if self.socket is None or self.last_obs is None or not self._alive:
+            return False
+        for process in [self.server_process, self.client_process]:
+            if process is not None and process.poll() is not None:
+                return False
+        return True
 
-        # Receive initial observation
-        logging.debug("Waiting for first obs...")
-        byte_obs = self.socket.recv()
-        obs, _, _, _, _ = unpack_pb_obs(byte_obs)
+    def _finish_reset(self, byte_obs: bytes) -> Tuple[np.ndarray, Dict]:
+        start = time.perf_counter()
+        obs, _, _, info, _ = unpack_pb_obs(byte_obs, self.frame_buffer)
+        decode_time = time.perf_counter() - start
         self.last_obs = obs
-        logging.debug("Received first obs: {}".format(obs.shape))
-        return obs, {}
+        self.logger.debug(f"Received first obs: {self._last_frame().shape}")
+        reset_info = {"obs_bytes": len(byte_obs), "decode_time": decode_time}
+        if "segmentation_labels" in info:
+            # only sent with the first observation of a client
+            self.segmentation_labels = info["segmentation_labels"]
+        if "segmentation" in self.obs_modalities:
+            reset_info["segmentation_labels"] = self.segmentation_labels
+        return obs, reset_info
 
     def step(
         self,
@@ -511,33 +1136,160 @@ class Minetest(gym.Env):
             The next observation, the reward, whether the episode is truncated,
             or done, and additional info.
         """
-        # Send action
+        self.step_async(action)
+        return self.step_wait()
+
+    def step_async(self, action: Dict[str, Any]):
+        """Send an action without waiting for the resulting observation.
+
+        The client renders the next frame until `step_wait` is called.
+        If `pipelined` is set, the action is only queued and sent by `step_wait`
+        as soon as the observation of the previous action arrived.
+
+        Args:
+            action: The action to perform.
+
+        Raises:
+            RuntimeError: If the previous action was not waited for.
+        """
+        if self._pending_action is not None:
+            raise RuntimeError("Calling `step_async` twice without `step_wait`!")
+        self._pending_action = action
+        # a crashed or stalled instance is not sent anything until the next reset
+        if not self.pipelined and self._alive:
+            self._sent_action = action
+            self._alive = self._send_action(action)
+
+    def send_packed_action(self, pb_action, pack_time: float = 0.0) -> bool:
+        """Send an action that was already packed, e.g. by `pack_pb_actions`.
+
+        Lower-level counterpart of `step_async` for callers that pack the actions
+        of several environments at once, such as `MinetestVectorEnv`. The mouse
+        movement has to be scaled to pixels already.
+
+        Args:
+            pb_action: The packed protobuf action.
+            pack_time: Time in seconds it took to pack the action, recorded as
+                the pack phase if `profile` is set.
+
+        Returns:
+            Whether the Minetest processes are still alive.
+        """
+        if self.profiler is not None:
+            self._timings["pack"] = pack_time
+        if self.trace:
+            self.logger.debug("Sending action: %s", unpack_pb_action(pb_action))
+        return self._send_pb_action(pb_action)
+
+    def step_wait(self) -> Tuple[np.ndarray, float, bool, Dict[str, Any]]:
+        """Wait for the observation of the action sent by `step_async`.
+
+        Returns:
+            The next observation, the reward, whether the episode is truncated,
+            or done, and additional info. If `pipelined` is set, these result
+            from the action passed to the previous `step_async` call.
+            If Minetest died or stalled, the episode is truncated with the
+            last observation and the error in `minetest_error`.
+
+        Raises:
+            RuntimeError: If no action was sent by `step_async`.
+        """
+        if self._pending_action is None:
+            raise RuntimeError("Calling `step_wait` without calling `step_async`!")
+        action, self._pending_action = self._pending_action, None
+        if not self._alive:
+            dead_process = self.watchdog.dead_process if self.watchdog else None
+            return self._abort_episode(
+                ProcessDiedError(f"Minetest {dead_process or 'process'} died!"),
+            )
+
+        # Receive observation
+        if self.trace:
+            self.logger.debug("Waiting for obs...")
+        start = time.perf_counter()
+        try:
+            byte_obs = self._recv(self.step_timeout)
+        except (ProcessDiedError, TimeoutError) as e:
+            return self._abort_episode(e)
+        if self.profiler is not None:
+            self._timings["recv"] = time.perf_counter() - start
+        sent_action = self._sent_action
+        self._sent_action = None
+        if self.pipelined:
+            # send the queued action before decoding the observation,
+            # such that the client immediately renders the next frame
+            self._sent_action = action
+            self._alive = self._send_action(action)
+        return self._finish_step(byte_obs, sent_action)
+
+    def _send_action(self, action: Dict[str, Any]) -> bool:
+        # Send action and return whether the Minetest processes are still alive
+        start = time.perf_counter()
         if isinstance(action["MOUSE"], np.ndarray):
             action["MOUSE"] = action["MOUSE"].tolist()
         # Scale mouse action according to screen ratio
         action["MOUSE"][0] = int(action["MOUSE"][0] * self.max_mouse_move_x)
         action["MOUSE"][1] = int(action["MOUSE"][1] * self.max_mouse_move_y)
-        logging.debug("Sending action: {}".format(action))
+        if self.trace:
+            self.logger.debug("Sending action: %s", action)
         pb_action = pack_pb_action(action)
+        if self.profiler is not None:
+            self._timings["pack"] = time.perf_counter() - start
+        return self._send_pb_action(pb_action)
+
+    def _send_pb_action(self, pb_action) -> bool:
+        # Send packed action and return whether the Minetest processes are alive
+        if self.frame_skip > 1:
+            pb_action.frameSkip = self.frame_skip
+            pb_action.maxPool = self.frame_max_pool
+        start = time.perf_counter()
         self.socket.send(pb_action.SerializeToString())
+        if self.profiler is not None:
+            self._timings["send"] = time.perf_counter() - start
 
-        # TODO more robust check for whether a server/client
-        # is alive while receiving observations
-        for process in [self.server_process, self.client_process]:
-            if process is not None and process.poll() is not None:
-                return self.last_obs, 0.0, True, False, {}
+        # processes are polled by the watchdog instead of on every step
+        return self.watchdog is None or self.watchdog.dead_process is None
 
-        # Receive observation
-        logging.debug("Waiting for obs...")
-        byte_obs = self.socket.recv()
-        next_obs, rew, done, info, last_action = unpack_pb_obs(byte_obs)
+    def _finish_step(
+        self,
+        byte_obs: bytes,
+        action: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, float, bool, Dict[str, Any]]:
+        start = time.perf_counter()
+        next_obs, rew, done, info, last_action = unpack_pb_obs(
+            byte_obs,
+            self.frame_buffer,
+        )
+        decode_time = time.perf_counter() - start
+        client_timings = info.pop("client_timings", {})
+        if self.profiler is not None:
+            self.profiler.record(
+                {**self._timings, "parse": decode_time, **client_timings},
+            )
+            self._timings = {}
 
-        if last_action:
+        if action is not None and last_action:
             assert action == last_action
 
         self.last_obs = next_obs
-        logging.debug(f"Received obs - {next_obs.shape}; reward - {rew}; info - {info}")
-        return next_obs, rew, done, False, {"minetest_info": info}
+        if self.trace:
+            self.logger.debug(
+                "Received obs - %s; reward - %s; info - %s",
+                self._last_frame().shape,
+                rew,
+                info,
+            )
+        return (
+            next_obs,
+            rew,
+            done,
+            False,
+            {
+                **info,
+                "obs_bytes": len(byte_obs),
+                "decode_time": decode_time,
+            },
+        )
 
     def render(self) -> Optional[np.ndarray]:
         """Render the environment.
@@ -557,17 +1309,20 @@ class Minetest(gym.Env):
 
                 self.render_fig = plt.figure(
                     num="Minetest Env",
-                    figsize=(3 * self.display_size[0] / self.display_size[1], 3),
+                    figsize=(3 * self.obs_size[0] / self.obs_size[1], 3),
+                )
+                self.render_img = self.render_fig.gca().imshow(
+                    self._last_frame(squeeze=True),
+                    cmap="gray",
                 )
-                self.render_img = self.render_fig.gca().imshow(self.last_obs)
                 self.render_fig.gca().axis("off")
                 self.render_fig.gca().margins(0, 0)
                 self.render_fig.gca().autoscale_view()
             else:
-                self.render_img.set_data(self.last_obs)
+                self.render_img.set_data(self._last_frame(squeeze=True))
             plt.draw(), plt.pause(1 / self.metadata["render_fps"])
         elif self.render_mode == "rgb_array":
-            return self.last_obs
+            return self._last_frame()
         else:
             raise NotImplementedError(
                 "You are calling 'render()' with an unsupported"
@@ -575,21 +1330,66 @@ class Minetest(gym.Env):
                 f"Supported modes: {self.metadata['render_modes']}",
             )
 
+    def _last_frame(self, squeeze: bool = False) -> Optional[np.ndarray]:
+        # Frame of the last observation, without the channel axis
+        # of grayscale frames if `squeeze` is set
+        frame = self.last_obs
+        if isinstance(frame, dict):
+            frame = frame["rgb"]
+        if squeeze and frame is not None and self.obs_format == "gray":
+            frame = frame.squeeze(-1)
+        return frame
+
+    def get_profile(self, bins: int = 20) -> Dict[str, Dict[str, Any]]:
+        """Aggregate the phase durations of the recorded steps.
+
+        Python-side phases are `pack`, `send`, `recv` (waiting for the
+        observation) and `parse`. The client-side phases `client_sync_wait`,
+        `client_input`, `client_step`, `client_render`, `client_capture` and
+        `client_send` are measured by the Minetest client.
+
+        Args:
+            bins: Number of histogram bins.
+
+        Returns:
+            Statistics and histogram of the durations in seconds of each phase,
+            see `StepProfiler.summary`.
+
+        Raises:
+            RuntimeError: if the environment was created without `profile`.
+        """
+        if self.profiler is None:
+            raise RuntimeError("Profiling is disabled, set `profile=True`!")
+        return self.profiler.summary(bins)
+
+    def dump_profile(self, path: os.PathLike):
+        """Write the recorded phase durations to a file.
+
+        Args:
+            path: Path of a CSV file (one row per step) or a JSON file
+                (summary), depending on its extension.
+
+        Raises:
+            RuntimeError: if the environment was created without `profile`.
+        """
+        if self.profiler is None:
+            raise RuntimeError("Profiling is disabled, set `profile=True`!")
+        self.profiler.dump(path)
+
     def close(self) -> None:
         """Close the environment."""
         if self.render_fig is not None:
             plt.close()
-        if self.socket is not None:
-            self.socket.close()
-        # TODO improve process termination
-        # i.e. don't kill, but close signal
-        if self.client_process is not None:
-            self.client_process.kill()
-        if self.server_process is not None:
-            self.server_process.kill()
+        if self.process_pool is not None:
+            self.process_pool.close()
+            self.process_pool = None
+        if self.watchdog is not None:
+            self.watchdog.close()
+        self._close_instance()
         if self.xserver_process is not None:
             self.xserver_process.terminate()
-        if self.reset_world:
-            self._delete_world()
-        if self.clean_config:
-            self._delete_config()
+        if self.xserver is not None:
+            self.xserver.release_screen(self.x_display)
+            self.xserver = None
+        self.logger.removeHandler(self.log_handler)
+        self.log_handler.close()
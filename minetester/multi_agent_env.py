@@ -0,0 +1,277 @@
+"""Multi-agent Minetest environment with many clients on one server."""
+import logging
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
+
+import gymnasium as gym
+import numpy as np
+
+from minetester.minetest_env import Minetest
+from minetester.utils import NOOP_ACTION
+from minetester.watchdog import ProcessDiedError
+
+
+class MinetestMultiAgentEnv:
+    """Multi-agent Minetest environment.
+
+    Runs a single Minetest server and one client per agent in a shared world.
+    The server advances the world in lock-step: it waits until all clients
+    finished their step, advances by `sync_dtime` and sends each client
+    the reward, terminal flag and info of its player from the
+    `REWARD`, `TERMINAL` and `INFO` tables.
+
+    Follows the parallel API of PettingZoo, i.e. observations, rewards, etc.
+    are dictionaries keyed by agent name. Agents whose episode ended are removed
+    from `agents` and perform noop actions until all episodes ended,
+    since the server only advances once every client is done.
+    """
+
+    metadata = {"render_modes": ["rgb_array"], "name": "minetest_multi_agent_v0"}
+
+    def __init__(
+        self,
+        num_agents: int = 2,
+        agent_names: Optional[List[str]] = None,
+        env_kwargs: Optional[Dict[str, Any]] = None,
+        base_seed: int = 0,
+        env_port: int = 0,
+        server_port: int = 0,
+        sync_port: int = 0,
+        sync_dtime: float = 0.05,
+    ):
+        """Initialize multi-agent Minetest environment.
+
+        Args:
+            num_agents: Number of agents.
+            agent_names: Player names of the agents. Defaults to `agent_<i>`.
+            env_kwargs: Keyword arguments passed to the `Minetest` environment
+                of each agent.
+            base_seed: Seed of the first agent. Agent `i` is seeded with
+                `base_seed + i`. The world is generated from the seed
+                of the first agent.
+            env_port: Port of the first agent. Agent `i` uses `env_port + i`.
+                Free ports are allocated for all agents if 0.
+            server_port: Port of the Minetest server. Allocated if 0.
+            sync_port: Port the server synchronizes the clients on. Allocated if 0.
+            sync_dtime: In-game time between two steps.
+
+        Raises:
+            ValueError: If the agent names are not unique or `env_kwargs`
+                enable options that are not supported with multiple agents.
+        """
+        agent_names = agent_names or [f"agent_{idx}" for idx in range(num_agents)]
+        if len(agent_names) != num_agents or len(set(agent_names)) != num_agents:
+            raise ValueError(f"Expected {num_agents} unique agent names!")
+        env_kwargs = dict(env_kwargs or {})
+        for key in ["pipelined", "num_warm_instances", "in_process_server"]:
+            if env_kwargs.get(key):
+                raise ValueError(f"'{key}' is not supported by multi-agent envs!")
+        shared_kwargs = {
+            **env_kwargs,
+            "server_port": server_port,
+            "sync_port": sync_port,
+            "sync_dtime": sync_dtime,
+        }
+
+        # The environment of the first agent runs the server
+        # and allocates its ports
+        host = Minetest(
+            **{
+                **shared_kwargs,
+                "env_port": env_port,
+                "client_name": agent_names[0],
+                "base_seed": base_seed,
+            },
+        )
+        self.envs = {agent_names[0]: host}
+        # All other agents connect their clients to the same server and world
+        for idx, name in enumerate(agent_names[1:], start=1):
+            # each agent writes and deletes its own copy of the config
+            config_path = os.path.join(
+                host.artefact_dir,
+                f"{host.unique_env_id}_{name}.conf",
+            )
+            shutil.copyfile(host.config_path, config_path)
+            self.envs[name] = Minetest(
+                **{
+                    **shared_kwargs,
+                    "server_port": host.server_port,
+                    "sync_port": host.sync_port,
+                    # clients are launched locally by this class
+                    "ipc": shared_kwargs.get("ipc", host.ipc),
+                    "env_port": env_port + idx if env_port else 0,
+                    "client_name": name,
+                    "base_seed": base_seed + idx,
+                    "start_minetest": False,
+                    "start_xvfb": False,
+                    "x_display": host.x_display,
+                    "artefact_dir": host.artefact_dir,
+                    "world_dir": host.world_dir,
+                    "config_path": config_path,
+                },
+            )
+        self.host = host
+
+        self.possible_agents = list(agent_names)
+        self.agents = []
+        self.render_mode = "rgb_array"
+        self._alive = {}
+
+    def observation_space(self, agent: str) -> gym.Space:
+        """Get the observation space of an agent.
+
+        Args:
+            agent: Name of the agent.
+
+        Returns:
+            Observation space of the agent's environment.
+        """
+        return self.envs[agent].observation_space
+
+    def action_space(self, agent: str) -> gym.Space:
+        """Get the action space of an agent.
+
+        Args:
+            agent: Name of the agent.
+
+        Returns:
+            Action space of the agent's environment.
+        """
+        return self.envs[agent].action_space
+
+    def reset(
+        self,
+        seed: Optional[int] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Dict[str, np.ndarray], Dict[str, Dict[str, Any]]]:
+        """Reset the environment of all agents.
+
+        Args:
+            seed: Seed for the environment. Agent `i` is seeded with `seed + i`.
+            options: Currently unused.
+
+        Returns:
+            Dictionaries of initial observations and infos.
+        """
+        del options
+        restart = not (self.host.fast_reset and self.host._is_running())
+        # (Re)starts the server and the client of the first agent
+        self.host._start_reset(seed=seed)
+        for idx, env in enumerate(self.envs.values()):
+            if env is self.host:
+                continue
+            env_seed = None if seed is None else seed + idx
+            # clients of aborted episodes are relaunched as well
+            if restart or not env._is_running():
+                env._seed(seed=env_seed)
+                if env.client_process is not None:
+                    env.client_process.kill()
+                env._reset_zmq()
+                env._start_client(env._get_log_path())
+                # the client cannot continue without the shared server
+                env.watchdog.watch(
+                    {"client": env.client_process, "server": self.host.server_process},
+                )
+            else:
+                env._start_reset(seed=env_seed)
+
+        observations, infos = {}, {}
+        for agent, env in self.envs.items():
+            logging.debug(f"Waiting for first obs of {agent}...")
+            byte_obs = env._recv(env.reset_timeout)
+            observations[agent], infos[agent] = env._finish_reset(byte_obs)
+        self.agents = list(self.possible_agents)
+        self._alive = {agent: True for agent in self.possible_agents}
+        return observations, infos
+
+    def step(
+        self,
+        actions: Dict[str, Dict[str, Any]],
+    ) -> Tuple[
+        Dict[str, np.ndarray],
+        Dict[str, float],
+        Dict[str, bool],
+        Dict[str, bool],
+        Dict[str, Dict[str, Any]],
+    ]:
+        """Perform an action for each active agent.
+
+        Args:
+            actions: Actions keyed by agent name.
+
+        Returns:
+            Dictionaries of observations, rewards, terminations, truncations
+            and infos of the active agents.
+        """
+        sent = []
+        for agent, env in self.envs.items():
+            if not self._alive[agent]:
+                continue
+            # agents that are done keep the lock-step going
+            action = actions[agent] if agent in self.agents else dict(NOOP_ACTION)
+            self._alive[agent] = env._send_action(action)
+            if self._alive[agent]:
+                sent.append(agent)
+
+        observations, rewards, terminations, truncations, infos = {}, {}, {}, {}, {}
+        for agent in self.agents:
+            if not self._alive[agent]:
+                # Minetest process died, truncate the episode
+                logging.warning(f"Minetest client of {agent} is not alive!")
+                env = self.envs[agent]
+                dead_process = env.watchdog.dead_process or "process"
+                error = ProcessDiedError(f"Minetest {dead_process} died!")
+                (
+                    observations[agent],
+                    rewards[agent],
+                    terminations[agent],
+                    truncations[agent],
+                    infos[agent],
+                ) = self._abort_agent(agent, error)
+        for agent in sent:
+            env = self.envs[agent]
+            try:
+                byte_obs = env._recv(env.step_timeout)
+            except (ProcessDiedError, TimeoutError) as e:
+                self._alive[agent] = False
+                obs, rew, done, truncated, info = self._abort_agent(agent, e)
+            else:
+                obs, rew, done, truncated, info = env._finish_step(byte_obs)
+            if agent in self.agents:
+                observations[agent], rewards[agent] = obs, rew
+                terminations[agent], truncations[agent] = done, truncated
+                infos[agent] = info
+
+        self.agents = [
+            agent
+            for agent in self.agents
+            if not (terminations[agent] or truncations[agent])
+        ]
+        return observations, rewards, terminations, truncations, infos
+
+    def _abort_agent(
+        self,
+        agent: str,
+        error: Exception,
+    ) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
+        # Truncate the episode of a failed agent. Only its client is stopped,
+        # the shared server keeps running for the other agents unless it died.
+        server = self.host.server_process
+        server_died = server is not None and server.poll() is not None
+        return self.envs[agent]._abort_episode(error, kill_server=server_died)
+
+    def render(self) -> Dict[str, np.ndarray]:
+        """Render the environment.
+
+        Returns:
+            Last observations keyed by agent name.
+        """
+        return {agent: env.last_obs for agent, env in self.envs.items()}
+
+    def close(self):
+        """Close the clients and the server."""
+        for env in self.envs.values():
+            if env is not self.host:
+                env.close()
+        self.host.close()
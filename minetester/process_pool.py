@@ -0,0 +1,90 @@
+"""Pool of pre-launched Minetest instances."""
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Tuple
+
+
+class WarmProcessPool:
+    """Pool that keeps launched instances warm in the background.
+
+    Instances are launched in background threads, so that the startup
+    latency of the next instance is hidden behind the current episode.
+    Taking an instance from the pool immediately triggers a refill.
+    """
+
+    def __init__(
+        self,
+        prepare_fn: Callable[[], Tuple[Any, Callable[[], Any]]],
+        cleanup_fn: Callable[[Any], None],
+        size: int = 1,
+    ):
+        """Initialize the pool.
+
+        Args:
+            prepare_fn: Called in the caller's thread to prepare a new instance,
+                e.g. to sample seeds deterministically. Returns the prepared
+                instance and a function that launches it in a background thread
+                and returns the launched instance.
+            cleanup_fn: Releases an instance that is not used anymore,
+                including prepared instances whose launch was cancelled.
+            size: Number of instances kept warm.
+
+        Raises:
+            ValueError: If `size` is smaller than 1.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1!")
+        self.prepare_fn = prepare_fn
+        self.cleanup_fn = cleanup_fn
+        self.size = size
+        # one extra worker for cleanup tasks
+        self._executor = ThreadPoolExecutor(max_workers=size + 1)
+        self._futures = deque()
+
+    def fill(self):
+        """Launch instances until `size` instances are warm or launching."""
+        while len(self._futures) < self.size:
+            instance, launch_fn = self.prepare_fn()
+            self._futures.append((instance, self._executor.submit(launch_fn)))
+
+    def get(self) -> Any:
+        """Take the next warm instance and trigger a refill.
+
+        Returns:
+            The launched instance. Blocks until it is ready.
+        """
+        if not self._futures:
+            self.fill()
+        _, future = self._futures.popleft()
+        self.fill()
+        return future.result()
+
+    def submit(self, fn: Callable[[], Any]) -> Future:
+        """Run a function in the background, e.g. to release an old instance.
+
+        Args:
+            fn: Function to run in one of the pool's threads.
+
+        Returns:
+            Future of the result of `fn`.
+        """
+        return self._executor.submit(fn)
+
+    def clear(self):
+        """Release all warm instances."""
+        while self._futures:
+            instance, future = self._futures.popleft()
+            if future.cancel():
+                # the launch never ran, but the instance was already prepared
+                self.cleanup_fn(instance)
+                continue
+            try:
+                self.cleanup_fn(future.result())
+            except Exception as e:  # noqa: B902
+                logging.warning(f"Failed to launch warm instance: {e}")
+
+    def close(self):
+        """Release all warm instances and stop the background threads."""
+        self.clear()
+        self._executor.shutdown(wait=True)
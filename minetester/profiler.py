@@ -0,0 +1,96 @@
+"""Profiling of the phases of environment steps."""
+import csv
+import json
+import os
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class StepProfiler:
+    """Collects the durations of the phases of environment steps.
+
+    Each step is recorded as a dictionary mapping phase names to durations
+    in seconds. Phases measured by the Minetest client are prefixed
+    with `client_`.
+    """
+
+    def __init__(self, max_steps: Optional[int] = 100000):
+        """Initialize the profiler.
+
+        Args:
+            max_steps: Maximum number of most recent steps that are kept.
+                Keeps all steps if None.
+        """
+        self.steps = deque(maxlen=max_steps)
+
+    def record(self, timings: Dict[str, float]):
+        """Record the phase durations of a step.
+
+        Args:
+            timings: Duration in seconds of each phase of the step.
+        """
+        self.steps.append(timings)
+
+    def reset(self):
+        """Discard all recorded steps."""
+        self.steps.clear()
+
+    @property
+    def phases(self) -> List[str]:
+        """Get the names of all recorded phases.
+
+        Returns:
+            Names of the phases in order of their first occurrence.
+        """
+        phases = {}
+        for timings in self.steps:
+            phases.update(dict.fromkeys(timings))
+        return list(phases)
+
+    def summary(self, bins: int = 20) -> Dict[str, Dict[str, Any]]:
+        """Aggregate the recorded durations of each phase.
+
+        Args:
+            bins: Number of histogram bins.
+
+        Returns:
+            Statistics (count, mean, std, min, percentiles and max in seconds)
+            and histogram (counts and bin edges) of the durations of each phase.
+        """
+        summary = {}
+        for phase in self.phases:
+            durations = np.array(
+                [timings[phase] for timings in self.steps if phase in timings],
+            )
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+            counts, edges = np.histogram(durations, bins=bins)
+            summary[phase] = {
+                "count": len(durations),
+                "mean": float(durations.mean()),
+                "std": float(durations.std()),
+                "min": float(durations.min()),
+                "p50": float(p50),
+                "p90": float(p90),
+                "p99": float(p99),
+                "max": float(durations.max()),
+                "histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+            }
+        return summary
+
+    def dump(self, path: os.PathLike):
+        """Write the recorded steps to a file.
+
+        Args:
+            path: Output path. CSV files (`.csv`) contain one row of phase
+                durations per step, any other file the JSON summary.
+        """
+        if str(path).endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=self.phases)
+                writer.writeheader()
+                writer.writerows(self.steps)
+        else:
+            with open(path, "w") as f:
+                json.dump(self.summary(), f, indent=2)
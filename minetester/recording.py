@@ -0,0 +1,317 @@
+"""Recording of trajectories published by a Minetest client in record mode."""
+import glob
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import zmq
+
+from minetester.proto import objects_pb2 as pb_objects
+from minetester.utils import unpack_pb_obs
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Header of trajectory files, followed by records of
+# a little-endian uint32 length and a serialized `Observation`
+MAGIC = b"MTTRAJ01"
+_LENGTH = struct.Struct("<I")
+
+Step = Tuple[np.ndarray, float, bool, Dict[str, Any], Optional[Dict[str, int]]]
+
+
+class TrajectoryWriter:
+    """Writes serialized observations to length-prefixed trajectory files.
+
+    Records are written by a background thread, such that receiving
+    observations is not blocked by compression and disk I/O.
+    The output is split into files `<prefix>_<index>.mtr` which are rotated
+    once they exceed `rotate_bytes` or are older than `rotate_seconds`.
+    """
+
+    def __init__(
+        self,
+        out_dir: os.PathLike,
+        prefix: str = "trajectory",
+        compress: bool = False,
+        compression_level: int = 3,
+        rotate_bytes: Optional[int] = 2**30,
+        rotate_seconds: Optional[float] = None,
+        max_queue_size: int = 0,
+    ):
+        """Initialize trajectory writer and start its background thread.
+
+        Args:
+            out_dir: Directory of the trajectory files.
+            prefix: Prefix of the trajectory file names.
+            compress: Whether to compress raw images with zstd. The codec
+                is stored in the `Image` message of each record.
+            compression_level: Zstd compression level.
+            rotate_bytes: Maximum size of a file before the next one is started.
+            rotate_seconds: Maximum duration of a file before the next one is started.
+            max_queue_size: Maximum number of records waiting to be written,
+                `write` blocks if the queue is full. Unbounded if 0.
+
+        Raises:
+            ImportError: If `compress` is set but zstandard is not installed.
+        """
+        if compress and zstandard is None:
+            raise ImportError("Compressing images requires zstandard!")
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.files = []
+        self.num_records = 0
+        self._compressor = (
+            zstandard.ZstdCompressor(level=compression_level) if compress else None
+        )
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        self._file = None
+        self._file_size = 0
+        self._file_start = 0.0
+        self._error = None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, record: bytes):
+        """Queue a serialized observation for writing.
+
+        Args:
+            record: Serialized `Observation` message.
+
+        Raises:
+            RuntimeError: If writing a previous record failed.
+        """
+        if self._error is not None:
+            raise RuntimeError("Trajectory writer failed!") from self._error
+        self._queue.put(record)
+
+    def close(self):
+        """Write all queued records and close the current file.
+
+        Raises:
+            RuntimeError: If writing a record failed.
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Trajectory writer failed!") from self._error
+
+    def __enter__(self) -> "TrajectoryWriter":
+        """Use the writer as context manager.
+
+        Returns:
+            The writer itself.
+        """
+        return self
+
+    def __exit__(self, *args):
+        """Close the writer when leaving the context.
+
+        Args:
+            args: Exception type, value and traceback, unused.
+        """
+        self.close()
+
+    def _run(self):
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                self._write_record(self._encode(record))
+        except Exception as e:  # noqa: B902
+            logging.error(f"Writing trajectory failed: {e}")
+            self._error = e
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+    def _encode(self, record: bytes) -> bytes:
+        if self._compressor is None:
+            return record
+        pb_obs = pb_objects.Observation()
+        pb_obs.ParseFromString(record)
+        image = pb_obs.image
+        if image.codec != pb_objects.RAW or not image.data:
+            return record
+        image.data = self._compressor.compress(image.data)
+        image.codec = pb_objects.ZSTD
+        return pb_obs.SerializeToString()
+
+    def _write_record(self, record: bytes):
+        if self._file is None or self._should_rotate():
+            self._open_next_file()
+        self._file.write(_LENGTH.pack(len(record)))
+        self._file.write(record)
+        self._file_size += _LENGTH.size + len(record)
+        self.num_records += 1
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_bytes is not None and self._file_size >= self.rotate_bytes:
+            return True
+        return (
+            self.rotate_seconds is not None
+            and time.monotonic() - self._file_start >= self.rotate_seconds
+        )
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        path = os.path.join(self.out_dir, f"{self.prefix}_{len(self.files):05d}.mtr")
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._file_size = len(MAGIC)
+        self._file_start = time.monotonic()
+        self.files.append(path)
+        logging.info(f"Writing trajectory to {path}")
+
+
+class TrajectoryRecorder:
+    """Records the observations published by a Minetest client in record mode.
+
+    Subscribes to the PUB socket the client binds with `--record` and passes
+    each message to a `TrajectoryWriter`. The receive loop only queues
+    messages, so that the socket is drained at the client's frame rate.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        writer: TrajectoryWriter,
+        timeout: int = 1000,
+        max_attempts: int = 10,
+        max_queue_length: int = 0,
+    ):
+        """Initialize trajectory recorder.
+
+        Args:
+            address: Address of the client's PUB socket, e.g. `localhost:5555`.
+            writer: Writer of the received observations.
+            timeout: Timeout in milliseconds of a receive attempt.
+            max_attempts: Number of consecutive timeouts after which
+                the session is considered finished.
+            max_queue_length: Receive high water mark of the socket.
+                Messages are never dropped if 0.
+        """
+        self.writer = writer
+        self.max_attempts = max_attempts
+        self._recording = False
+
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.RCVHWM, max_queue_length)
+        self.socket.setsockopt(zmq.RCVTIMEO, timeout)
+        self.socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self.socket.connect(f"tcp://{address}")
+
+    def start(self):
+        """Record until `stop` is called or the client stops publishing."""
+        self._recording = True
+        num_attempts = 0
+        while self._recording:
+            try:
+                self.writer.write(self.socket.recv())
+                num_attempts = 0
+            except zmq.Again:
+                num_attempts += 1
+                logging.info(f"Reception attempts: {num_attempts}")
+                if num_attempts >= self.max_attempts:
+                    logging.info("Session finished.")
+                    self._recording = False
+
+    def stop(self):
+        """Stop recording after the current receive attempt."""
+        self._recording = False
+
+    def close(self):
+        """Close the socket and flush the writer."""
+        self.socket.close()
+        self.context.term()
+        self.writer.close()
+
+
+class TrajectoryReader:
+    """Reads trajectory files written by a `TrajectoryWriter`.
+
+    Files are memory-mapped and read in the order of their names,
+    episodes may span several files.
+    """
+
+    def __init__(self, paths: Union[os.PathLike, List[os.PathLike]]):
+        """Initialize trajectory reader.
+
+        Args:
+            paths: Trajectory file, directory of trajectory files
+                or list of trajectory files.
+        """
+        if isinstance(paths, (list, tuple)):
+            self.files = list(paths)
+        elif os.path.isdir(paths):
+            self.files = sorted(glob.glob(os.path.join(paths, "*.mtr")))
+        else:
+            self.files = [paths]
+
+    def records(self) -> Iterator[bytes]:
+        """Iterate over the serialized observations of all files.
+
+        Yields:
+            Serialized `Observation` message of each record.
+
+        Raises:
+            ValueError: If a file is not a trajectory file.
+        """
+        for path in self.files:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size <= len(MAGIC):
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    if data[: len(MAGIC)] != MAGIC:
+                        raise ValueError(f"{path} is not a trajectory file!")
+                    offset = len(MAGIC)
+                    while offset + _LENGTH.size <= len(data):
+                        (length,) = _LENGTH.unpack_from(data, offset)
+                        offset += _LENGTH.size
+                        if offset + length > len(data):
+                            logging.warning(f"Truncated record at the end of {path}")
+                            break
+                        yield data[offset : offset + length]
+                        offset += length
+
+    def __iter__(self) -> Iterator[Step]:
+        """Iterate over the steps of all files.
+
+        Yields:
+            Image, reward, done flag, info and action of each step,
+            see `unpack_pb_obs`.
+        """
+        for record in self.records():
+            yield unpack_pb_obs(record)
+
+    def episodes(self) -> Iterator[List[Step]]:
+        """Iterate over the episodes.
+
+        Yields:
+            List of the steps of each episode, ending with a terminal step
+            (except for an unfinished last episode).
+        """
+        episode = []
+        for step in self:
+            episode.append(step)
+            if step[2]:
+                yield episode
+                episode = []
+        if episode:
+            yield episode
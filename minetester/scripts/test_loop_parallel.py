@@ -20,11 +20,9 @@ if __name__ == "__main__":
 
         def _init():
             # Make sure that each Minetest instance has
-            # - different server and client ports
-            # - different and deterministic seeds
+            # different and deterministic seeds,
+            # free ports are allocated automatically
             env = Minetest(
-                env_port=5555 + rank,
-                server_port=30000 + rank,
                 base_seed=seed + rank,
                 **env_kwargs,
             )
@@ -37,15 +35,17 @@ if __name__ == "__main__":
 
         return _init
 
+    # Start X server on an unused display
+    xserver = start_xserver(None)
+
     # Env settings
     seed = 42
     max_steps = 100
-    x_display = 4
     env_kwargs = {
         "display_size": (600, 400),
         "fov": 72,
         "headless": True,
-        "x_display": x_display,
+        "x_display": xserver.display_idx,
     }
 
     # Create a vectorized environment
@@ -58,9 +58,6 @@ if __name__ == "__main__":
         ],
     )
 
-    # Start X server
-    xserver = start_xserver(x_display)
-
     # Start loop
     render = True
     obs, _ = venv.reset()
@@ -0,0 +1,114 @@
+"""Shared memory frame buffer between Minetest client and environment."""
+import struct
+import uuid
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Layout must match src/client/shmbuffer.h
+SHM_MAGIC = b"MTSH"
+SHM_HEADER = struct.Struct("<4sIQ")
+SHM_HEADER_SIZE = 64
+
+
+class SharedFrameBuffer:
+    """Ring buffer of frames in POSIX shared memory.
+
+    The buffer is created and owned by the environment. The Minetest client
+    maps it and writes each frame into the next slot, so that the observation
+    message only needs to carry the slot index.
+
+    Frames returned by `get_frame` are read-only views into the mapping.
+    A view stays valid until the client wraps around the ring buffer,
+    i.e. for `num_slots - 1` further steps. Copy frames that have to be kept
+    longer than that.
+    """
+
+    def __init__(
+        self,
+        frame_shape: Tuple[int, ...],
+        num_slots: int = 2,
+        name: Optional[str] = None,
+    ):
+        """Create a shared memory frame buffer.
+
+        Args:
+            frame_shape: Maximum shape of a single uint8 frame.
+            num_slots: Number of frames in the ring buffer.
+            name: Name of the shared memory segment. Generated if not provided.
+
+        Raises:
+            ValueError: If there are less than 2 slots.
+        """
+        if num_slots < 2:
+            raise ValueError("Shared frame buffer requires at least 2 slots!")
+        self.frame_shape = tuple(frame_shape)
+        self.num_slots = num_slots
+        self.slot_size = int(np.prod(self.frame_shape))
+        name = name or f"minetester_{uuid.uuid4().hex[:16]}"
+        self._shm = shared_memory.SharedMemory(
+            name=name,
+            create=True,
+            size=SHM_HEADER_SIZE + self.num_slots * self.slot_size,
+        )
+        SHM_HEADER.pack_into(
+            self._shm.buf,
+            0,
+            SHM_MAGIC,
+            self.num_slots,
+            self.slot_size,
+        )
+        self._slots = np.ndarray(
+            (self.num_slots, self.slot_size),
+            dtype=np.uint8,
+            buffer=self._shm.buf,
+            offset=SHM_HEADER_SIZE,
+        )
+
+    @property
+    def name(self) -> str:
+        """Get the name of the shared memory segment.
+
+        Returns:
+            Name the client opens the segment with.
+        """
+        return self._shm.name
+
+    def get_frame(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """Get a read-only view of the frame stored in a slot.
+
+        Args:
+            slot: Index of the slot.
+            shape: Shape of the frame.
+
+        Returns:
+            View of the frame.
+
+        Raises:
+            ValueError: If a frame of `shape` does not fit into a slot.
+        """
+        size = int(np.prod(shape))
+        if size > self.slot_size:
+            raise ValueError(
+                f"Frame of shape {shape} does not fit into slot of {self.slot_size}"
+                " bytes!",
+            )
+        frame = self._slots[slot, :size].reshape(shape)
+        frame.flags.writeable = False
+        return frame
+
+    def close(self):
+        """Release and unlink the shared memory segment."""
+        if self._shm is None:
+            return
+        # drop the exported view before closing the mapping
+        self._slots = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # frames are still referenced, the mapping is released
+            # once they are garbage collected
+            pass
+        self._shm.unlink()
+        self._shm = None
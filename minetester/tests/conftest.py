@@ -1,7 +1,12 @@
 import os
+from typing import Any, Dict, Optional
 
+import numpy as np
 import pytest
 
+from minetester.proto import objects_pb2 as pb_objects
+from minetester.utils import pack_pb_action
+
 
 @pytest.fixture
 def unused_xserver_number():
@@ -11,3 +16,30 @@ def unused_xserver_number():
             continue
         else:
             return servernum
+
+
+@pytest.fixture
+def make_record():
+    """Get a factory of serialized observations as written by the client."""
+
+    def _make_record(
+        step: int,
+        terminal: bool,
+        action: Optional[Dict[str, Any]] = None,
+        info_fields: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        pb_obs = pb_objects.Observation()
+        pb_obs.image.width, pb_obs.image.height = 4, 2
+        pb_obs.image.data = np.full((2, 4, 3), step, dtype=np.uint8).tobytes()
+        pb_obs.reward = float(step)
+        pb_obs.terminal = terminal
+        if action is not None:
+            pb_obs.action.CopyFrom(pack_pb_action(action))
+        for key, value in (info_fields or {}).items():
+            if isinstance(value, str):
+                pb_obs.info_fields[key].string_value = value
+            else:
+                pb_obs.info_fields[key].int_value = value
+        return pb_obs.SerializeToString()
+
+    return _make_record
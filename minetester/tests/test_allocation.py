@@ -0,0 +1,18 @@
+"""Tests for port allocation."""
+from minetester.allocation import PortAllocator
+
+
+def test_port_allocator(tmp_path):
+    """Test that reserved ports are not handed out by other allocators."""
+    allocator = PortAllocator(lock_dir=tmp_path)
+    other_allocator = PortAllocator(lock_dir=tmp_path)
+    ports = {allocator.allocate() for _ in range(10)}
+    assert len(ports) == 10
+    assert allocator.allocate(udp=True) > 0
+
+    other_ports = {other_allocator.allocate() for _ in range(10)}
+    assert not ports & other_ports
+
+    port = ports.pop()
+    allocator.release(port)
+    assert port not in allocator._locks
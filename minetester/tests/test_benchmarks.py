@@ -0,0 +1,56 @@
+"""Tests for the benchmark suite."""
+import os
+
+from minetester.benchmarks import compare_reports, config_to_env_kwargs, expand_grid
+from minetester.benchmarks.suite import _cpu_time, _proc_rss
+
+
+def test_expand_grid():
+    """Test that configurations cover all combinations of the parameters."""
+    configs = expand_grid(num_envs=[1, 4], transport=["raw", "shm"])
+    assert len(configs) == 4
+    assert {(config["num_envs"], config["transport"]) for config in configs} == {
+        (1, "raw"),
+        (1, "shm"),
+        (4, "raw"),
+        (4, "shm"),
+    }
+    assert all(config["display"] == "headless" for config in configs)
+
+
+def test_config_to_env_kwargs():
+    """Test the environment arguments of a benchmark configuration."""
+    all_kwargs = config_to_env_kwargs(
+        {"display": "xvfb", "sync": "sync", "num_envs": 2, "transport": "shm"},
+    )
+    assert len(all_kwargs) == 2
+    assert all_kwargs[0]["start_xvfb"] and not all_kwargs[0]["headless"]
+    assert all_kwargs[0]["shared_memory"]
+    # sync ports are allocated by each environment
+    assert all_kwargs[0]["sync_port"] == 0
+    assert all_kwargs[0]["sync_dtime"] == all_kwargs[0]["dtime"]
+
+
+def test_compare_reports():
+    """Test that regressions are detected in both directions."""
+    config = {"num_envs": 1}
+    baseline = {
+        "results": [
+            {"config": config, "metrics": {"steps_per_sec": 100, "rss_per_env_mb": 50}},
+        ],
+    }
+    current = {
+        "results": [
+            {"config": config, "metrics": {"steps_per_sec": 80, "rss_per_env_mb": 51}},
+        ],
+    }
+    regressions = compare_reports(baseline, current, threshold=0.1)
+    assert [regression["metric"] for regression in regressions] == ["steps_per_sec"]
+    assert compare_reports(current, baseline, threshold=0.1) == []
+
+
+def test_process_stats():
+    """Test reading CPU time and RSS of a process."""
+    pid = os.getpid()
+    assert pid in _cpu_time([pid])
+    assert _proc_rss(pid) > 0
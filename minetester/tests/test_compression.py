@@ -0,0 +1,50 @@
+"""Tests for decoding compressed frames."""
+import io
+import zlib
+
+import numpy as np
+import pytest
+
+from minetester.compression import check_codec, decode_frame
+from minetester.proto import objects_pb2 as pb_objects
+
+
+@pytest.fixture
+def frame():
+    """Random RGB frame."""
+    return np.random.default_rng(0).integers(0, 256, (6, 8, 3), dtype=np.uint8)
+
+
+def test_decode_lossless(frame):
+    """Test decoding raw, zlib and png frames."""
+    assert np.array_equal(
+        decode_frame(frame.tobytes(), pb_objects.RAW, frame.shape),
+        frame,
+    )
+    assert np.array_equal(
+        decode_frame(zlib.compress(frame.tobytes()), pb_objects.ZLIB, frame.shape),
+        frame,
+    )
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.fromarray(frame).save(buffer, format="PNG")
+    assert np.array_equal(
+        decode_frame(buffer.getvalue(), pb_objects.PNG, frame.shape),
+        frame,
+    )
+
+
+def test_decode_zstd(frame):
+    """Test decoding zstd frames."""
+    zstandard = pytest.importorskip("zstandard")
+    data = zstandard.ZstdCompressor(write_content_size=False).compress(frame.tobytes())
+    assert np.array_equal(decode_frame(data, pb_objects.ZSTD, frame.shape), frame)
+
+
+def test_check_codec():
+    """Test rejecting unsupported codecs."""
+    check_codec("zlib", channels=1)
+    with pytest.raises(ValueError):
+        check_codec("lz4")
+    with pytest.raises(ValueError):
+        check_codec("jpeg", channels=1)
@@ -0,0 +1,46 @@
+"""Tests for columnar offline datasets."""
+import numpy as np
+
+from minetester.dataset import OfflineDataset, export_dataset
+from minetester.recording import TrajectoryWriter
+from minetester.utils import NOOP_ACTION
+
+
+def test_export_and_load_dataset(tmp_path, make_record):
+    """Test random access to an exported dataset."""
+    with TrajectoryWriter(tmp_path / "recording") as writer:
+        for step in range(6):
+            record = make_record(
+                step,
+                terminal=step == 3,
+                action=dict(NOOP_ACTION, JUMP=step % 2, MOUSE=[step, -step]),
+                info_fields={"health": 20 - step, "biome": "desert"},
+            )
+            writer.write(record)
+    meta = export_dataset(tmp_path / "recording", tmp_path / "dataset", chunk_size=4)
+    assert meta["num_steps"] == 6 and meta["num_chunks"] == 2
+    assert meta["info_columns"] == ["health"]
+    assert meta["info_other_columns"] == ["biome"]
+
+    dataset = OfflineDataset(tmp_path / "dataset")
+    assert len(dataset) == 6
+    assert dataset.episodes.tolist() == [[0, 4], [4, 6]]
+    # the action of a step is the one recorded with the next frame
+    step = dataset[4]
+    assert np.all(step["obs"] == 4)
+    assert step["keys"][dataset.keys.index("JUMP")]
+    assert step["mouse"].tolist() == [5, -5]
+    assert step["info"]["health"] == 16
+    # last steps of episodes are followed by no action
+    assert dataset.mouse[[2, 3, 5]].tolist() == [[3, -3], [0, 0], [0, 0]]
+    assert not dataset.key_states[3].any()
+
+    batch = dataset.get_batch([5, 0, 4])
+    assert batch["obs"].shape == (3, 2, 4, 3)
+    assert batch["obs"][:, 0, 0, 0].tolist() == [5, 0, 4]
+    assert batch["reward"].tolist() == [5.0, 0.0, 4.0]
+
+    batches = list(dataset.iter_batches(4, seed=0, prefetch=1))
+    assert [len(batch["reward"]) for batch in batches] == [4, 2]
+    rewards = np.concatenate([batch["reward"] for batch in batches])
+    assert sorted(rewards.tolist()) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
@@ -10,7 +10,7 @@ from gymnasium.vector import AsyncVectorEnv, SyncVectorEnv
 from gymnasium.wrappers import TimeLimit
 
 import minetester  # noqa: F401
-from minetester import Minetest
+from minetester import Minetest, MinetestMultiAgentEnv, MinetestVectorEnv
 from minetester.utils import start_xserver
 
 
@@ -60,6 +60,103 @@ def test_loop(minetest_env):
         _, _, done, truncated, _ = minetest_env.step(action)
 
 
+def test_pipelined_loop(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the pipelined step-action-loop."""
+    env = Minetest(
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        base_seed=42,
+        headless=True,
+        start_xvfb=True,
+        x_display=unused_xserver_number,
+        pipelined=True,
+    )
+    env.reset()
+    for _ in range(10):
+        env.step_async(env.action_space.sample())
+        obs, _, _, _, _ = env.step_wait()
+        assert obs.shape == env.observation_space.shape
+    env.close()
+
+
+def test_in_process_server_loop(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the step-action-loop with the server in the client."""
+    env = Minetest(
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        base_seed=42,
+        headless=True,
+        start_xvfb=True,
+        x_display=unused_xserver_number,
+        in_process_server=True,
+    )
+    env.reset()
+    assert env.server_process is None
+    for _ in range(10):
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        assert obs.shape == env.observation_space.shape
+    env.close()
+
+
+def test_tcp_loop(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the step-action-loop over TCP instead of IPC."""
+    env = Minetest(
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        base_seed=42,
+        headless=True,
+        start_xvfb=True,
+        x_display=unused_xserver_number,
+        ipc=False,
+    )
+    assert env.env_address.startswith("tcp://")
+    env.reset()
+    for _ in range(10):
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        assert obs.shape == env.observation_space.shape
+    env.close()
+
+
+def test_modalities_loop(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the step-action-loop with depth and segmentation."""
+    env = Minetest(
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        base_seed=42,
+        headless=True,
+        start_xvfb=True,
+        x_display=unused_xserver_number,
+        obs_modalities=["rgb", "depth", "segmentation"],
+    )
+    _, info = env.reset()
+    assert info["segmentation_labels"][126] == "air"
+    for _ in range(10):
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        assert env.observation_space.contains(obs)
+    env.close()
+
+
+def test_render_size_loop(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the step-action-loop with a low render resolution."""
+    env = Minetest(
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        base_seed=42,
+        headless=True,
+        start_xvfb=True,
+        x_display=unused_xserver_number,
+        render_size=(128, 75),
+        obs_modalities=["rgb", "depth"],
+    )
+    obs, _ = env.reset()
+    assert obs["rgb"].shape == (75, 128, 3)
+    assert obs["depth"].shape == (75, 128, 1)
+    for _ in range(10):
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        assert env.observation_space.contains(obs)
+    env.close()
+
+
 @pytest.mark.parametrize("vec_env_cls", [AsyncVectorEnv, SyncVectorEnv])
 def test_loop_vec_env(vec_env_cls, unused_xserver_number, unused_tcp_port_factory):
     """Execution test of vectorized step-action-loop."""
@@ -121,6 +218,68 @@ def test_loop_vec_env(vec_env_cls, unused_xserver_number, unused_tcp_port_factor
     xserver.terminate()
 
 
+def test_loop_minetest_vector_env(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the native vectorized step-action-loop."""
+    num_envs = 2
+    max_steps = 20
+    venv = MinetestVectorEnv(
+        num_envs,
+        env_kwargs=[
+            {
+                "env_port": unused_tcp_port_factory(),
+                "server_port": unused_tcp_port_factory(),
+                "display_size": (600, 400),
+                "headless": True,
+                "x_display": unused_xserver_number,
+            }
+            for _ in range(num_envs)
+        ],
+        base_seed=42,
+    )
+
+    xserver = start_xserver(unused_xserver_number)
+    obs, _ = venv.reset()
+    assert obs.shape == (num_envs, 400, 600, 3)
+    for _ in range(max_steps):
+        actions = venv.action_space.sample()
+        obs, rew, done, truncated, _ = venv.step(actions)
+        assert obs.shape == (num_envs, 400, 600, 3)
+        assert rew.shape == done.shape == truncated.shape == (num_envs,)
+    venv.close()
+    xserver.terminate()
+
+
+def test_loop_multi_agent_env(unused_xserver_number, unused_tcp_port_factory):
+    """Execution test of the lock-step multi-agent loop."""
+    num_agents = 2
+    env = MinetestMultiAgentEnv(
+        num_agents,
+        env_kwargs={
+            "display_size": (600, 400),
+            "headless": True,
+            "start_xvfb": True,
+            "x_display": unused_xserver_number,
+            "servermods": ["rewards"],
+        },
+        base_seed=42,
+        env_port=unused_tcp_port_factory(),
+        server_port=unused_tcp_port_factory(),
+        sync_port=unused_tcp_port_factory(),
+    )
+    # agents use consecutive ports
+    for idx, agent_env in enumerate(env.envs.values()):
+        assert agent_env.env_port == env.host.env_port + idx
+    obs, _ = env.reset()
+    assert set(obs) == set(env.possible_agents)
+    for _ in range(10):
+        if not env.agents:
+            break
+        actions = {agent: env.action_space(agent).sample() for agent in env.agents}
+        obs, rew, _, _, _ = env.step(actions)
+        assert set(obs) == set(rew)
+    env.close()
+
+
 def test_gymnasium_api(unused_tcp_port_factory):
     env_port = unused_tcp_port_factory()
     server_port = unused_tcp_port_factory()
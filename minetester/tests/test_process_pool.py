@@ -0,0 +1,53 @@
+"""Tests for the pool of warm instances."""
+import itertools
+import threading
+
+from minetester.process_pool import WarmProcessPool
+
+
+def test_warm_process_pool():
+    """Test that instances are prepared in order and released on close."""
+    counter = itertools.count()
+    released = []
+
+    def prepare():
+        idx = next(counter)
+
+        def launch():
+            return idx
+
+        return idx, launch
+
+    pool = WarmProcessPool(prepare, released.append, size=2)
+    assert pool.get() == 0
+    assert pool.get() == 1
+    # instances 2 and 3 are warm or not launched yet
+    pool.close()
+    assert sorted(released) == [2, 3]
+    assert next(counter) == 4
+
+
+def test_warm_process_pool_cancel():
+    """Test that prepared instances are released if their launch is cancelled."""
+    launched = []
+    released = []
+
+    def launch():
+        launched.append("launched")
+        return "launched"
+
+    def prepare():
+        return "prepared", launch
+
+    pool = WarmProcessPool(prepare, released.append, size=1)
+    # occupy both workers such that the launch stays queued
+    blocker = threading.Event()
+    busy = [pool.submit(blocker.wait) for _ in range(2)]
+    pool.fill()
+    pool.clear()
+    blocker.set()
+    for future in busy:
+        future.result()
+    pool.close()
+    assert launched == []
+    assert released == ["prepared"]
@@ -0,0 +1,41 @@
+"""Tests for the step profiler."""
+import csv
+import json
+
+import pytest
+
+from minetester.profiler import StepProfiler
+
+
+def test_step_profiler(tmp_path):
+    """Test the summary and dumps of recorded phase durations."""
+    profiler = StepProfiler(max_steps=3)
+    for step in range(4):
+        timings = {"recv": 0.01 * step, "parse": 0.001}
+        if step % 2:
+            timings["client_render"] = 0.005
+        profiler.record(timings)
+    # only the 3 most recent steps are kept
+    assert profiler.phases == ["recv", "parse", "client_render"]
+
+    summary = profiler.summary(bins=2)
+    assert summary["recv"]["count"] == 3
+    assert summary["recv"]["mean"] == pytest.approx(0.02)
+    assert summary["recv"]["min"] == pytest.approx(0.01)
+    assert summary["recv"]["max"] == pytest.approx(0.03)
+    assert summary["client_render"]["count"] == 2
+    assert sum(summary["parse"]["histogram"]["counts"]) == 3
+    assert len(summary["parse"]["histogram"]["edges"]) == 3
+
+    profiler.dump(tmp_path / "profile.csv")
+    with open(tmp_path / "profile.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 3
+    assert rows[1]["client_render"] == ""
+
+    profiler.dump(tmp_path / "profile.json")
+    with open(tmp_path / "profile.json") as f:
+        assert json.load(f)["recv"]["count"] == 3
+
+    profiler.reset()
+    assert profiler.summary() == {}
@@ -0,0 +1,24 @@
+"""Tests for trajectory recording."""
+import numpy as np
+import pytest
+
+from minetester.recording import TrajectoryReader, TrajectoryWriter
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_and_read_trajectories(tmp_path, compress, make_record):
+    """Test that recorded episodes are read back across rotated files."""
+    if compress:
+        pytest.importorskip("zstandard")
+    with TrajectoryWriter(tmp_path, compress=compress, rotate_bytes=64) as writer:
+        for step in range(5):
+            writer.write(make_record(step, terminal=step == 2))
+    assert writer.num_records == 5
+    assert len(writer.files) > 1
+
+    reader = TrajectoryReader(tmp_path)
+    episodes = list(reader.episodes())
+    assert [len(episode) for episode in episodes] == [3, 2]
+    obs, rew, done, _, _ = episodes[1][0]
+    assert obs.shape == (2, 4, 3) and np.all(obs == 3)
+    assert rew == 3.0 and not done
@@ -0,0 +1,27 @@
+"""Tests for the shared memory frame buffer."""
+import numpy as np
+import pytest
+
+from minetester.shm import SHM_HEADER, SharedFrameBuffer
+
+
+def test_shared_frame_buffer():
+    """Test reading frames written to the shared memory segment."""
+    frame_shape = (4, 6, 3)
+    buffer = SharedFrameBuffer(frame_shape, num_slots=3)
+    try:
+        magic, num_slots, slot_size = SHM_HEADER.unpack_from(buffer._shm.buf, 0)
+        assert magic == b"MTSH"
+        assert num_slots == 3
+        assert slot_size == 4 * 6 * 3
+
+        # emulate the client writing a frame into the second slot
+        frame = np.arange(slot_size, dtype=np.uint8).reshape(frame_shape)
+        buffer._slots[1] = frame.ravel()
+        view = buffer.get_frame(1, frame_shape)
+        assert np.array_equal(view, frame)
+        assert not view.flags.writeable
+        with pytest.raises(ValueError):
+            buffer.get_frame(0, (8, 6, 3))
+    finally:
+        buffer.close()
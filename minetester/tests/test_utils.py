@@ -3,9 +3,21 @@ import os
 import tempfile
 import time
 
+import numpy as np
 import pytest
 
-from minetester.utils import read_config_file, start_xserver, write_config_file
+from minetester.proto import objects_pb2 as pb_objects
+from minetester.utils import (
+    KEY_MAP,
+    NOOP_ACTION,
+    pack_pb_action,
+    pack_pb_actions,
+    read_config_file,
+    start_xserver,
+    unpack_pb_action,
+    unpack_pb_obs,
+    write_config_file,
+)
 
 
 @pytest.fixture
@@ -26,6 +38,81 @@ def test_read_write_config(minetest_config_path):
         assert read_config_file(f.name) == config
 
 
+def test_pack_key_masks():
+    """Test that key bitmasks and key events encode the same actions."""
+    action = dict(NOOP_ACTION, FORWARD=1, MIDDLE=1, SLOT_8=1, MOUSE=[3, -2])
+    pb_action = pack_pb_action(action)
+    assert not pb_action.keyEvents
+    assert unpack_pb_action(pb_action) == unpack_pb_action(
+        pack_pb_action(action, use_key_events=True),
+    )
+    assert unpack_pb_action(pb_action) == action
+
+    # batched packing matches packing single actions
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 2, size=(8, len(KEY_MAP))).astype(bool)
+    mouse = rng.integers(-10, 10, size=(8, 2))
+    for keys_i, mouse_i, pb_action in zip(keys, mouse, pack_pb_actions(keys, mouse)):
+        action = dict(zip(KEY_MAP, keys_i.astype(int).tolist()))
+        action["MOUSE"] = mouse_i.tolist()
+        assert pb_action == pack_pb_action(action)
+        assert unpack_pb_action(pb_action) == action
+
+
+def test_unpack_grayscale_obs():
+    """Test unpacking single channel observations."""
+    pb_obs = pb_objects.Observation()
+    pb_obs.image.width, pb_obs.image.height, pb_obs.image.channels = 4, 2, 1
+    pb_obs.image.data = bytes(range(8))
+    obs, _, _, _, _ = unpack_pb_obs(pb_obs.SerializeToString())
+    assert obs.shape == (2, 4, 1)
+    assert obs[1, 0, 0] == 4
+
+
+def test_unpack_depth_segmentation_obs():
+    """Test unpacking observations with depth and segmentation planes."""
+    pb_obs = pb_objects.Observation()
+    pb_obs.image.width, pb_obs.image.height = 3, 2
+    pb_obs.image.data = bytes(18)
+    depth = np.arange(6, dtype="<u2") * 10000
+    pb_obs.depth.width, pb_obs.depth.height, pb_obs.depth.channels = 3, 2, 1
+    pb_obs.depth.data = depth.tobytes()
+    obs, _, _, info, _ = unpack_pb_obs(pb_obs.SerializeToString())
+    assert set(obs) == {"rgb", "depth"}
+    assert obs["rgb"].shape == (2, 3, 3)
+    assert obs["depth"].shape == (2, 3, 1)
+    assert obs["depth"].dtype == np.uint16
+    assert obs["depth"][1, 2, 0] == 50000
+    assert "segmentation_labels" not in info
+
+    pb_obs.segmentation.width, pb_obs.segmentation.height = 3, 2
+    pb_obs.segmentation.data = np.full(6, 65535, dtype="<u2").tobytes()
+    pb_obs.segmentation_labels[126] = "air"
+    obs, _, _, info, _ = unpack_pb_obs(pb_obs.SerializeToString())
+    assert set(obs) == {"rgb", "depth", "segmentation"}
+    assert (obs["segmentation"] == 65535).all()
+    assert info["segmentation_labels"] == {126: "air"}
+
+
+def test_unpack_info_fields():
+    """Test unpacking structured info."""
+    pb_obs = pb_objects.Observation(info="hello")
+    pb_obs.image.width, pb_obs.image.height = 1, 1
+    pb_obs.image.data = bytes(3)
+    pb_obs.info_fields["pos.x"].float_value = 1.5
+    pb_obs.info_fields["count"].int_value = -3
+    pb_obs.info_fields["name"].string_value = "tree"
+    pb_obs.info_fields["alive"].bool_value = True
+    _, _, _, info, _ = unpack_pb_obs(pb_obs.SerializeToString())
+    assert info == {
+        "pos.x": 1.5,
+        "count": -3,
+        "name": "tree",
+        "alive": True,
+        "minetest_info": "hello",
+    }
+
+
 def test_start_xserver(unused_xserver_number):
     """Test starting Xvfb server."""
     process = start_xserver(unused_xserver_number)
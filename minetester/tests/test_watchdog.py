@@ -0,0 +1,27 @@
+"""Tests for the process watchdog."""
+import subprocess
+import sys
+import time
+
+from minetester.watchdog import ProcessWatchdog
+
+
+def test_process_watchdog():
+    """Test that a dead process is reported until new processes are watched."""
+    watchdog = ProcessWatchdog(interval=0.01)
+    running = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    crashing = subprocess.Popen([sys.executable, "-c", "raise SystemExit(3)"])
+    try:
+        watchdog.watch({"server": running, "client": crashing, "xvfb": None})
+        deadline = time.monotonic() + 10
+        while watchdog.dead_process is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watchdog.dead_process == "client (exit code 3)"
+
+        watchdog.watch({"server": running})
+        assert watchdog.dead_process is None
+        assert watchdog.check() is None
+    finally:
+        watchdog.close()
+        running.kill()
+        running.wait()
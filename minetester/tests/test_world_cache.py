@@ -0,0 +1,40 @@
+"""Tests for the world cache."""
+import os
+import time
+
+from minetester.world_cache import WorldCache
+
+
+def _make_world(path, content):
+    os.makedirs(os.path.join(path, "worldmods", "rewards"))
+    with open(os.path.join(path, "map.sqlite"), "w") as f:
+        f.write(content)
+
+
+def test_world_cache(tmp_path):
+    """Test adding, checking out and evicting cached worlds."""
+    cache = WorldCache(tmp_path / "cache", servermods=["rewards"], max_worlds=2)
+    for seed in [1, 2]:
+        _make_world(tmp_path / f"world_{seed}", f"map {seed}")
+        cache.add(seed, tmp_path / f"world_{seed}")
+    assert cache.seeds() == [1, 2]
+    # world mods are not cached
+    assert not os.path.exists(os.path.join(cache.world_path(1), "worldmods"))
+
+    # checked out worlds are independent copies
+    world_dir = tmp_path / "checkout"
+    assert cache.checkout(1, world_dir)
+    with open(world_dir / "map.sqlite", "a") as f:
+        f.write(" modified")
+    with open(os.path.join(cache.world_path(1), "map.sqlite")) as f:
+        assert f.read() == "map 1"
+    assert not cache.checkout(3, tmp_path / "missing")
+
+    # the least recently used world is evicted
+    os.utime(cache.world_path(2), (time.time() - 10, time.time() - 10))
+    _make_world(tmp_path / "world_3", "map 3")
+    cache.add(3, tmp_path / "world_3")
+    assert cache.seeds() == [1, 3]
+
+    # different server mods use different cache entries
+    assert WorldCache(tmp_path / "cache").seeds() == []
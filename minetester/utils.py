@@ -1,14 +1,17 @@
 """Utility functions for Minetester."""
 import os
+import socket
 import subprocess
 import time
 from tempfile import mkdtemp
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
+from minetester.compression import decode_frame
 from minetester.proto import objects_pb2 as pb_objects
 from minetester.proto.objects_pb2 import KeyType
+from minetester.shm import SharedFrameBuffer
 
 # Define default keys / buttons
 KEY_MAP = {
@@ -40,9 +43,24 @@ INV_KEY_MAP = {value: key for key, value in KEY_MAP.items()}
 NOOP_ACTION = {key: 0 for key in KEY_MAP.keys()}
 NOOP_ACTION.update({"MOUSE": np.zeros(2, dtype=int)})
 
+# Bits of the keys in the `keysDown` and `keysDownHigh` action bitmasks
+# in the order of KEY_MAP
+_KEY_IDS = np.array(list(KEY_MAP.values()), dtype=np.uint64)
+_KEY_BITS = np.where(
+    _KEY_IDS < 64,
+    np.left_shift(np.uint64(1), _KEY_IDS % np.uint64(64)),
+    np.uint64(0),
+)
+_KEY_BITS_HIGH = np.where(
+    _KEY_IDS >= 64,
+    np.left_shift(np.uint64(1), _KEY_IDS % np.uint64(64)),
+    np.uint64(0),
+)
+
 
 def unpack_pb_obs(
     received_obs: str,
+    frame_buffer: Optional[SharedFrameBuffer] = None,
 ) -> Tuple[np.ndarray, float, bool, Dict[str, Any], Dict[str, int]]:
     """Unpack a protobuf observation received from Minetest client.
 
@@ -52,65 +70,242 @@ def unpack_pb_obs(
 
     Args:
         received_obs: The received observation.
+        frame_buffer: Shared memory frame buffer the client writes images to.
 
     Returns:
         The displayed image, task reward, done flag, info dict and last action.
+        If the client sent a depth plane or segmentation, the image is replaced
+        by a dictionary of the image (`rgb`), the depth plane (`depth`) and the
+        segmentation (`segmentation`), see `unpack_pb_plane`. Labels of the
+        segmentation IDs are added to the info dict under `segmentation_labels`.
+        The info dict contains the structured info fields and the free-form
+        info string under `minetest_info`. If the client sent timings,
+        they are added under `client_timings`, see `unpack_pb_timings`.
+
+    Raises:
+        RuntimeError: If the image was sent through shared memory but no
+            `frame_buffer` is given.
     """
     pb_obs = pb_objects.Observation()
     pb_obs.ParseFromString(received_obs)
-    obs = np.frombuffer(pb_obs.image.data, dtype=np.uint8).reshape(
-        pb_obs.image.height,
-        pb_obs.image.width,
-        3,
-    )
+    obs_shape = (pb_obs.image.height, pb_obs.image.width, pb_obs.image.channels or 3)
+    if pb_obs.image.in_shm:
+        if frame_buffer is None:
+            raise RuntimeError(
+                "Received image in shared memory but no frame buffer was provided!",
+            )
+        obs = frame_buffer.get_frame(pb_obs.image.shm_slot, obs_shape)
+    else:
+        obs = decode_frame(pb_obs.image.data, pb_obs.image.codec, obs_shape)
+    if pb_obs.HasField("depth") or pb_obs.HasField("segmentation"):
+        obs = {"rgb": obs}
+        for modality in ["depth", "segmentation"]:
+            if pb_obs.HasField(modality):
+                obs[modality] = unpack_pb_plane(getattr(pb_obs, modality))
     last_action = unpack_pb_action(pb_obs.action) if pb_obs.action else None
     rew = pb_obs.reward
     done = pb_obs.terminal
-    info = pb_obs.info
+    info = unpack_pb_info_fields(pb_obs.info_fields)
+    info["minetest_info"] = pb_obs.info
+    if pb_obs.segmentation_labels:
+        info["segmentation_labels"] = dict(pb_obs.segmentation_labels)
+    if pb_obs.HasField("timings"):
+        info["client_timings"] = unpack_pb_timings(pb_obs.timings)
     return obs, rew, done, info, last_action
 
 
+def unpack_pb_plane(pb_plane: pb_objects.Image) -> np.ndarray:
+    """Unpack a single channel uint16 plane, i.e. depth or segmentation.
+
+    Args:
+        pb_plane: The protobuf image of little-endian uint16 values.
+
+    Returns:
+        The plane of shape (height, width, 1).
+    """
+    return np.frombuffer(pb_plane.data, dtype="<u2").reshape(
+        pb_plane.height,
+        pb_plane.width,
+        1,
+    )
+
+
+def unpack_pb_timings(pb_timings: pb_objects.Timings) -> Dict[str, float]:
+    """Unpack the durations of the client's game loop phases.
+
+    Args:
+        pb_timings: The protobuf timings in microseconds.
+
+    Returns:
+        Durations in seconds keyed by phase name prefixed with `client_`.
+    """
+    return {
+        f"client_{field.name}": getattr(pb_timings, field.name) * 1e-6
+        for field in pb_timings.DESCRIPTOR.fields
+    }
+
+
+def unpack_pb_info_fields(pb_info_fields) -> Dict[str, Any]:
+    """Unpack the structured info fields of a protobuf observation.
+
+    Args:
+        pb_info_fields: The `info_fields` map of the observation.
+
+    Returns:
+        Flat dictionary of the field values. Keys of nested Lua tables
+        are joined by dots, e.g. `pos.x`.
+    """
+    return {
+        key: getattr(value, value.WhichOneof("value"))
+        for key, value in pb_info_fields.items()
+        if value.WhichOneof("value") is not None
+    }
+
+
 def unpack_pb_action(pb_action: pb_objects.Action) -> Dict[str, int]:
     """Unpack a protobuf action.
 
     Args:
-        pb_action: The protobuf action.
+        pb_action: The protobuf action. Either encoded as key events
+            or as key bitmasks.
 
     Returns:
         The unpacked action as dictionary.
     """
     action = dict(NOOP_ACTION)
     action["MOUSE"] = [pb_action.mouseDx, pb_action.mouseDy]
-    for key_event in pb_action.keyEvents:
-        if key_event.key in INV_KEY_MAP and key_event.eventType == pb_objects.PRESS:
-            key_name = INV_KEY_MAP[key_event.key]
-            action[key_name] = 1
+    if pb_action.keyEvents:
+        for key_event in pb_action.keyEvents:
+            if key_event.key in INV_KEY_MAP and key_event.eventType == pb_objects.PRESS:
+                key_name = INV_KEY_MAP[key_event.key]
+                action[key_name] = 1
+    else:
+        for key_name, key in KEY_MAP.items():
+            if key < 64:
+                action[key_name] = (pb_action.keysDown >> key) & 1
+            else:
+                action[key_name] = (pb_action.keysDownHigh >> (key - 64)) & 1
     return action
 
 
-def pack_pb_action(action: Dict[str, Any]) -> pb_objects.Action:
+def pack_pb_action(
+    action: Dict[str, Any],
+    use_key_events: bool = False,
+) -> pb_objects.Action:
     """Pack a protobuf action.
 
     Args:
         action: The action as dictionary.
+        use_key_events: Whether to encode the keys as a list of key events
+            instead of bitmasks.
 
     Returns:
         The packed protobuf action.
     """
     pb_action = pb_objects.Action()
     pb_action.mouseDx, pb_action.mouseDy = action["MOUSE"]
+    if use_key_events:
+        for key, v in action.items():
+            if key == "MOUSE":
+                continue
+            pb_action.keyEvents.append(
+                pb_objects.KeyboardEvent(
+                    key=KEY_MAP[key],
+                    eventType=pb_objects.PRESS if v else pb_objects.RELEASE,
+                ),
+            )
+        return pb_action
+    keys_down, keys_down_high = 0, 0
     for key, v in action.items():
-        if key == "MOUSE":
+        if key == "MOUSE" or not v:
             continue
-        pb_action.keyEvents.append(
-            pb_objects.KeyboardEvent(
-                key=KEY_MAP[key],
-                eventType=pb_objects.PRESS if v else pb_objects.RELEASE,
-            ),
-        )
+        key_id = KEY_MAP[key]
+        if key_id < 64:
+            keys_down |= 1 << key_id
+        else:
+            keys_down_high |= 1 << (key_id - 64)
+    pb_action.keysDown = keys_down
+    pb_action.keysDownHigh = keys_down_high
     return pb_action
 
 
+def pack_key_masks(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack a batch of pressed keys into key bitmasks.
+
+    Args:
+        keys: Boolean array of shape (N, len(KEY_MAP)) indicating the pressed keys.
+            The columns are in the order of KEY_MAP.
+
+    Returns:
+        The `keysDown` and `keysDownHigh` bitmasks, each of shape (N,).
+
+    Raises:
+        ValueError: If `keys` does not have the shape (N, len(KEY_MAP)).
+    """
+    keys = np.asarray(keys, dtype=bool)
+    if keys.ndim != 2 or keys.shape[1] != len(KEY_MAP):
+        raise ValueError(
+            f"Expected keys of shape (N, {len(KEY_MAP)}), got {keys.shape}!",
+        )
+    # the key bits are distinct, so summing is equivalent to bitwise or
+    keys_down = np.where(keys, _KEY_BITS, np.uint64(0)).sum(axis=1, dtype=np.uint64)
+    keys_down_high = np.where(keys, _KEY_BITS_HIGH, np.uint64(0)).sum(
+        axis=1,
+        dtype=np.uint64,
+    )
+    return keys_down, keys_down_high
+
+
+def pack_pb_actions(keys: np.ndarray, mouse: np.ndarray) -> List[pb_objects.Action]:
+    """Pack a batch of actions into protobuf actions using key bitmasks.
+
+    Args:
+        keys: Boolean array of shape (N, len(KEY_MAP)) indicating the pressed keys.
+            The columns are in the order of KEY_MAP.
+        mouse: Integer array of shape (N, 2) with the mouse movements in pixels.
+
+    Returns:
+        List of N packed protobuf actions.
+
+    Raises:
+        ValueError: If `keys` or `mouse` do not have the expected shapes.
+    """
+    keys_down, keys_down_high = pack_key_masks(keys)
+    mouse = np.asarray(mouse).astype(np.int64)
+    if mouse.shape != (len(keys_down), 2):
+        raise ValueError(
+            f"Expected mouse of shape ({len(keys_down)}, 2), got {mouse.shape}!",
+        )
+    return [
+        pb_objects.Action(
+            keysDown=low,
+            keysDownHigh=high,
+            mouseDx=dx,
+            mouseDy=dy,
+        )
+        for low, high, (dx, dy) in zip(
+            keys_down.tolist(),
+            keys_down_high.tolist(),
+            mouse.tolist(),
+        )
+    ]
+
+
+def find_free_port(udp: bool = False) -> int:
+    """Find a port that is currently not in use.
+
+    Args:
+        udp: Whether to look for a free UDP instead of TCP port.
+
+    Returns:
+        The port number.
+    """
+    socket_type = socket.SOCK_DGRAM if udp else socket.SOCK_STREAM
+    with socket.socket(socket.AF_INET, socket_type) as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
 def start_minetest_server(
     minetest_path: str = "bin/minetest",
     config_path: str = "minetest.conf",
@@ -174,6 +369,20 @@ def start_minetest_client(
     display: Optional[int] = None,
     set_gpu_vars: bool = True,
     set_vsync_vars: bool = True,
+    shm_name: Optional[str] = None,
+    render_size: Optional[Tuple[int, int]] = None,
+    obs_size: Optional[Tuple[int, int]] = None,
+    obs_crop: Optional[Tuple[int, int, int, int]] = None,
+    obs_grayscale: bool = False,
+    obs_depth: bool = False,
+    obs_segmentation: bool = False,
+    obs_codec: str = "raw",
+    obs_quality: Optional[int] = None,
+    world_dir: Optional[str] = None,
+    sync_dtime: Optional[float] = None,
+    trace: bool = False,
+    profile: bool = False,
+    client_address: Optional[str] = None,
 ) -> subprocess.Popen:
     """Start a Minetest client.
 
@@ -192,6 +401,26 @@ def start_minetest_client(
         display: value of the DISPLAY variable.
         set_gpu_vars: whether to enable Nvidia GPU usage
         set_vsync_vars: whether to disable Vsync
+        shm_name: Name of the shared memory frame buffer to send images through.
+        render_size: Width and height the client renders the 3D scene at
+            instead of the window size. Only supported in headless mode.
+        obs_size: Width and height the client resizes images to.
+        obs_crop: Region (x, y, width, height) of the window the client crops
+            images to before resizing.
+        obs_grayscale: Whether the client converts images to grayscale.
+        obs_depth: Whether the client sends the depth plane with each image.
+            Only supported in headless mode.
+        obs_segmentation: Whether the client sends the node content ID of
+            each pixel with each image.
+        obs_codec: Codec the client compresses images with.
+        obs_quality: JPEG quality or zlib/zstd compression level.
+        world_dir: Path to the world directory. If set, the client runs
+            the server itself and steps it in lock step with the client.
+        sync_dtime: In-game time between two steps of the in-process server.
+        trace: Whether to write trace level output to the client's stderr log.
+        profile: Whether the client sends the durations of its game loop phases.
+        client_address: ZMQ endpoint of the environment, e.g. an `ipc://` path.
+            Defaults to `tcp://localhost:<client_port>`.
 
     Returns:
         The client process.
@@ -202,14 +431,12 @@ def start_minetest_client(
         client_name,
         "--password",
         "1234",
-        "--address",
-        "0.0.0.0",  # listen to all interfaces
         "--port",
         str(server_port),
         "--go",
         "--dumb",
         "--client-address",
-        "tcp://localhost:" + str(client_port),
+        client_address or "tcp://localhost:" + str(client_port),
         "--record",
         "--noresizing",
         "--config",
@@ -217,15 +444,45 @@ def start_minetest_client(
         "--cache",
         media_cache_dir,
     ]
+    if world_dir:
+        # run the server inside the client process
+        cmd.extend(["--world", world_dir, "--sync-local"])
+        if sync_dtime:
+            cmd.extend(["--sync-dtime", str(sync_dtime)])
+    else:
+        cmd.extend(["--address", "0.0.0.0"])  # listen to all interfaces
     if headless:
         # don't render to screen
         cmd.append("--headless")
+    if trace:
+        cmd.append("--trace")
+    if profile:
+        cmd.append("--profile")
     if cursor_img:
         cmd.extend(["--cursor-image", cursor_img])
     if sync_port:
         cmd.extend(["--sync-port", str(sync_port)])
     if dtime:
         cmd.extend(["--dtime", str(dtime)])
+    if shm_name:
+        cmd.extend(["--shm-name", shm_name])
+    if render_size:
+        cmd.extend(["--render-width", str(render_size[0])])
+        cmd.extend(["--render-height", str(render_size[1])])
+    if obs_size:
+        cmd.extend(["--obs-width", str(obs_size[0]), "--obs-height", str(obs_size[1])])
+    if obs_crop:
+        cmd.extend(["--obs-crop", ",".join(str(v) for v in obs_crop)])
+    if obs_grayscale:
+        cmd.append("--obs-grayscale")
+    if obs_depth:
+        cmd.append("--obs-depth")
+    if obs_segmentation:
+        cmd.append("--obs-segmentation")
+    if obs_codec != "raw":
+        cmd.extend(["--obs-codec", obs_codec])
+    if obs_quality is not None:
+        cmd.extend(["--obs-quality", str(obs_quality)])
 
     stdout_file = log_path.format("client_stdout")
     stderr_file = log_path.format("client_stderr")
@@ -246,9 +503,10 @@ def start_minetest_client(
 
 
 def start_xserver(
-    display_idx: int = 1,
+    display_idx: Optional[int] = 1,
     display_size: Tuple[int, int] = (1024, 600),
     display_depth: int = 24,
+    num_screens: int = 1,
 ) -> subprocess.Popen:
     """Start a virtual framebuffer X server.
 
@@ -257,46 +515,63 @@ def start_xserver(
     pytest-server-fixtures/pytest_server_fixtures/xvfb.py#L38
 
     Args:
-        display_idx: Value of the DISPLAY variable.
+        display_idx: Value of the DISPLAY variable. If None, Xvfb picks
+            an unused display number itself.
         display_size: Size of the display.
         display_depth: Depth of the display.
+        num_screens: Number of screens of the display.
 
     Returns:
-        The X server process.
+        The X server process. Its display number is stored
+        in the `display_idx` attribute.
 
     Raises:
         RuntimeError: If X server fails to start or already exists.
     """
-    display = f":{display_idx}"
     tmpdir = mkdtemp(prefix="XvfbServer.")
-    cmd = [
-        "Xvfb",
-        display,
-        "-fbdir",
-        tmpdir,
-        "-screen",
-        "0",  # screennum param
-        f"{display_size[0]}x{display_size[1]}x{display_depth}",
-        "-nolisten",
-        "tcp",
-        "-reset",
-        "-terminate",
-    ]
-    errfile = os.path.join(tmpdir, "Xvfb." + display + ".err")
+    cmd = ["Xvfb"]
+    read_fd = write_fd = None
+    if display_idx is None:
+        # Xvfb writes the number of the display it picked once it is ready
+        read_fd, write_fd = os.pipe()
+        cmd.extend(["-displayfd", str(write_fd)])
+    else:
+        cmd.append(f":{display_idx}")
+    cmd.extend(["-fbdir", tmpdir])
+    for screen in range(num_screens):
+        cmd.extend(
+            [
+                "-screen",
+                str(screen),  # screennum param
+                f"{display_size[0]}x{display_size[1]}x{display_depth}",
+            ],
+        )
+    cmd.extend(["-nolisten", "tcp", "-reset", "-terminate"])
+    errfile = os.path.join(tmpdir, f"Xvfb.{display_idx}.err")
     with open(errfile, "w") as f:  # use a file instead of a pipe to simplify polling
         xserver_process = subprocess.Popen(
             cmd,
             stderr=f,
             env=os.environ,
+            pass_fds=() if write_fd is None else (write_fd,),
         )
-        fbmem = os.path.join(tmpdir, "Xvfb_screen0")
-        # Wait for Xvfb server to start
-        while not os.path.exists(fbmem):
-            if xserver_process.poll() is not None:
-                break
-            time.sleep(0.1)
-        else:
+        if write_fd is not None:
+            os.close(write_fd)
+            with os.fdopen(read_fd) as display_pipe:
+                # empty if Xvfb exits before it is ready
+                display = display_pipe.readline().strip()
             xserver_process.poll()
+            if display:
+                display_idx = int(display)
+        else:
+            fbmem = os.path.join(tmpdir, "Xvfb_screen0")
+            # Wait for Xvfb server to start
+            while not os.path.exists(fbmem):
+                if xserver_process.poll() is not None:
+                    break
+                time.sleep(0.1)
+            else:
+                xserver_process.poll()
         if xserver_process.returncode is not None:
             with open(errfile) as f:
                 err = f.read()
@@ -313,6 +588,7 @@ def start_xserver(
                     xserver_process.returncode,
                     err,
                 )
+    xserver_process.display_idx = display_idx
     return xserver_process
 
 
@@ -0,0 +1,433 @@
+"""Vectorized Minetest environment driving several clients from one process."""
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import gymnasium as gym
+import numpy as np
+import zmq
+from gymnasium.vector import AutoresetMode
+from gymnasium.vector.utils import batch_space, create_empty_array
+
+from minetester.allocation import SharedXServer
+from minetester.minetest_env import Minetest
+from minetester.utils import KEY_MAP, pack_pb_actions
+from minetester.watchdog import ProcessDiedError
+
+
+class MinetestVectorEnv(gym.vector.VectorEnv):
+    """Vectorized Minetest environment.
+
+    Owns `num_envs` Minetest client/server pairs and multiplexes their ZMQ
+    sockets with a `zmq.Poller` instead of running one worker process per
+    environment. Observations are written into a preallocated
+    `(num_envs, height, width, 3)` array, or a dictionary of such arrays
+    if the environments observe several modalities.
+
+    Sub-environments are reset automatically in the same step in which their
+    episode ends (`AutoresetMode.SAME_STEP` of gymnasium 1.x). The last
+    observation and info of the finished episode are then returned in the info
+    dictionary under `final_obs` and `final_info`, while the other info keys
+    hold the info of the reset.
+    Sub-environments whose Minetest processes die or stall are truncated and
+    relaunched without blocking the other environments, see `step_timeout`.
+    """
+
+    metadata = {
+        "render_modes": ["rgb_array"],
+        "autoreset_mode": AutoresetMode.SAME_STEP,
+    }
+
+    def __init__(
+        self,
+        num_envs: int,
+        env_kwargs: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None,
+        base_seed: int = 0,
+        env_port: int = 0,
+        server_port: int = 0,
+        copy: bool = True,
+        poll_timeout: Optional[int] = None,
+        decode_threads: int = 0,
+        share_xvfb: bool = True,
+    ):
+        """Initialize vectorized Minetest environment.
+
+        Args:
+            num_envs: Number of Minetest environments.
+            env_kwargs: Keyword arguments passed to each `Minetest` environment.
+                Either shared by all environments or a list with one dictionary
+                per environment.
+            base_seed: Seed of the first environment. Environment `i` is seeded
+                with `base_seed + i`.
+            env_port: Port of the first environment. Environment `i` uses
+                `env_port + i`. Free ports are allocated if 0.
+            server_port: Server port of the first environment. Environment `i`
+                uses `server_port + i`. Free ports are allocated if 0.
+            copy: Whether to return a copy of the observation buffer in `reset`
+                and `step`.
+            poll_timeout: Timeout in milliseconds when waiting for observations.
+                Overrides `step_timeout` and `reset_timeout` of all environments
+                if set.
+            decode_threads: Number of threads that decode received observations
+                while the observations of other environments are still awaited.
+                Useful with compressed observations, see `obs_codec`.
+                Observations are decoded in the main thread if 0.
+            share_xvfb: Whether environments that start Xvfb share a single
+                X server with one screen per environment.
+
+        Raises:
+            ValueError: If the number of `env_kwargs` does not match `num_envs`
+                or pipelined environments are requested.
+        """
+        if env_kwargs is None or isinstance(env_kwargs, dict):
+            env_kwargs = [dict(env_kwargs or {}) for _ in range(num_envs)]
+        if len(env_kwargs) != num_envs:
+            raise ValueError(
+                f"Expected {num_envs} env_kwargs dictionaries, got {len(env_kwargs)}!",
+            )
+        if any(kwargs.get("pipelined", False) for kwargs in env_kwargs):
+            raise ValueError("Pipelined environments are not supported!")
+
+        # Start one X server for all environments that need one
+        self.xserver = None
+        xvfb_ranks = [
+            rank
+            for rank, kwargs in enumerate(env_kwargs)
+            if kwargs.get("start_xvfb", False) and kwargs.get("x_display") is None
+        ]
+        if share_xvfb and xvfb_ranks:
+            display_sizes = np.array(
+                [
+                    env_kwargs[rank].get("display_size", Minetest.default_display_size)
+                    for rank in xvfb_ranks
+                ],
+            )
+            self.xserver = SharedXServer(
+                len(xvfb_ranks),
+                tuple(display_sizes.max(axis=0).tolist()),
+            )
+            for rank in xvfb_ranks:
+                env_kwargs[rank] = {
+                    **env_kwargs[rank],
+                    "start_xvfb": False,
+                    "xserver": self.xserver,
+                }
+
+        self.envs = [
+            Minetest(
+                **{
+                    "env_port": env_port + rank if env_port else 0,
+                    "server_port": server_port + rank if server_port else 0,
+                    "base_seed": base_seed + rank,
+                    **kwargs,
+                },
+            )
+            for rank, kwargs in enumerate(env_kwargs)
+        ]
+
+        super().__init__()
+        self.num_envs = num_envs
+        self.copy = copy
+        self.closed = False
+        self.render_mode = "rgb_array"
+        self.single_observation_space = self.envs[0].observation_space
+        self.single_action_space = self.envs[0].action_space
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        # Preallocated observation buffer
+        self._observations = create_empty_array(
+            self.single_observation_space,
+            num_envs,
+            fn=np.zeros,
+        )
+        self._rewards = np.zeros(num_envs, dtype=np.float64)
+        self._terminations = np.zeros(num_envs, dtype=np.bool_)
+        self._truncations = np.zeros(num_envs, dtype=np.bool_)
+        self._actions = None
+        self._alive = []
+        self._mouse_scale = np.array(
+            [[env.max_mouse_move_x, env.max_mouse_move_y] for env in self.envs],
+        )
+        self.poll_timeout = poll_timeout
+        # the sockets are polled in slices to check the watchdogs in between
+        self._poll_slice = max(
+            1,
+            int(min(env.watchdog_interval for env in self.envs) * 1000),
+        )
+        self._decode_pool = None
+        if decode_threads > 0:
+            self._decode_pool = ThreadPoolExecutor(max_workers=decode_threads)
+
+    def reset(
+        self,
+        seed: Optional[Union[int, List[int]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Reset all environments.
+
+        Args:
+            seed: Seed for all environments. If an integer is provided,
+                environment `i` is seeded with `seed + i`.
+            options: Currently unused.
+
+        Returns:
+            Batch of initial observations and info dictionary.
+        """
+        del options
+        if seed is None or isinstance(seed, int):
+            seed = [None if seed is None else seed + i for i in range(self.num_envs)]
+
+        infos = {}
+        for env_idx, (obs, info) in self._reset_envs(range(self.num_envs), seed):
+            self._set_observation(env_idx, obs)
+            infos = self._add_info(infos, info, env_idx)
+        return self._get_observations(), infos
+
+    def step(
+        self,
+        actions: Dict[str, Any],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        """Perform a batch of actions.
+
+        Args:
+            actions: Batched actions as sampled from `action_space`.
+
+        Returns:
+            Batches of observations, rewards, terminations, truncations and infos.
+        """
+        self.step_async(actions)
+        return self.step_wait()
+
+    def step_async(self, actions: Dict[str, Any]):
+        """Send a batch of actions without waiting for the observations.
+
+        Args:
+            actions: Batched actions as sampled from `action_space`.
+        """
+        start = time.perf_counter()
+        keys = np.stack([actions[key] for key in KEY_MAP], axis=1)
+        # Scale mouse actions according to the screen ratio of each environment
+        mouse = actions["MOUSE"] * self._mouse_scale
+        self._actions = pack_pb_actions(keys, mouse)
+        # the batch is packed at once, attribute an equal share to each env
+        pack_time = (time.perf_counter() - start) / self.num_envs
+        self._alive = [
+            env.send_packed_action(pb_action, pack_time=pack_time)
+            for env, pb_action in zip(self.envs, self._actions)
+        ]
+
+    def step_wait(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        """Wait for the observations of the actions sent by `step_async`.
+
+        Returns:
+            Batches of observations, rewards, terminations, truncations and infos.
+
+        Raises:
+            RuntimeError: If no actions were sent by `step_async`.
+        """
+        if self._actions is None:
+            raise RuntimeError("Calling `step_wait` without calling `step_async`!")
+        step_infos = {}
+        for env_idx, alive in enumerate(self._alive):
+            if not alive:
+                # Minetest process died, truncate the episode and relaunch
+                env = self.envs[env_idx]
+                logging.warning(f"Minetest process of env {env_idx} is not alive!")
+                dead_process = env.watchdog.dead_process or "process"
+                error = ProcessDiedError(f"Minetest {dead_process} died!")
+                obs, _, _, _, info = env._abort_episode(error)
+                self._set_observation(env_idx, obs)
+                self._rewards[env_idx] = 0.0
+                self._terminations[env_idx] = False
+                self._truncations[env_idx] = True
+                step_infos[env_idx] = info
+
+        pending = [env_idx for env_idx, alive in enumerate(self._alive) if alive]
+        for env_idx, (obs, rew, done, truncated, info) in self._decode(
+            self._receive(pending),
+            lambda env_idx, byte_obs: self.envs[env_idx]._finish_step(byte_obs),
+            lambda env_idx, error: self.envs[env_idx]._abort_episode(error),
+        ):
+            self._set_observation(env_idx, obs)
+            self._rewards[env_idx] = rew
+            self._terminations[env_idx] = done
+            self._truncations[env_idx] = truncated
+            step_infos[env_idx] = info
+        self._actions = None
+
+        # Reset finished environments
+        finished = np.flatnonzero(self._terminations | self._truncations)
+        final_obs = {env_idx: self._get_observation(env_idx) for env_idx in finished}
+        reset_infos = {}
+        if len(finished):
+            for env_idx, (obs, info) in self._reset_envs(finished):
+                self._set_observation(env_idx, obs)
+                reset_infos[env_idx] = info
+
+        infos = {}
+        for env_idx in sorted(step_infos):
+            if env_idx in reset_infos:
+                final = {
+                    "final_obs": final_obs[env_idx],
+                    "final_info": step_infos[env_idx],
+                }
+                infos = self._add_info(infos, final, env_idx)
+                infos = self._add_info(infos, reset_infos[env_idx], env_idx)
+            else:
+                infos = self._add_info(infos, step_infos[env_idx], env_idx)
+
+        return (
+            self._get_observations(),
+            self._rewards.copy(),
+            self._terminations.copy(),
+            self._truncations.copy(),
+            infos,
+        )
+
+    def _reset_envs(
+        self,
+        env_indices,
+        seeds: Optional[List[Optional[int]]] = None,
+    ) -> List[Tuple[int, Tuple[Any, Dict[str, Any]]]]:
+        # Reset the given environments and receive their initial observations,
+        # relaunching environments that die or stall up to `max_restarts` times
+        seeds = seeds or [None] * len(env_indices)
+        # Launch all Minetest instances before waiting for any of them
+        for env_idx, env_seed in zip(env_indices, seeds):
+            self.envs[env_idx]._start_reset(seed=env_seed)
+        restarts = {env_idx: 0 for env_idx in env_indices}
+        results = []
+        pending = list(env_indices)
+        while pending:
+            failed = []
+            for env_idx, result in self._decode(
+                self._receive(pending, reset=True),
+                lambda env_idx, byte_obs: self.envs[env_idx]._finish_reset(byte_obs),
+                lambda env_idx, error: error,
+            ):
+                if not isinstance(result, Exception):
+                    results.append((env_idx, result))
+                    continue
+                env = self.envs[env_idx]
+                env._kill_minetest()
+                if restarts[env_idx] == env.max_restarts:
+                    raise RuntimeError(
+                        f"Minetest of env {env_idx} failed to start"
+                        f" {restarts[env_idx] + 1} times!",
+                    ) from result
+                restarts[env_idx] += 1
+                logging.warning(f"Relaunching Minetest of env {env_idx}: {result}")
+                env._start_reset()
+                failed.append(env_idx)
+            pending = failed
+        return results
+
+    def _receive(
+        self,
+        env_indices,
+        reset: bool = False,
+    ) -> Iterator[Tuple[int, Union[bytes, Exception]]]:
+        # Receive one message from each of the given environments
+        # in the order in which they arrive. Environments whose Minetest
+        # died or did not respond in time yield the error instead,
+        # without blocking the others.
+        pending = {self.envs[env_idx].socket: env_idx for env_idx in env_indices}
+        poller = zmq.Poller()
+        for socket in pending:
+            poller.register(socket, zmq.POLLIN)
+        start = time.monotonic()
+        while pending:
+            for socket, _ in poller.poll(self._poll_slice):
+                env_idx = pending.pop(socket)
+                poller.unregister(socket)
+                yield env_idx, socket.recv()
+            for socket, env_idx in list(pending.items()):
+                env = self.envs[env_idx]
+                timeout = env.reset_timeout if reset else env.step_timeout
+                if self.poll_timeout is not None:
+                    timeout = self.poll_timeout / 1000
+                try:
+                    env._check_health(start, timeout)
+                except (ProcessDiedError, TimeoutError) as e:
+                    del pending[socket]
+                    poller.unregister(socket)
+                    yield env_idx, e
+
+    def _decode(
+        self,
+        received: Iterator[Tuple[int, Union[bytes, Exception]]],
+        decode_fn: Callable[[int, bytes], Any],
+        error_fn: Callable[[int, Exception], Any],
+    ) -> List[Tuple[int, Any]]:
+        # Decode the received messages, in the thread pool if enabled
+        # such that decoding overlaps with receiving further messages.
+        # Errors are handled by `error_fn` in the main thread.
+        if self._decode_pool is None:
+            return [
+                (
+                    env_idx,
+                    error_fn(env_idx, msg)
+                    if isinstance(msg, Exception)
+                    else decode_fn(env_idx, msg),
+                )
+                for env_idx, msg in received
+            ]
+        futures = []
+        for env_idx, msg in received:
+            if isinstance(msg, Exception):
+                futures.append((env_idx, error_fn(env_idx, msg)))
+            else:
+                futures.append(
+                    (env_idx, self._decode_pool.submit(decode_fn, env_idx, msg)),
+                )
+        return [
+            (env_idx, future.result() if isinstance(future, Future) else future)
+            for env_idx, future in futures
+        ]
+
+    def _set_observation(self, env_idx: int, obs: Union[np.ndarray, Dict]):
+        if isinstance(self._observations, dict):
+            for key, value in obs.items():
+                self._observations[key][env_idx] = value
+        else:
+            self._observations[env_idx] = obs
+
+    def _get_observation(self, env_idx: int) -> Union[np.ndarray, Dict]:
+        # Copy of the observation of a single environment
+        if isinstance(self._observations, dict):
+            return {
+                key: value[env_idx].copy() for key, value in self._observations.items()
+            }
+        return self._observations[env_idx].copy()
+
+    def _get_observations(self) -> Union[np.ndarray, Dict]:
+        if not self.copy:
+            return self._observations
+        if isinstance(self._observations, dict):
+            return {key: value.copy() for key, value in self._observations.items()}
+        return self._observations.copy()
+
+    def render(self) -> Tuple[np.ndarray, ...]:
+        """Render all environments.
+
+        Returns:
+            Tuple of the last frames of all environments.
+        """
+        return tuple(env._last_frame() for env in self.envs)
+
+    def close_extras(self, **kwargs):
+        """Close all Minetest environments.
+
+        Args:
+            kwargs: Keyword arguments of `close`, unused.
+        """
+        if self._decode_pool is not None:
+            self._decode_pool.shutdown()
+        for env in self.envs:
+            env.close()
+        if self.xserver is not None:
+            self.xserver.close()
@@ -0,0 +1,78 @@
+"""Background monitoring of the processes of a Minetest instance."""
+import subprocess
+import threading
+from typing import Dict, Optional
+
+
+class ProcessDiedError(RuntimeError):
+    """A monitored process exited unexpectedly."""
+
+
+class ProcessWatchdog:
+    """Polls a set of processes in a background thread.
+
+    Receiving an observation can then wait on the socket and check the
+    watchdog between short polls, instead of blocking forever on a client
+    or server that crashed. The first process found dead is reported in
+    `dead_process` until the next call of `watch`.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        """Initialize watchdog.
+
+        Args:
+            interval: Seconds between two checks of the processes.
+        """
+        self.interval = interval
+        self.dead_process: Optional[str] = None
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._mutex = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, processes: Dict[str, Optional[subprocess.Popen]]):
+        """Monitor new processes and forget previously monitored ones.
+
+        Args:
+            processes: Processes keyed by name. Processes set to None are skipped.
+        """
+        with self._mutex:
+            self._processes = {
+                name: process
+                for name, process in processes.items()
+                if process is not None
+            }
+            self.dead_process = None
+        if self._processes and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="minetester-watchdog",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def check(self) -> Optional[str]:
+        """Poll all processes now.
+
+        Returns:
+            Name and exit code of the first process that died, None if all
+            processes are running.
+        """
+        with self._mutex:
+            if self.dead_process is None:
+                for name, process in self._processes.items():
+                    if process.poll() is not None:
+                        self.dead_process = f"{name} (exit code {process.returncode})"
+                        break
+            return self.dead_process
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def close(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,279 @@
+"""Cache of pre-generated Minetest worlds."""
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+from minetester.allocation import allocate_port, release_port
+from minetester.utils import write_config_file
+
+
+class WorldCache:
+    """Cache of pre-generated Minetest worlds.
+
+    Worlds are stored in `cache_dir` keyed by game ID, world seed and
+    server mods. Checking out a cached world copies it into the world
+    directory of an environment, such that the server does not need to
+    generate the terrain around the spawn position from scratch.
+    The least recently used worlds are evicted once `max_worlds`
+    worlds are cached.
+    """
+
+    def __init__(
+        self,
+        cache_dir: os.PathLike,
+        game_id: str = "minetest",
+        servermods: Iterable[str] = (),
+        max_worlds: int = 64,
+    ):
+        """Initialize world cache.
+
+        Args:
+            cache_dir: Directory to store cached worlds in.
+            game_id: Name of the Minetest game.
+            servermods: Server mods that are enabled in the cached worlds.
+            max_worlds: Maximum number of worlds kept in the cache.
+        """
+        self.cache_dir = cache_dir
+        self.game_id = game_id
+        self.servermods = sorted(set(servermods))
+        self.max_worlds = max_worlds
+        mods_hash = hashlib.sha1(",".join(self.servermods).encode()).hexdigest()[:8]
+        self.prefix = f"{self.game_id}_{mods_hash}_"
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def world_path(self, seed: int) -> str:
+        """Get the path of a cached world.
+
+        Args:
+            seed: Seed the world was generated with.
+
+        Returns:
+            Path of the cached world, which may not exist.
+        """
+        return os.path.join(self.cache_dir, f"{self.prefix}{seed}")
+
+    def contains(self, seed: int) -> bool:
+        """Check whether a world is cached.
+
+        Args:
+            seed: Seed the world was generated with.
+
+        Returns:
+            Whether a world generated with `seed` is cached.
+        """
+        return os.path.isdir(self.world_path(seed))
+
+    def seeds(self) -> List[int]:
+        """List the cached worlds.
+
+        Returns:
+            Sorted seeds of all cached worlds.
+        """
+        return sorted(
+            int(name[len(self.prefix) :])
+            for name in os.listdir(self.cache_dir)
+            if name.startswith(self.prefix) and name[len(self.prefix) :].isdigit()
+        )
+
+    def checkout(self, seed: int, world_dir: os.PathLike) -> bool:
+        """Copy a cached world into a world directory.
+
+        Args:
+            seed: Seed of the cached world.
+            world_dir: Destination world directory. Must not exist.
+
+        Returns:
+            Whether the world was found in the cache.
+        """
+        src = self.world_path(seed)
+        try:
+            # mark as recently used
+            os.utime(src)
+            _copy_world(src, world_dir)
+        except (FileNotFoundError, shutil.Error):
+            # not cached or evicted in the meantime
+            shutil.rmtree(world_dir, ignore_errors=True)
+            return False
+        return True
+
+    def add(self, seed: int, world_dir: os.PathLike):
+        """Add a generated world to the cache.
+
+        Args:
+            seed: Seed the world was generated with.
+            world_dir: Directory of the generated world.
+        """
+        dst = self.world_path(seed)
+        if os.path.exists(dst):
+            return
+        # copy to a temporary directory first such that
+        # other processes never check out incomplete worlds
+        tmp_dir = os.path.join(self.cache_dir, f".tmp_{uuid.uuid4()}")
+        shutil.copytree(
+            world_dir,
+            tmp_dir,
+            ignore=shutil.ignore_patterns("worldmods"),
+        )
+        try:
+            os.rename(tmp_dir, dst)
+        except OSError:
+            # added by another process
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used worlds exceeding `max_worlds`."""
+        paths = [self.world_path(seed) for seed in self.seeds()]
+        if len(paths) <= self.max_worlds:
+            return
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except FileNotFoundError:
+                pass
+        for path in sorted(mtimes, key=mtimes.get)[: len(mtimes) - self.max_worlds]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def generate(
+        self,
+        seeds: Iterable[int],
+        minetest_executable: os.PathLike,
+        config: Optional[Dict[str, Any]] = None,
+        num_workers: int = 1,
+        radius: int = 64,
+        timeout: float = 300.0,
+    ) -> List[int]:
+        """Generate and cache worlds for the given seeds.
+
+        Each world is generated by running a Minetest server with the
+        `pregenerate` mod until the map around the spawn position exists.
+
+        Args:
+            seeds: World seeds to generate worlds for. Already cached seeds
+                are skipped.
+            minetest_executable: Path to the Minetest executable.
+            config: Minetest config options used for generation.
+            num_workers: Number of servers to run in parallel.
+            radius: Radius in nodes around spawn to generate.
+            timeout: Maximum time in seconds to generate a single world.
+
+        Returns:
+            Seeds of the successfully generated worlds.
+        """
+        seeds = [seed for seed in dict.fromkeys(seeds) if not self.contains(seed)]
+        if not seeds:
+            return []
+
+        def _generate(seed):
+            # each running server needs its own port, which must not collide
+            # with environments or other caches generating at the same time
+            port = allocate_port(udp=True)
+            try:
+                return self._generate_world(
+                    seed,
+                    minetest_executable,
+                    config or {},
+                    radius,
+                    port,
+                    timeout,
+                )
+            finally:
+                release_port(port)
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_generate, seeds))
+        return [seed for seed, success in zip(seeds, results) if success]
+
+    def _generate_world(
+        self,
+        seed: int,
+        minetest_executable: os.PathLike,
+        config: Dict[str, Any],
+        radius: int,
+        port: int,
+        timeout: float,
+    ) -> bool:
+        tmp_id = f".gen_{uuid.uuid4()}"
+        world_dir = os.path.join(self.cache_dir, tmp_id)
+        config_path = os.path.join(self.cache_dir, f"{tmp_id}.conf")
+        log_path = os.path.join(self.cache_dir, f"{tmp_id}.log")
+        try:
+            # enable the pregeneration mod in addition to the server mods
+            mods_folder = os.path.realpath(
+                os.path.join(os.path.dirname(minetest_executable), "../mods"),
+            )
+            for mod in self.servermods + ["pregenerate"]:
+                mod_folder = os.path.join(mods_folder, mod)
+                if os.path.exists(mod_folder):
+                    shutil.copytree(
+                        mod_folder,
+                        os.path.join(world_dir, "worldmods", mod),
+                        dirs_exist_ok=True,
+                    )
+            write_config_file(
+                config_path,
+                {**config, "fixed_map_seed": seed, "pregenerate_radius": radius},
+            )
+            cmd = [
+                minetest_executable,
+                "--server",
+                "--world",
+                world_dir,
+                "--gameid",
+                self.game_id,
+                "--config",
+                config_path,
+                "--port",
+                str(port),
+            ]
+            start = time.time()
+            with open(log_path, "w") as log:
+                process = subprocess.Popen(cmd, stdout=log, stderr=log)
+                try:
+                    returncode = process.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+                    logging.warning(f"Generating world with seed {seed} timed out!")
+                    return False
+            if returncode != 0 or not os.path.exists(
+                os.path.join(world_dir, "map.sqlite"),
+            ):
+                logging.warning(
+                    f"Generating world with seed {seed} failed, see {log_path}",
+                )
+                return False
+            logging.info(
+                f"Generated world with seed {seed} in {time.time() - start:.1f}s",
+            )
+            self.add(seed, world_dir)
+            os.remove(log_path)
+            return True
+        finally:
+            shutil.rmtree(world_dir, ignore_errors=True)
+            if os.path.exists(config_path):
+                os.remove(config_path)
+
+
+def _copy_world(src: os.PathLike, dst: os.PathLike):
+    # the server writes to the map database,
+    # so files are copied (or reflinked if supported) and not hardlinked
+    if not os.path.isdir(src):
+        raise FileNotFoundError(src)
+    try:
+        subprocess.run(
+            ["cp", "-r", "--reflink=auto", src, dst],
+            check=True,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        # cp is not available or does not support reflinks
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst)
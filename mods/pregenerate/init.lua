@@ -0,0 +1,18 @@
+-- generates the map around the spawn position and shuts the server down,
+-- used to populate the world cache of the Python environment
+PREGENERATE_RADIUS = tonumber(minetest.settings:get("pregenerate_radius")) or 64
+
+minetest.after(0, function()
+    local spawn_y = minetest.get_spawn_level(0, 0) or 0
+    local offset = vector.new(PREGENERATE_RADIUS, PREGENERATE_RADIUS, PREGENERATE_RADIUS)
+    local center = vector.new(0, spawn_y, 0)
+    minetest.emerge_area(vector.subtract(center, offset), vector.add(center, offset),
+        function(blockpos, action, calls_remaining)
+            if calls_remaining == 0 then
+                minetest.log("action", "Pregenerated map around " ..
+                             minetest.pos_to_string(center))
+                minetest.request_shutdown()
+            end
+        end
+    )
+end)
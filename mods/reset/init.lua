@@ -0,0 +1,93 @@
+-- resets the episode of a player in place when the Minetest client
+-- receives a reset action, so that the processes can be kept alive
+RESET_MAP_RADIUS = tonumber(minetest.settings:get("reset_map_radius")) or 0
+
+local reset_callbacks = {}
+local spawn_states = {}
+-- players waiting for the acknowledgement of their reset, mapped to the
+-- number of server steps left until it is sent
+local pending_acks = {}
+
+-- register a function(player) that is called after a player was reset
+function register_on_episode_reset(func)
+    table.insert(reset_callbacks, func)
+end
+
+-- remember where and how the player started the first episode
+minetest.register_on_joinplayer(function(player)
+    spawn_states[player:get_player_name()] = {
+        pos = player:get_pos(),
+        yaw = player:get_look_horizontal(),
+        pitch = player:get_look_vertical(),
+    }
+end)
+
+minetest.register_on_leaveplayer(function(player)
+    spawn_states[player:get_player_name()] = nil
+    pending_acks[player:get_player_name()] = nil
+end)
+
+local function reset_player(player)
+    local playername = player:get_player_name()
+    local spawn = spawn_states[playername]
+    if spawn == nil then
+        return
+    end
+
+    -- regenerate the map around the spawn position
+    if RESET_MAP_RADIUS > 0 then
+        local offset = vector.new(RESET_MAP_RADIUS, RESET_MAP_RADIUS, RESET_MAP_RADIUS)
+        minetest.delete_area(vector.subtract(spawn.pos, offset),
+                             vector.add(spawn.pos, offset))
+    end
+
+    -- respawn the player
+    player:set_pos(spawn.pos)
+    player:set_look_horizontal(spawn.yaw)
+    player:set_look_vertical(spawn.pitch)
+    player:set_hp(player:get_properties().hp_max)
+    player:set_breath(player:get_properties().breath_max)
+
+    -- clear inventory
+    local inv = player:get_inventory()
+    for listname, _ in pairs(inv:get_lists()) do
+        inv:set_list(listname, {})
+    end
+
+    -- clear reward, terminal and info values of the server rewards mod
+    if REWARD ~= nil then
+        REWARD[playername] = 0.0
+        TERMINAL[playername] = false
+        INFO[playername] = ""
+    end
+
+    for _, func in ipairs(reset_callbacks) do
+        func(player)
+    end
+end
+
+local channel = minetest.mod_channel_join("minetester")
+minetest.register_on_modchannel_message(function(channel_name, sender, message)
+    if channel_name == "minetester" and message == "reset" then
+        local player = minetest.get_player_by_name(sender)
+        if player ~= nil then
+            reset_player(player)
+        end
+        -- the client waits for the acknowledgement even if nothing was reset
+        pending_acks[sender] = 2
+    end
+end)
+
+-- inventories are only sent at the end of a server step, after the globalstep
+-- callbacks, so acknowledge a reset one step later to make sure the client
+-- received the whole new state before it continues the episode
+minetest.register_globalstep(function(dtime)
+    for playername, steps in pairs(pending_acks) do
+        if steps <= 1 then
+            pending_acks[playername] = nil
+            channel:send_all("reset_done " .. playername)
+        else
+            pending_acks[playername] = steps - 1
+        end
+    end
+end)
@@ -11,6 +11,7 @@ headless = True
 do_prints = False
 render = False
 sync = False
+profile = True
 sync_args = dict(
     sync_port = 30010,
     sync_dtime = 0.05
@@ -21,6 +22,7 @@ env = Minetest(
     start_minetest=mt,
     headless=headless,
     start_xvfb=xvfb,
+    profile=profile,
     **(sync_args if sync else {})
 )
 
@@ -53,6 +55,12 @@ env.close()
 fps_np = np.array(fps_list)
 print(f"Runtime = {tot_time:.2f}s")
 print(f"Avg. FPS = {fps_np.mean():.2f}, Min. FPS = {fps_np.min():.2f}, Max. FPS = {fps_np.max():.2f}")
+if profile:
+    for phase, stats in env.get_profile().items():
+        print(
+            f"{phase:>18}: mean = {stats['mean'] * 1e3:.3f}ms,"
+            f" p50 = {stats['p50'] * 1e3:.3f}ms, p99 = {stats['p99'] * 1e3:.3f}ms"
+        )
 
 # Plot FPS over time
 plt.figure()
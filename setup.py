@@ -1,6 +1,7 @@
 from setuptools import setup, find_packages
 
 DEV = ["pre-commit", "black", "isort", "flake8", "pytest", "pytest-asyncio"]
+COMPRESSION = ["zstandard", "Pillow"]
 DOCS = [
     "sphinx==6.2.1",
     "sphinx_rtd_theme==1.2.2",
@@ -20,14 +21,15 @@ setup(
     python_requires=">=3.8.0",
     packages=find_packages(),
     install_requires=[
-        'gymnasium',
+        # the vector environment implements the 1.x autoreset API
+        'gymnasium>=1.0,<2',
         'numpy',
         'matplotlib',
         'zmq',
         'protobuf==3.20.1',
         'patchelf',
     ],
-    extras_require={"dev": DEV, "docs": DOCS},
+    extras_require={"dev": DEV, "docs": DOCS, "compression": COMPRESSION},
     package_data={
         'minetester': [
              'minetest/bin/minetest',
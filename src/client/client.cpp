@@ -31,6 +31,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "client/clientevent.h"
 #include "client/gameui.h"
 #include "client/renderingengine.h"
+#include "client/segmentation.h"
 #include "client/sound.h"
 #include "client/tile.h"
 #include "util/auth.h"
@@ -57,6 +58,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "serialization.h"
 #include "guiscalingfilter.h"
 #include "script/scripting_client.h"
+#include "script/common/c_converter.h"
 #include "game.h"
 #include "chatmessage.h"
 #include "translation.h"
@@ -65,6 +67,9 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 
 extern gui::IGUIEnvironment* guienv;
 
+// how long to wait for the server to acknowledge an episode reset
+#define RESET_ACK_TIMEOUT_MS 10000
+
 /*
 	Utility classes
 */
@@ -362,6 +367,9 @@ Client::~Client()
 	delete m_minimap;
 	m_minimap = nullptr;
 
+	if (m_capture_image)
+		m_capture_image->drop();
+
 	delete m_media_downloader;
 
 	// Write the changes and delete
@@ -917,25 +925,7 @@ void Client::ReceiveAll()
 					 << e.what() << std::endl;
 		}
 	}
-	/*
-	// Get current time
-	auto now = std::chrono::sytem_clock::now();
-
-	// Convert to a time_t object
-	auto now_c = std::chrono::system_clock::to_time_t(now);
-
-	// Convert to local time
-	std::tm* now_tm = std::localtime(&now_c);
-
-	// Get the remaining fractional seconds (nanoseconds)
-	auto nanos = std::chrono::duration_cast<std::chrono::nanoseconds>(now.time_since_epoch() % std::chrono::seconds(1)).count();
-
-	// Format the time as a string
-	std::stringstream ss;
-	ss << std::put_time(now_tm, "%Y-%m-%d %H:%M:%S") << "." << std::setfill('0') << std::setw(9) << nanos;
-	std::string timestamp = ss.str();
-	warningstream << "[Client] Processed " << packet_count << " packets |" << timestamp << std::endl;
-	*/
+	TRACESTREAM(<< "[Client] Processed " << packet_count << " packets" << std::endl);
 }
 
 inline void Client::handleCommand(NetworkPacket* pkt)
@@ -1920,37 +1910,26 @@ void Client::makeScreenshot()
 	raw_image->drop();
 }
 
-std::string Client::getInfo() {
+std::string Client::getInfo(InfoFields &fields) {
 	try {
 		ClientScripting *scr = getScript();
 		if (scr) {
 			lua_State *L = scr->getStack();
 			// read out global INFO variable
 			lua_getglobal(L, "INFO"); // push global OUT value to stack
-			// check if it is a string
-			if (!lua_isstring(L, lua_gettop(L)))
-        		errorstream << "`INFO' should be a string!" << std::endl;
-			// convert to string
-			size_t str_len = lua_objlen(L, lua_gettop(L));
-			std::string info(lua_tolstring(L, lua_gettop(L), &str_len));
-
-			// Get current time
-			auto now = std::chrono::system_clock::now();
-
-			// Convert to a time_t object
-			auto now_c = std::chrono::system_clock::to_time_t(now);
-
-			// Convert to local time
-			std::tm* now_tm = std::localtime(&now_c);
-
-			// Get the remaining fractional seconds (nanoseconds)
-			auto nanos = std::chrono::duration_cast<std::chrono::nanoseconds>(now.time_since_epoch() % std::chrono::seconds(1)).count();
-
-			// Format the time as a string
-			std::stringstream ss;
-			ss << std::put_time(now_tm, "%Y-%m-%d %H:%M:%S") << "." << std::setfill('0') << std::setw(9) << nanos;
-			std::string timestamp = ss.str();
-			warningstream << "[Client] Reading out INFO = " << info << "| " << timestamp <<  std::endl;
+			std::string info;
+			if (lua_istable(L, -1)) {
+				// structured info
+				read_info_fields(L, -1, fields);
+			} else if (lua_isstring(L, -1)) {
+				size_t str_len;
+				const char *str = lua_tolstring(L, -1, &str_len);
+				info.assign(str, str_len);
+			} else {
+				errorstream << "`INFO' should be a string or a table!" << std::endl;
+			}
+			TRACESTREAM(<< "[Client] Reading out INFO = " << info
+					<< " (" << fields.size() << " fields)" << std::endl);
 			lua_pop(L, 1); // remove INFO value from stack
 			// reset global INFO to nil
 			lua_pushstring(L, ""); // push an empty string to the stack
@@ -1977,24 +1956,7 @@ float Client::getReward() {
         		errorstream << "`REWARD' should be a number!" << std::endl;
 			// convert to number
 			reward = (float)lua_tonumber(L, lua_gettop(L));
-
-			// Get current time
-			auto now = std::chrono::system_clock::now();
-
-			// Convert to a time_t object
-			auto now_c = std::chrono::system_clock::to_time_t(now);
-
-			// Convert to local time
-			std::tm* now_tm = std::localtime(&now_c);
-
-			// Get the remaining fractional seconds (nanoseconds)
-			auto nanos = std::chrono::duration_cast<std::chrono::nanoseconds>(now.time_since_epoch() % std::chrono::seconds(1)).count();
-
-			// Format the time as a string
-			std::stringstream ss;
-			ss << std::put_time(now_tm, "%Y-%m-%d %H:%M:%S") << "." << std::setfill('0') << std::setw(9) << nanos;
-			std::string timestamp = ss.str();
-			warningstream << "[Client] Reading out REWARD = " << std::to_string(reward) << "| " << timestamp <<  std::endl;
+			TRACESTREAM(<< "[Client] Reading out REWARD = " << reward << std::endl);
 			lua_pop(L, 1); // remove REWARD value from stack
 			// reset global REWARD to zero
 			lua_pushnumber(L, 0.); // push zero to the stack
@@ -2030,39 +1992,304 @@ bool Client::getTerminal() {
     return terminal;
 }
 
-pb_objects::Image Client::getPixelData(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage) {
+void Client::resetEpisode() {
+	try {
+		ClientScripting *scr = getScript();
+		if (scr) {
+			lua_State *L = scr->getStack();
+			lua_pushnumber(L, 0.);
+			lua_setglobal(L, "REWARD");
+			lua_pushboolean(L, false);
+			lua_setglobal(L, "TERMINAL");
+			lua_pushstring(L, "");
+			lua_setglobal(L, "INFO");
+		}
+	} catch(LuaError &e) {
+		errorstream << "No reward mod active!" << std::endl;
+		setFatalError(e);
+	}
+	// the server side is handled by the `reset` server mod
+	if (sendModChannelMessage("minetester", "reset")) {
+		m_reset_pending = true;
+		m_reset_start_ms = porting::getTimeMs();
+	} else {
+		errorstream << "Unable to request episode reset, "
+				<< "is the `reset` server mod enabled?" << std::endl;
+	}
+}
+
+bool Client::isResetPending()
+{
+	// don't stall the episode forever if the acknowledgement got lost
+	if (m_reset_pending &&
+			porting::getTimeMs() > m_reset_start_ms + RESET_ACK_TIMEOUT_MS) {
+		warningstream << "Episode reset was not acknowledged by the server, "
+				<< "continuing anyway" << std::endl;
+		m_reset_pending = false;
+	}
+	return m_reset_pending;
+}
+
+void Client::setObservationFormat(v2u32 size, const core::recti &crop, bool grayscale)
+{
+	m_obs_size = size;
+	m_obs_crop = crop;
+	m_obs_grayscale = grayscale;
+}
+
+void Client::setObservationCodec(pb_objects::ImageCodec codec, s32 quality)
+{
+	m_obs_codec = codec;
+	m_obs_quality = quality;
+}
+
+void Client::encodeObservation(pb_objects::Image &pb_img)
+{
+	const pb_objects::ImageCodec codec = m_obs_codec;
+	if (codec == pb_objects::RAW)
+		return;
+
+	std::string *data = pb_img.mutable_data();
+	if (codec == pb_objects::ZLIB || codec == pb_objects::ZSTD) {
+		std::ostringstream os(std::ios_base::binary);
+		if (codec == pb_objects::ZLIB)
+			compressZlib((const u8 *)data->data(), data->size(), os, m_obs_quality);
+		else
+			compressZstd((const u8 *)data->data(), data->size(), os, std::max(m_obs_quality, 0));
+		*data = os.str();
+	} else {
+		video::IVideoDriver *driver = m_rendering_engine->get_video_driver();
+		video::IImage *image = driver->createImageFromData(video::ECF_R8G8B8,
+				core::dimension2du(pb_img.width(), pb_img.height()), &(*data)[0], true, false);
+		// encoded images are at most slightly larger than the raw pixels
+		std::string encoded(data->size() + data->size() / 8 + 4096, '\0');
+		io::IWriteFile *file = m_rendering_engine->get_filesystem()->createMemoryWriteFile(
+				&encoded[0], encoded.size(), codec == pb_objects::JPEG ? "obs.jpg" : "obs.png");
+		// the JPEG writer uses its default quality for 0
+		bool success = driver->writeImageToFile(image, file, std::max(m_obs_quality, 0));
+		encoded.resize(file->getPos());
+		file->drop();
+		image->drop();
+		if (!success) {
+			errorstream << "Failed to encode observation, sending raw pixels" << std::endl;
+			return;
+		}
+		*data = std::move(encoded);
+	}
+	pb_img.set_codec(codec);
+}
+
+// Crop and resize an R8G8B8 image by averaging the covered source pixels
+// and optionally convert it to grayscale
+static void processObservation(const u8 *src, u32 src_pitch, const core::recti &crop,
+		u32 out_w, u32 out_h, bool grayscale, std::string *out)
+{
+	const u32 channels = grayscale ? 1 : 3;
+	out->resize((size_t)out_w * out_h * channels);
+	u8 *dst = (u8 *)&(*out)[0];
+	const u64 crop_x = crop.UpperLeftCorner.X, crop_y = crop.UpperLeftCorner.Y;
+	const u64 crop_w = crop.getWidth(), crop_h = crop.getHeight();
+
+	// source columns covered by each output column
+	std::vector<u32> x0(out_w), x1(out_w);
+	for (u32 x = 0; x < out_w; ++x) {
+		x0[x] = crop_x + x * crop_w / out_w;
+		x1[x] = std::max<u32>(x0[x] + 1, crop_x + (x + 1) * crop_w / out_w);
+	}
+
+	for (u32 y = 0; y < out_h; ++y) {
+		const u32 y0 = crop_y + y * crop_h / out_h;
+		const u32 y1 = std::max<u32>(y0 + 1, crop_y + (y + 1) * crop_h / out_h);
+		for (u32 x = 0; x < out_w; ++x) {
+			u32 sum[3] = {0, 0, 0};
+			for (u32 sy = y0; sy < y1; ++sy) {
+				const u8 *pixel = src + sy * src_pitch + x0[x] * 3;
+				for (u32 sx = x0[x]; sx < x1[x]; ++sx, pixel += 3) {
+					sum[0] += pixel[0];
+					sum[1] += pixel[1];
+					sum[2] += pixel[2];
+				}
+			}
+			const u32 n = (y1 - y0) * (x1[x] - x0[x]);
+			if (grayscale) {
+				// ITU-R BT.601 luma
+				*dst++ = (77 * (u64)sum[0] + 150 * (u64)sum[1] + 29 * (u64)sum[2]) / (256 * (u64)n);
+			} else {
+				*dst++ = sum[0] / n;
+				*dst++ = sum[1] / n;
+				*dst++ = sum[2] / n;
+			}
+		}
+	}
+}
+
+void Client::captureFrame(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage,
+		pb_objects::Image &pb_img) {
 	irr::video::IVideoDriver *driver = m_rendering_engine->get_video_driver();
 
+	// the image may be reused from the previous frame
+	pb_img.set_in_shm(false);
+	pb_img.set_shm_slot(0);
+	pb_img.set_codec(pb_objects::RAW);
+
 	irr::video::IImage* raw_image;
 	if(m_rendering_engine->headless) {
-		raw_image = m_rendering_engine->get_screenshot();
+		// persistent frame of the rendering core, no copy
+		raw_image = m_rendering_engine->get_frame();
+		if (raw_image)
+			raw_image->grab();
 	} else {
 		raw_image = driver->createScreenShot();
 	}
 
-	if (!raw_image)
-		return pb_objects::Image();
+	if (!raw_image) {
+		pb_img.clear_data();
+		pb_img.set_width(0);
+		pb_img.set_height(0);
+		return;
+	}
 
-	irr::video::IImage* const image =
-			driver->createImage(video::ECF_R8G8B8, raw_image->getDimension());
-	raw_image->copyTo(image);
+	irr::video::IImage* image = raw_image;
+	if (raw_image->getColorFormat() != video::ECF_R8G8B8) {
+		// convert into a persistent image
+		if (!m_capture_image || m_capture_image->getDimension() != raw_image->getDimension()) {
+			if (m_capture_image)
+				m_capture_image->drop();
+			m_capture_image = driver->createImage(video::ECF_R8G8B8, raw_image->getDimension());
+		}
+		raw_image->copyTo(m_capture_image);
+		image = m_capture_image;
+	}
 
 	// if provided draw the cursor image at the current mouse position when GUI is open
+	// (the frame is redrawn before the next capture)
 	if (isMenuActive && cursorImage) {
+		// the cursor position is given in window coordinates
+		const v2u32 window_size = driver->getScreenSize();
+		const core::dimension2du frame_size = image->getDimension();
+		if (window_size.X > 0 && window_size.Y > 0 &&
+				(frame_size.Width != window_size.X || frame_size.Height != window_size.Y))
+			cursorPosition = core::position2di(
+					cursorPosition.X * (s32)frame_size.Width / (s32)window_size.X,
+					cursorPosition.Y * (s32)frame_size.Height / (s32)window_size.Y);
 		const core::recti sourceRect = core::recti(core::vector2di(0, 0), cursorImage->getDimension());
 		const irr::video::SColor color = irr::video::SColor(255, 255, 255, 255);
 		cursorImage->copyToWithAlpha(image, cursorPosition, sourceRect, color, nullptr, true);
 	}
 
 	auto dim = image->getDimension();
-	std::string imageData = std::string((char*)image->getData(), image->getImageDataSizeInBytes());
-	pb_objects::Image pb_img;
-	pb_img.set_data(imageData);
-	pb_img.set_width(dim.Width);
-	pb_img.set_height(dim.Height);
-	image->drop();
+	const core::recti window(0, 0, dim.Width, dim.Height);
+	const core::recti crop = getObservationCrop(v2u32(dim.Width, dim.Height));
+	const u32 width = m_obs_size.X > 0 ? m_obs_size.X : crop.getWidth();
+	const u32 height = m_obs_size.Y > 0 ? m_obs_size.Y : crop.getHeight();
+
+	if (crop == window && width == dim.Width && height == dim.Height && !m_obs_grayscale) {
+		// assign keeps the capacity of the buffer
+		pb_img.mutable_data()->assign((const char *)image->getData(),
+				image->getImageDataSizeInBytes());
+	} else {
+		processObservation((const u8 *)image->getData(), image->getPitch(), crop,
+				width, height, m_obs_grayscale, pb_img.mutable_data());
+	}
+	pb_img.set_width(width);
+	pb_img.set_height(height);
+	pb_img.set_channels(m_obs_grayscale ? 1 : 3);
 	raw_image->drop();
-	return pb_img;
+}
+
+void Client::storePoolFrame(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage) {
+	captureFrame(cursorPosition, isMenuActive, cursorImage, m_pool_frame);
+}
+
+void Client::getPixelData(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage,
+		pb_objects::Image &pb_img) {
+	captureFrame(cursorPosition, isMenuActive, cursorImage, pb_img);
+	// max-pool with the previously stored frame
+	std::string *data = pb_img.mutable_data();
+	const std::string &pool_frame = m_pool_frame.data();
+	if (!pool_frame.empty() && pool_frame.size() == data->size()) {
+		u8 *dst = (u8 *)&(*data)[0];
+		const u8 *src = (const u8 *)pool_frame.data();
+		for (size_t i = 0; i < data->size(); ++i)
+			dst[i] = std::max(dst[i], src[i]);
+	}
+	m_pool_frame.clear_data();
+	encodeObservation(pb_img);
+}
+
+core::recti Client::getObservationCrop(v2u32 frame_size) const
+{
+	const core::recti frame(0, 0, frame_size.X, frame_size.Y);
+	if (m_obs_crop.getArea() <= 0)
+		return frame;
+	core::recti crop = m_obs_crop;
+	const v2u32 window_size = m_rendering_engine->get_video_driver()->getScreenSize();
+	if (window_size.X > 0 && window_size.Y > 0 &&
+			(frame_size.X != window_size.X || frame_size.Y != window_size.Y)) {
+		crop.UpperLeftCorner.X = crop.UpperLeftCorner.X * (s32)frame_size.X / (s32)window_size.X;
+		crop.UpperLeftCorner.Y = crop.UpperLeftCorner.Y * (s32)frame_size.Y / (s32)window_size.Y;
+		crop.LowerRightCorner.X = crop.LowerRightCorner.X * (s32)frame_size.X / (s32)window_size.X;
+		crop.LowerRightCorner.Y = crop.LowerRightCorner.Y * (s32)frame_size.Y / (s32)window_size.Y;
+	}
+	crop.clipAgainst(frame);
+	return crop.getArea() > 0 ? crop : frame;
+}
+
+void Client::getDepthData(pb_objects::Image &pb_depth) {
+	pb_depth.set_codec(pb_objects::RAW);
+	pb_depth.set_channels(1);
+	v2u32 size;
+	const u16 *depth = m_rendering_engine->get_depth(size);
+	if (!depth) {
+		pb_depth.clear_data();
+		pb_depth.set_width(0);
+		pb_depth.set_height(0);
+		return;
+	}
+
+	const core::recti crop = getObservationCrop(size);
+	const u32 width = m_obs_size.X > 0 ? m_obs_size.X : crop.getWidth();
+	const u32 height = m_obs_size.Y > 0 ? m_obs_size.Y : crop.getHeight();
+
+	// nearest neighbour resampling, averaging depths across edges is meaningless
+	std::string *data = pb_depth.mutable_data();
+	data->resize(width * height * sizeof(u16));
+	u16 *dst = (u16 *)&(*data)[0];
+	const u32 crop_w = crop.getWidth(), crop_h = crop.getHeight();
+	for (u32 y = 0; y < height; ++y) {
+		const u16 *row = depth + (crop.UpperLeftCorner.Y + y * crop_h / height) * size.X
+				+ crop.UpperLeftCorner.X;
+		for (u32 x = 0; x < width; ++x)
+			*dst++ = row[x * crop_w / width];
+	}
+	pb_depth.set_width(width);
+	pb_depth.set_height(height);
+}
+
+void Client::getSegmentationData(pb_objects::Image &pb_seg) {
+	// the headless mode looks up the surfaces of its depth buffer,
+	// otherwise rays are cast in window coordinates
+	v2u32 view_size;
+	const f32 *depth = m_rendering_engine->get_scene_depth(view_size);
+	if (!depth)
+		view_size = m_rendering_engine->get_video_driver()->getScreenSize();
+	const core::recti crop = getObservationCrop(view_size);
+	// the default size of the segmentation matches the frames rendered
+	// at a fixed size
+	const v2u32 render_size = m_rendering_engine->render_size;
+	const core::recti frame_crop = render_size.X > 0 && render_size.Y > 0 ?
+			getObservationCrop(render_size) : crop;
+	const u32 width = m_obs_size.X > 0 ? m_obs_size.X : frame_crop.getWidth();
+	const u32 height = m_obs_size.Y > 0 ? m_obs_size.Y : frame_crop.getHeight();
+
+	// nodes are ignored beyond the viewing range like in the rendered map
+	const f32 range = g_settings->getS16("viewing_range");
+	renderSegmentation(this, crop, view_size, width, height, range, depth,
+			pb_seg.mutable_data());
+	pb_seg.set_codec(pb_objects::RAW);
+	pb_seg.set_channels(1);
+	pb_seg.set_width(width);
+	pb_seg.set_height(height);
 }
 
 RenderingEngine* Client::getRenderingEngine() {
@@ -38,6 +38,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "network/address.h"
 #include "network/peerhandler.h"
 #include "gameparams.h"
+#include "util/infofields.h"
 #include <fstream>
 #include "objects.pb.h"
 
@@ -413,9 +414,29 @@ class Client : public con::PeerHandler, public InventoryManager, public IGameDef
 
 	// Added methods
 	float getReward();
-	std::string getInfo();
+	// returns INFO if it is a string, tables are read into `fields` instead
+	std::string getInfo(InfoFields &fields);
 	bool getTerminal();
-	pb_objects::Image getPixelData(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage);
+	// reset reward variables and request an episode reset from the server
+	void resetEpisode();
+	// true until the server acknowledged the last episode reset
+	bool isResetPending();
+	// size, crop and color format of the images captured by getPixelData
+	void setObservationFormat(v2u32 size, const core::recti &crop, bool grayscale);
+	// compression of the images captured by getPixelData,
+	// quality is the JPEG quality or zlib/zstd level (-1 for the default)
+	void setObservationCodec(pb_objects::ImageCodec codec, s32 quality);
+	// capture the current frame into `pb_img`, reusing its pixel buffer
+	void getPixelData(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage,
+			pb_objects::Image &pb_img);
+	// capture the depth plane of the current frame into `pb_depth` with the
+	// size and crop of getPixelData, as little-endian u16 (1 = far plane)
+	void getDepthData(pb_objects::Image &pb_depth);
+	// capture the node content IDs of the current view into `pb_seg` with the
+	// size and crop of getPixelData as little-endian u16, see segmentation.h
+	void getSegmentationData(pb_objects::Image &pb_seg);
+	// store the current frame to max-pool it with the next one captured by getPixelData
+	void storePoolFrame(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage);
 	RenderingEngine* getRenderingEngine();
 
 	const Address getServerAddress();
@@ -490,6 +511,32 @@ class Client : public con::PeerHandler, public InventoryManager, public IGameDef
 	MtEventManager *m_event;
 	RenderingEngine *m_rendering_engine;
 
+	// Episode reset waiting for the acknowledgement of the `reset` server mod
+	bool m_reset_pending = false;
+	u64 m_reset_start_ms = 0;
+
+	// Observation format, zero size / empty crop means the full window
+	v2u32 m_obs_size = v2u32(0, 0);
+	core::recti m_obs_crop;
+	bool m_obs_grayscale = false;
+	pb_objects::ImageCodec m_obs_codec = pb_objects::RAW;
+	s32 m_obs_quality = -1;
+
+	// Frame that is max-pooled with the next observation
+	pb_objects::Image m_pool_frame;
+	// Frame converted to R8G8B8 if the screenshot has a different format
+	video::IImage *m_capture_image = nullptr;
+
+	// Screenshot cropped, resized and converted to the observation format
+	void captureFrame(core::position2di cursorPosition, bool isMenuActive, irr::video::IImage* cursorImage,
+			pb_objects::Image &pb_img);
+	// Observation crop in the coordinates of a frame of `frame_size`,
+	// the crop is given in window coordinates and scaled to the frame if
+	// the headless client renders at a fixed size
+	core::recti getObservationCrop(v2u32 frame_size) const;
+	// Compress the pixel data of an observation in place
+	void encodeObservation(pb_objects::Image &pb_img);
+
 
 	MeshUpdateThread m_mesh_update_thread;
 	ClientEnvironment m_env;
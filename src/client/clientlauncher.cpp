@@ -32,6 +32,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "fontengine.h"
 #include "clientlauncher.h"
 #include "version.h"
+#include "util/string.h"
 #include "renderingengine.h"
 #include "network/networkexceptions.h"
 
@@ -357,6 +358,45 @@ void ClientLauncher::init_args(GameStartData &start_data, const Settings &cmd_ar
 		start_data.sync_port = cmd_args.get("sync-port");
 
 	start_data.custom_dtime = cmd_args.exists("dtime") ? cmd_args.getFloat("dtime") : 0.f;
+
+	start_data.sync_local = dumb && cmd_args.getFlag("sync-local");
+
+	start_data.profile = dumb && cmd_args.getFlag("profile");
+
+	if (dumb && cmd_args.exists("shm-name"))
+		start_data.shm_name = cmd_args.get("shm-name");
+
+	if (dumb && cmd_args.exists("obs-width") && cmd_args.exists("obs-height"))
+		start_data.obs_size = v2u32(cmd_args.getU32("obs-width"), cmd_args.getU32("obs-height"));
+
+	if (dumb && cmd_args.exists("obs-crop")) {
+		std::vector<std::string> crop = str_split(cmd_args.get("obs-crop"), ',');
+		if (crop.size() == 4) {
+			s32 x = stoi(crop[0]), y = stoi(crop[1]);
+			start_data.obs_crop = core::recti(x, y, x + stoi(crop[2]), y + stoi(crop[3]));
+		} else {
+			errorstream << "Invalid --obs-crop, expected 'x,y,width,height'" << std::endl;
+		}
+	}
+
+	start_data.obs_grayscale = dumb && cmd_args.getFlag("obs-grayscale");
+
+	// the HUD keeps the window size, only the 3D scene is rendered at this size
+	if (start_data.headless && cmd_args.exists("render-width") &&
+			cmd_args.exists("render-height"))
+		start_data.render_size = v2u32(cmd_args.getU32("render-width"),
+				cmd_args.getU32("render-height"));
+
+	// the depth buffer is only read back from the render target of the headless mode
+	start_data.obs_depth = start_data.headless && cmd_args.getFlag("obs-depth");
+
+	start_data.obs_segmentation = dumb && cmd_args.getFlag("obs-segmentation");
+
+	if (dumb && cmd_args.exists("obs-codec"))
+		start_data.obs_codec = cmd_args.get("obs-codec");
+
+	if (dumb && cmd_args.exists("obs-quality"))
+		start_data.obs_quality = cmd_args.getS32("obs-quality");
 }
 
 bool ClientLauncher::init_engine()
@@ -26,18 +26,41 @@ void DumbClientInputHandler::step(float dtime) {
     // Block all input for the existing receivers
     m_receiver->m_input_blocked = true;
 
-    // Receive action
-    zmqpp::message actionMsg;
-    bool actionReceived = socket->receive(actionMsg);
-    if (!actionReceived)
+    // the client keeps stepping without input until the reset is done,
+    // no observation was sent that the next action could answer
+    if (waitingForReset)
         return;
 
-    // Parse action
-    pb_objects::Action action;
-    bool parsingSuccess = action.ParseFromArray(actionMsg.raw_data(0), actionMsg.size(0));
-    if (!parsingSuccess)
-        return;
+    if (repeatsLeft > 0) {
+        // repeat the held action instead of receiving a new one
+        --repeatsLeft;
+    } else {
+        // Receive action
+        zmqpp::message actionMsg;
+        bool actionReceived = socket->receive(actionMsg);
+        if (!actionReceived)
+            return;
+
+        // Parse action
+        bool parsingSuccess = heldAction.ParseFromArray(actionMsg.raw_data(0), actionMsg.size(0));
+        if (!parsingSuccess)
+            return;
+        if (heldAction.frameskip() > 1)
+            repeatsLeft = heldAction.frameskip() - 1;
+    }
+    const pb_objects::Action &action = heldAction;
 
+    if (action.reset()) {
+        // release all keys and let the game handle the reset
+        clearInput();
+        m_receiver->recordKeyIsDown.clear();
+        mousespeed = v2s32(0, 0);
+        lastKeysDown = 0;
+        lastKeysDownHigh = 0;
+        repeatsLeft = 0;
+        resetRequested = true;
+        return;
+    }
 
     // used to encode which mouse buttons are pressed
     u32 mouseButtonState = 0;
@@ -49,94 +72,34 @@ void DumbClientInputHandler::step(float dtime) {
     bool ctrlDown = keyIsDown["KEY_LCONTROL"];
 
     // Press keys and buttons
-    for (pb_objects::KeyboardEvent ev : action.keyevents()) {
-        bool isDown = ev.eventtype() == pb_objects::PRESS;
-        pb_objects::KeyType keyType = ev.key();
-        KeyPress keyCode;
-        if (extraKeys.find(keyType) != extraKeys.end()) {
-            keyCode = extraKeys[keyType];
-        } else {
-            GameKeyType gkey = static_cast<GameKeyType>(ev.key());
-            keyCode = keycache.key[gkey];
+    if (action.keyevents_size() > 0) {
+        for (const pb_objects::KeyboardEvent &ev : action.keyevents()) {
+            handleKey(ev.key(), ev.eventtype() == pb_objects::PRESS,
+                    isGuiOpen, shiftDown, ctrlDown, mouseButtonState);
         }
-
-        if (isGuiOpen) {
-            // Simulate key events for inventory and menus
-            if (keyType == pb_objects::KeyType::HOTBAR_NEXT || keyType == pb_objects::KeyType::HOTBAR_PREV) {
-                // Mouse wheel turned
-                SEvent e_mwheel;
-                e_mwheel.EventType = EET_MOUSE_INPUT_EVENT;
-                e_mwheel.MouseInput.Event = EMIE_MOUSE_WHEEL;
-                e_mwheel.MouseInput.Wheel = 1. ? keyType == pb_objects::KeyType::HOTBAR_NEXT: -1.;
-                e_mwheel.MouseInput.Shift = shiftDown;
-                e_mwheel.MouseInput.Control = ctrlDown;
-                simulateEvent(e_mwheel);
-            }
-        
-            SEvent e;
-            if (std::find(mouseButtons.begin(), mouseButtons.end(), keyType) != mouseButtons.end()) {
-                // Mouse button pressed
-                e.EventType = EET_MOUSE_INPUT_EVENT;
-                e.MouseInput.X = mousepos[0];
-                e.MouseInput.Y = mousepos[1];
-                if (keyType == pb_objects::DIG) {
-                    e.MouseInput.Event = isDown ? EMIE_LMOUSE_PRESSED_DOWN : EMIE_LMOUSE_LEFT_UP;
-                } else if(keyType == pb_objects::MIDDLE) {
-                    e.MouseInput.Event = isDown ? EMIE_MMOUSE_PRESSED_DOWN : EMIE_MMOUSE_LEFT_UP;
-                } else if (keyType == pb_objects::PLACE) {
-                    e.MouseInput.Event = isDown ? EMIE_RMOUSE_PRESSED_DOWN : EMIE_RMOUSE_LEFT_UP;
-                }
-                e.MouseInput.Shift = shiftDown;
-                e.MouseInput.Control = ctrlDown;
+    } else {
+        // Key bitmasks: only keys that are pressed now
+        // or were pressed by the previous action need to be handled
+        u64 keysDown = action.keysdown();
+        u32 keysDownHigh = action.keysdownhigh();
+        u64 changed = keysDown | lastKeysDown;
+        u32 changedHigh = keysDownHigh | lastKeysDownHigh;
+        for (int i = 0; i < pb_objects::INTERNAL_ENUM_COUNT; ++i) {
+            bool isDown;
+            if (i < 64) {
+                if (!((changed >> i) & 1))
+                    continue;
+                isDown = (keysDown >> i) & 1;
             } else {
-                // Key pressed
-                e.EventType = EET_KEY_INPUT_EVENT;
-                e.KeyInput.Key = keyCode.Key;
-                e.KeyInput.Char = keyCode.Char;
-                e.KeyInput.PressedDown = isDown;
-                e.KeyInput.Shift = shiftDown;
-                e.KeyInput.Control = ctrlDown;
+                if (!((changedHigh >> (i - 64)) & 1))
+                    continue;
+                isDown = (keysDownHigh >> (i - 64)) & 1;
             }
-            simulateEvent(e);
-    
-        } else {
-            // Update key/button state
-            if (std::find(mouseButtons.begin(), mouseButtons.end(), keyType) != mouseButtons.end()) {
-                KeyPress key = mouseButtonMap[keyType];
-                if(isDown) {
-                    keyIsDown.set(key);
-                    m_receiver->recordKeyIsDown.set(key);
-                    keyWasDown.set(key);
-                    keyWasPressed.set(key);
-                } else {
-                    keyIsDown.unset(key);
-                    m_receiver->recordKeyIsDown.unset(key);
-                    keyWasReleased.set(key);
-                }
-            } else {
-                if(isDown) {
-                    if (!keyIsDown[keyCode]) {
-                        keyWasPressed.set(keyCode);
-                    }
-                    keyIsDown.set(keyCode);
-                    m_receiver->recordKeyIsDown.set(keyCode);
-                    keyWasDown.set(keyCode);
-                } else {
-                    if (keyIsDown[keyCode])
-                        keyWasReleased.set(keyCode);
-                    keyIsDown.unset(keyCode);
-                    m_receiver->recordKeyIsDown.unset(keyCode);
-                }
-            }
-        }
-        // update mouse button state
-        if (keyType == pb_objects::DIG) {
-            mouseButtonState += 1 * keyIsDown[keyCode];
-        } else if (keyType == pb_objects::PLACE) {
-            mouseButtonState += 2 * keyIsDown[keyCode];
-        } else if (keyType == pb_objects::MIDDLE) {
-            mouseButtonState += 4 * keyIsDown[keyCode];
+            handleKey(static_cast<pb_objects::KeyType>(i), isDown,
+                    isGuiOpen, shiftDown, ctrlDown, mouseButtonState);
         }
+        lastKeysDown = keysDown;
+        lastKeysDownHigh = keysDownHigh;
     }
 
     // Update mouse position
@@ -180,3 +143,92 @@ void DumbClientInputHandler::step(float dtime) {
     // update GUI state
     wasGuiOpen = isGuiOpen;
 };
+
+void DumbClientInputHandler::handleKey(pb_objects::KeyType keyType, bool isDown,
+        bool isGuiOpen, bool shiftDown, bool ctrlDown, u32 &mouseButtonState) {
+    KeyPress keyCode;
+    if (extraKeys.find(keyType) != extraKeys.end()) {
+        keyCode = extraKeys[keyType];
+    } else {
+        GameKeyType gkey = static_cast<GameKeyType>(keyType);
+        keyCode = keycache.key[gkey];
+    }
+
+    if (isGuiOpen) {
+        // Simulate key events for inventory and menus
+        if (keyType == pb_objects::KeyType::HOTBAR_NEXT || keyType == pb_objects::KeyType::HOTBAR_PREV) {
+            // Mouse wheel turned
+            SEvent e_mwheel;
+            e_mwheel.EventType = EET_MOUSE_INPUT_EVENT;
+            e_mwheel.MouseInput.Event = EMIE_MOUSE_WHEEL;
+            e_mwheel.MouseInput.Wheel = 1. ? keyType == pb_objects::KeyType::HOTBAR_NEXT: -1.;
+            e_mwheel.MouseInput.Shift = shiftDown;
+            e_mwheel.MouseInput.Control = ctrlDown;
+            simulateEvent(e_mwheel);
+        }
+    
+        SEvent e;
+        if (std::find(mouseButtons.begin(), mouseButtons.end(), keyType) != mouseButtons.end()) {
+            // Mouse button pressed
+            e.EventType = EET_MOUSE_INPUT_EVENT;
+            e.MouseInput.X = mousepos[0];
+            e.MouseInput.Y = mousepos[1];
+            if (keyType == pb_objects::DIG) {
+                e.MouseInput.Event = isDown ? EMIE_LMOUSE_PRESSED_DOWN : EMIE_LMOUSE_LEFT_UP;
+            } else if(keyType == pb_objects::MIDDLE) {
+                e.MouseInput.Event = isDown ? EMIE_MMOUSE_PRESSED_DOWN : EMIE_MMOUSE_LEFT_UP;
+            } else if (keyType == pb_objects::PLACE) {
+                e.MouseInput.Event = isDown ? EMIE_RMOUSE_PRESSED_DOWN : EMIE_RMOUSE_LEFT_UP;
+            }
+            e.MouseInput.Shift = shiftDown;
+            e.MouseInput.Control = ctrlDown;
+        } else {
+            // Key pressed
+            e.EventType = EET_KEY_INPUT_EVENT;
+            e.KeyInput.Key = keyCode.Key;
+            e.KeyInput.Char = keyCode.Char;
+            e.KeyInput.PressedDown = isDown;
+            e.KeyInput.Shift = shiftDown;
+            e.KeyInput.Control = ctrlDown;
+        }
+        simulateEvent(e);
+
+    } else {
+        // Update key/button state
+        if (std::find(mouseButtons.begin(), mouseButtons.end(), keyType) != mouseButtons.end()) {
+            KeyPress key = mouseButtonMap[keyType];
+            if(isDown) {
+                keyIsDown.set(key);
+                m_receiver->recordKeyIsDown.set(key);
+                keyWasDown.set(key);
+                keyWasPressed.set(key);
+            } else {
+                keyIsDown.unset(key);
+                m_receiver->recordKeyIsDown.unset(key);
+                keyWasReleased.set(key);
+            }
+        } else {
+            if(isDown) {
+                if (!keyIsDown[keyCode]) {
+                    keyWasPressed.set(keyCode);
+                }
+                keyIsDown.set(keyCode);
+                m_receiver->recordKeyIsDown.set(keyCode);
+                keyWasDown.set(keyCode);
+            } else {
+                if (keyIsDown[keyCode])
+                    keyWasReleased.set(keyCode);
+                keyIsDown.unset(keyCode);
+                m_receiver->recordKeyIsDown.unset(keyCode);
+            }
+        }
+    }
+    // update mouse button state
+    if (keyType == pb_objects::DIG) {
+        mouseButtonState += 1 * keyIsDown[keyCode];
+    } else if (keyType == pb_objects::PLACE) {
+        mouseButtonState += 2 * keyIsDown[keyCode];
+    } else if (keyType == pb_objects::MIDDLE) {
+        mouseButtonState += 4 * keyIsDown[keyCode];
+    }
+}
@@ -44,10 +44,11 @@ class DumbClientInputHandler : public InputHandler
 		pb_objects::Action action;
 		action.set_mousedx(mousespeed[0]);
 		action.set_mousedy(mousespeed[1]);
+		// encode the pressed keys as bitmasks
+		u64 keysDown = 0;
+		u32 keysDownHigh = 0;
 		for (int i = pb_objects::KeyType::FORWARD; i !=  pb_objects::INTERNAL_ENUM_COUNT; ++i) {
-			pb_objects::KeyboardEvent* ev = action.add_keyevents();
 			pb_objects::KeyType keyType = static_cast<pb_objects::KeyType>(i);
-			ev->set_key(keyType);
 			KeyPress keyPress;
 			if (extraKeys.find(keyType) != extraKeys.end()) {
 				keyPress = extraKeys[keyType];
@@ -55,13 +56,15 @@ class DumbClientInputHandler : public InputHandler
 				GameKeyType gkey = static_cast<GameKeyType>(i);
 				keyPress = keycache.key[gkey];
 			}
-			bool isDown = m_receiver->recordKeyIsDown[keyPress];
-			if(isDown) {
-				ev->set_eventtype(pb_objects::PRESS);
-			} else {
-				ev->set_eventtype(pb_objects::RELEASE);
-			}
+			if (!m_receiver->recordKeyIsDown[keyPress])
+				continue;
+			if (i < 64)
+				keysDown |= (u64)1 << i;
+			else
+				keysDownHigh |= (u32)1 << (i - 64);
 		}
+		action.set_keysdown(keysDown);
+		action.set_keysdownhigh(keysDownHigh);
 		return action;
 	}
 
@@ -152,16 +155,52 @@ class DumbClientInputHandler : public InputHandler
 
 	virtual void step(float dtime);
 
+	// Whether the last received action is repeated in the next iteration(s)
+	bool isHoldingAction() const { return repeatsLeft > 0; }
+	// Number of remaining repetitions of the last received action
+	u32 getRepeatsLeft() const { return repeatsLeft; }
+	// Whether the last two frames of the held action should be max-pooled
+	bool isMaxPoolRequested() const { return heldAction.maxpool(); }
+	// Stop repeating the held action, e.g. at the end of an episode
+	void stopHoldingAction() { repeatsLeft = 0; }
+
+	// Whether the last received action requested an episode reset
+	bool consumeResetRequest()
+	{
+		bool b = resetRequested;
+		resetRequested = false;
+		return b;
+	}
+	// Don't receive actions while the server has not finished an episode reset
+	void setWaitingForReset(bool waiting) { waitingForReset = waiting; }
+
 	// ZMQ socket
 	zmqpp::socket *socket;
 
 private:
+	// Press or release a single key or mouse button
+	void handleKey(pb_objects::KeyType keyType, bool isDown, bool isGuiOpen,
+			bool shiftDown, bool ctrlDown, u32 &mouseButtonState);
+
 	// Event receiver to simulate events
 	MyEventReceiver *m_receiver = nullptr;
 
 	// Whether a GUI (inventory/menu) was open
 	bool wasGuiOpen = false;
 
+	// Whether an episode reset was requested
+	bool resetRequested = false;
+	// Whether the acknowledgement of an episode reset is still pending
+	bool waitingForReset = false;
+
+	// Last received action and how often it is repeated
+	pb_objects::Action heldAction;
+	u32 repeatsLeft = 0;
+
+	// Key bitmasks of the previous action
+	u64 lastKeysDown = 0;
+	u32 lastKeysDownHigh = 0;
+
 	// The state of the mouse wheel
 	s32 mouse_wheel = 0;
 
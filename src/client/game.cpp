@@ -19,6 +19,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 
 #include "game.h"
 
+#include <algorithm>
 #include <iomanip>
 #include <cmath>
 #include "client/renderingengine.h"
@@ -31,6 +32,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "client/keys.h"
 #include "client/joystick_controller.h"
 #include "client/recorder.h"
+#include "client/segmentation.h"
 #include "clientmap.h"
 #include "clouds.h"
 #include "config.h"
@@ -909,6 +911,17 @@ class Game {
 
 	// custom dtime
 	f32 custom_dtime = 0;
+	// in-game time of a step of the embedded server if it runs
+	// in lock step with the game loop
+	f32 local_sync_dtime = 0;
+	// whether to send the durations of the game loop phases
+	bool profile_loop = false;
+	// whether to send the depth plane with each observation
+	bool obs_depth = false;
+	// whether to send the segmentation with each observation,
+	// its labels are only sent with the first one
+	bool obs_segmentation = false;
+	bool segmentation_labels_sent = false;
 
 	IWritableTextureSource *texture_src = nullptr;
 	IWritableShaderSource *shader_src = nullptr;
@@ -1154,6 +1167,10 @@ bool Game::startup(bool *kill,
 
 	g_client_translations->clear();
 
+	// step the embedded server from the game loop instead of its own thread
+	if (start_data.isDumbClient() && start_data.sync_local && start_data.address.empty())
+		local_sync_dtime = start_data.sync_dtime > 0.f ? start_data.sync_dtime : 0.05f;
+
 	// address can change if simple_singleplayer_mode
 	if (!init(start_data.world_spec.path, start_data.address,
 			start_data.socket_port, start_data.game_spec))
@@ -1162,6 +1179,30 @@ bool Game::startup(bool *kill,
 	if (!createClient(start_data))
 		return false;
 
+	// used to request episode resets from the server
+	if (start_data.isDumbClient()) {
+		client->joinModChannel("minetester");
+		client->setObservationFormat(start_data.obs_size, start_data.obs_crop,
+				start_data.obs_grayscale);
+		std::string codec_name = start_data.obs_codec;
+		std::transform(codec_name.begin(), codec_name.end(), codec_name.begin(), ::toupper);
+		pb_objects::ImageCodec codec;
+		if (!pb_objects::ImageCodec_Parse(codec_name, &codec)) {
+			*error_message = "Unknown observation codec: " + start_data.obs_codec;
+			errorstream << *error_message << std::endl;
+			return false;
+		}
+		if (start_data.obs_grayscale &&
+				(codec == pb_objects::JPEG || codec == pb_objects::PNG)) {
+			// the image writers only support color images
+			*error_message = "Observation codec " + start_data.obs_codec +
+					" only supports RGB observations";
+			errorstream << *error_message << std::endl;
+			return false;
+		}
+		client->setObservationCodec(codec, start_data.obs_quality);
+	}
+
 	// create ZMQ objects
 	if(start_data.isDumbClient() || start_data.record) {
 		zmqpp::socket_type socket_type;
@@ -1198,6 +1239,9 @@ bool Game::startup(bool *kill,
 			// if we are just recording, we use PUB/SUB pattern
 			socket_type = zmqpp::socket_type::publish;
 			data_socket = new zmqpp::socket(context, socket_type);
+			// queue observations instead of dropping them while the
+			// subscriber is busy, frames would otherwise be missing in recordings
+			data_socket->set(zmqpp::socket_option::send_high_water_mark, 0);
 			std::string address = start_data.client_address;
 			warningstream << "Try to bind to: " << address << std::endl;
 			try {
@@ -1231,6 +1275,16 @@ bool Game::startup(bool *kill,
 			createRecorder(start_data);
 			recorder->sender = data_socket;
 		}
+		// send frames via shared memory
+		if (start_data.isDumbClient() && start_data.shm_name != "") {
+			try {
+				recorder->setSharedFrameBuffer(new SharedFrameBuffer(start_data.shm_name));
+			} catch (BaseException &e) {
+				errorstream << e.what() << std::endl;
+				*error_message = e.what();
+				return false;
+			}
+		}
 
 		// setup provided cursor image
 		if (start_data.cursor_image_path != "") {
@@ -1240,9 +1294,13 @@ bool Game::startup(bool *kill,
 
 		// set custom dtime
 		custom_dtime = start_data.custom_dtime;
+		profile_loop = start_data.profile;
+		obs_depth = start_data.obs_depth;
+		obs_segmentation = start_data.obs_segmentation;
 	}
 
-	m_rendering_engine->initialize(client, hud, start_data.isHeadless());
+	m_rendering_engine->initialize(client, hud, start_data.isHeadless(), obs_depth,
+			start_data.render_size, obs_segmentation);
 
 	return true;
 }
@@ -1275,6 +1333,16 @@ void Game::run()
 
 	bool firstIter = true;
 	bool disconnecting = false;
+	// rewards summed up while a dumb client repeats an action
+	float accumulatedReward = 0.f;
+	DumbClientInputHandler *dumbInput = input->isDumb() ?
+			static_cast<DumbClientInputHandler*>(input) : nullptr;
+	// durations of the game loop phases since the last observation
+	pb_objects::Timings timings;
+	auto elapsedUs = [](u64 start) {
+		return static_cast<u32>(porting::getTimeUs() - start);
+	};
+	u64 phaseStart = 0;
 	while (m_rendering_engine->run()
 			&& !(*kill || g_gamecallback->shutdown_requested
 			|| (server && server->isShutdownRequested()))) {
@@ -1283,10 +1351,14 @@ void Game::run()
 		float reward;
 		bool terminal;
 		std::string info;
+		InfoFields infoFields;
 		if (sync_socket != nullptr) {
+			phaseStart = porting::getTimeUs();
 			// send client is done signal to server
 			zmqpp::message syncDoneMsg;
 			syncDoneMsg << !disconnecting;
+			// the server gathers the messages of all players
+			syncDoneMsg << client->getEnv().getLocalPlayer()->getName();
 			sync_socket->send(syncDoneMsg);
 			// make sure to first tell the server that we are disconnecting
 			// before breaking out of the game loop
@@ -1302,28 +1374,89 @@ void Game::run()
 			reward = serverSyncMsg.get<float>(1);
 			terminal = serverSyncMsg.get<bool>(2);
 			info = serverSyncMsg.get<std::string>(3);
+			// key, type and value of each structured info field
+			for (size_t part = 4; part + 2 < serverSyncMsg.parts(); part += 3) {
+				InfoField field;
+				field.type = static_cast<InfoField::Type>(serverSyncMsg.get<u8>(part + 1));
+				if (field.type == InfoField::STRING || field.type == InfoField::BYTES)
+					field.str = serverSyncMsg.get(part + 2);
+				else
+					field.number = serverSyncMsg.get<f64>(part + 2);
+				infoFields[serverSyncMsg.get(part)] = field;
+			}
+			timings.set_sync_wait(timings.sync_wait() + elapsedUs(phaseStart));
 
 			//warningstream << "Received dtime = " << std::to_string(dtime) << std::endl;
+		} else if (local_sync_dtime > 0.f) {
+			// the embedded server advances by the same dtime in Game::step,
+			// so its values can be read directly
+			dtime = local_sync_dtime;
+			const std::string &playername = client->getEnv().getLocalPlayer()->getName();
+			reward = server->getReward(playername);
+			terminal = server->getTerminal(playername);
+			info = server->getInfo(playername, infoFields);
 		} else {
 			if (custom_dtime > 0.f)
 				dtime = custom_dtime;
-			info = client->getInfo();
+			info = client->getInfo(infoFields);
 			reward = client->getReward();
 			terminal = client->getTerminal();
 		}
 
+		// hold back observations while the dumb client repeats an action
+		// unless the episode ended
+		bool holdObservation = false;
+		if (dumbInput && dumbInput->isHoldingAction()) {
+			if (terminal)
+				dumbInput->stopHoldingAction();
+			else
+				holdObservation = true;
+		}
+
+		// don't send the state of the old episode while the server is still
+		// resetting the player, the reward of those steps is discarded too
+		bool resetPending = client->isResetPending();
+		if (dumbInput)
+			dumbInput->setWaitingForReset(resetPending);
+
 		// send data out
-		std::chrono::steady_clock::time_point begin = std::chrono::steady_clock::now();
-		if(recorder && !firstIter) {
-			pb_objects::Image pb_img = client->getPixelData(input->getMousePos(), isMenuActive(), cursorImage);
-			recorder->setInfo(info);
-			recorder->setImage(pb_img);
-			recorder->setReward(reward);
-			recorder->setTerminal(terminal);
-			recorder->sendObservation();
+		if(recorder && !firstIter && !resetPending) {
+			accumulatedReward += reward;
+			if (holdObservation) {
+				// keep the second to last frame for max-pooling
+				if (dumbInput->getRepeatsLeft() == 1 && dumbInput->isMaxPoolRequested())
+					client->storePoolFrame(input->getMousePos(), isMenuActive(), cursorImage);
+			} else {
+				phaseStart = porting::getTimeUs();
+				// capture directly into the outgoing observation
+				client->getPixelData(input->getMousePos(), isMenuActive(), cursorImage,
+						recorder->mutableImage());
+				if (obs_depth)
+					client->getDepthData(recorder->mutableDepth());
+				if (obs_segmentation) {
+					client->getSegmentationData(recorder->mutableSegmentation());
+					if (!segmentation_labels_sent) {
+						std::map<u16, std::string> labels;
+						getSegmentationLabels(client->getNodeDefManager(), labels);
+						recorder->setSegmentationLabels(labels);
+						segmentation_labels_sent = true;
+					}
+				}
+				timings.set_capture(timings.capture() + elapsedUs(phaseStart));
+				recorder->setInfo(info);
+				recorder->setInfoFields(infoFields);
+				recorder->setReward(accumulatedReward);
+				recorder->setTerminal(terminal);
+				if (profile_loop)
+					recorder->setTimings(timings);
+				phaseStart = porting::getTimeUs();
+				recorder->sendObservation();
+				// the send time is reported with the next observation
+				timings.Clear();
+				timings.set_send(elapsedUs(phaseStart));
+				accumulatedReward = 0.f;
+			}
 		}
-		std::chrono::steady_clock::time_point end = std::chrono::steady_clock::now();
-		//warningstream << "Time difference = " << std::chrono::duration_cast<std::chrono::microseconds>(end - begin).count() << "[µs]" << std::endl;
 
 
 		const irr::core::dimension2d<u32> &current_screen_size =
@@ -1342,7 +1475,7 @@ void Game::run()
 		// Calculate dtime =
 		//    m_rendering_engine->run() from this iteration
 		//  + Sleep time until the wanted FPS are reached
-		if (sync_socket == nullptr && custom_dtime <= 0.f)
+		if (sync_socket == nullptr && local_sync_dtime <= 0.f && custom_dtime <= 0.f)
 			draw_times.limit(device, &dtime);
 
 		// Prepare render data for next iteration
@@ -1364,7 +1497,13 @@ void Game::run()
 		updateProfilers(stats, draw_times, dtime);
 		//skip if there is a recorder and it's the first iteration
 		if(!recorder || !firstIter){
+			phaseStart = porting::getTimeUs();
 			processUserInput(dtime);
+			timings.set_input(timings.input() + elapsedUs(phaseStart));
+		}
+		if (input->isDumb() &&
+				static_cast<DumbClientInputHandler*>(input)->consumeResetRequest()) {
+			client->resetEpisode();
 		}
 		// record action
 		if(recorder && !firstIter) {
@@ -1392,14 +1531,18 @@ void Game::run()
 		}
 
 
+		phaseStart = porting::getTimeUs();
 		if (!m_is_paused)
 			step(dtime);
+		timings.set_step(timings.step() + elapsedUs(phaseStart));
 		processClientEvents(&cam_view_target);
 		updateDebugState();
 		updateCamera(dtime);
 		updateSound(dtime);
 		processPlayerInteraction(dtime, m_game_ui->m_flags.show_hud);
+		phaseStart = porting::getTimeUs();
 		updateFrame(&graph, &stats, dtime, cam_view);
+		timings.set_render(timings.render() + elapsedUs(phaseStart));
 		updateProfilerGraphs(&graph);
 
 		// Update if minimap has been disabled by the server
@@ -1560,7 +1703,7 @@ bool Game::createSingleplayerServer(const std::string &map_dir,
 	}
 
 	server = new Server(map_dir, gamespec, simple_singleplayer_mode, bind_addr,
-			false, nullptr, error_message, "", 0.0f);
+			false, nullptr, error_message, "", local_sync_dtime);
 	server->start();
 
 	return true;
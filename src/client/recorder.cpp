@@ -20,6 +20,10 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "client/recorder.h"
 #include "objects.pb.h"
 
+Recorder::~Recorder() {
+    delete frameBuffer;
+}
+
 void Recorder::setAction(pb_objects::Action & action) {
     actionToSend = action;
 }
@@ -36,20 +40,82 @@ void Recorder::setInfo(std::string & info) {
 	infoToSend = info;
 }
 
+void Recorder::setInfoFields(const InfoFields & fields) {
+	infoFieldsToSend = fields;
+}
+
+void Recorder::setSegmentationLabels(const std::map<u16, std::string> & labels) {
+	labelsToSend = labels;
+}
+
+void Recorder::setTimings(const pb_objects::Timings & timings) {
+	timingsToSend = timings;
+	sendTimings = true;
+}
+
 void Recorder::setTerminal(bool & terminal) {
     terminalToSend = terminal;
 }
 
+void Recorder::setSharedFrameBuffer(SharedFrameBuffer *buffer) {
+    delete frameBuffer;
+    frameBuffer = buffer;
+}
+
 // TODO: move OutputObservation creation outside the function
 void Recorder::sendObservation() {
+    if (frameBuffer && !imgToSend.data().empty() && imgToSend.codec() == pb_objects::RAW) {
+        // only send the slot index, the receiver reads the pixels from shared memory
+        s32 slot = frameBuffer->write(imgToSend.data().data(), imgToSend.data().size());
+        if (slot >= 0) {
+            imgToSend.clear_data();
+            imgToSend.set_in_shm(true);
+            imgToSend.set_shm_slot(slot);
+        }
+    }
     pb_objects::Observation obsToSend;
     obsToSend.set_reward(rewardToSend);
     obsToSend.set_info(infoToSend);
+    auto &pbInfoFields = *obsToSend.mutable_info_fields();
+    for (const auto &field : infoFieldsToSend) {
+        pb_objects::InfoValue &value = pbInfoFields[field.first];
+        switch (field.second.type) {
+        case InfoField::FLOAT:
+            value.set_float_value(field.second.number);
+            break;
+        case InfoField::INT:
+            value.set_int_value(static_cast<s64>(field.second.number));
+            break;
+        case InfoField::STRING:
+            value.set_string_value(field.second.str);
+            break;
+        case InfoField::BYTES:
+            value.set_bytes_value(field.second.str);
+            break;
+        case InfoField::BOOL:
+            value.set_bool_value(field.second.number != 0.0);
+            break;
+        }
+    }
     obsToSend.set_terminal(terminalToSend);
+    if (sendTimings)
+        *obsToSend.mutable_timings() = timingsToSend;
     obsToSend.set_allocated_image(&imgToSend);
     obsToSend.set_allocated_action(&actionToSend);
-    std::string msg = obsToSend.SerializeAsString();
+    if (sendDepth)
+        obsToSend.set_allocated_depth(&depthToSend);
+    if (sendSegmentation)
+        obsToSend.set_allocated_segmentation(&segmentationToSend);
+    auto &pbLabels = *obsToSend.mutable_segmentation_labels();
+    for (const auto &label : labelsToSend)
+        pbLabels[label.first] = label.second;
+    labelsToSend.clear();
+    obsToSend.SerializeToString(&sendBuffer);
     obsToSend.release_image();
     obsToSend.release_action();
-    sender->send(msg);
+    if (sendDepth)
+        obsToSend.release_depth();
+    if (sendSegmentation)
+        obsToSend.release_segmentation();
+    sender->send(sendBuffer);
 }
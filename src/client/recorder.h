@@ -21,19 +21,41 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 
 #include "client/inputhandler.h"
 #include "client/client.h"
+#include "client/shmbuffer.h"
 #include <zmqpp/zmqpp.hpp>
+#include <map>
 #include <string>
 
 class Recorder
 {
 public:
 	Recorder(){};
+	~Recorder();
 	void setAction(pb_objects::Action & action);
 	void setImage(pb_objects::Image & img);
+	// image of the next observation, can be written to directly
+	// to avoid copying the pixel data
+	pb_objects::Image &mutableImage() { return imgToSend; }
+	// depth plane of the next observation, only sent once it was accessed
+	pb_objects::Image &mutableDepth() { sendDepth = true; return depthToSend; }
+	// segmentation of the next observation, only sent once it was accessed
+	pb_objects::Image &mutableSegmentation()
+	{
+		sendSegmentation = true;
+		return segmentationToSend;
+	}
+	// labels of the segmentation IDs, only sent with the next observation
+	void setSegmentationLabels(const std::map<u16, std::string> & labels);
 	void setReward(float & reward);
 	void setInfo(std::string & info);
+	void setInfoFields(const InfoFields & fields);
 	void setTerminal(bool & terminal);
+	// timings are only sent once they were set
+	void setTimings(const pb_objects::Timings & timings);
     void sendObservation();
+	// frames are written to shared memory instead of the message
+	// (takes ownership of the buffer)
+	void setSharedFrameBuffer(SharedFrameBuffer *buffer);
 
     zmqpp::socket *sender = nullptr;
 
@@ -41,7 +63,18 @@ class Recorder
     zmqpp::context context;
 	pb_objects::Action actionToSend;
 	pb_objects::Image imgToSend;
+	pb_objects::Image depthToSend;
+	bool sendDepth = false;
+	pb_objects::Image segmentationToSend;
+	bool sendSegmentation = false;
+	std::map<u16, std::string> labelsToSend;
 	float rewardToSend;
 	bool terminalToSend;
 	std::string infoToSend;
+	InfoFields infoFieldsToSend;
+	pb_objects::Timings timingsToSend;
+	bool sendTimings = false;
+	// serialized observation, reused to avoid reallocations
+	std::string sendBuffer;
+	SharedFrameBuffer *frameBuffer = nullptr;
 };
@@ -21,8 +21,10 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "cmake_config.h"
 #include "core.h"
 #include "plain.h"
+#include "secondstage.h"
 #include "client/shadows/dynamicshadowsrender.h"
 #include "settings.h"
+#include <cstring>
 #include <iostream>
 #include "client/renderingengine.h"
 #include "client/client.h"
@@ -32,16 +34,52 @@ RenderingCore::RenderingCore(IrrlichtDevice *_device, Client *_client, Hud *_hud
 	: device(_device), client(_client), hud(_hud), shadow_renderer(_shadow_renderer), 
 	pipeline(_pipeline), virtual_size_scale(_virtual_size_scale)
 {
-	if (client->getRenderingEngine()->headless) {
+	RenderingEngine *engine = client->getRenderingEngine();
+	if (engine->headless) {
 		m_buffer = pipeline->createOwned<TextureBuffer>();
-		m_buffer->setTexture(0, v2f(1.0f, 1.0f), "idk_lol", video::ECF_R8G8B8);
+		// the frame follows the window size unless a render size is set
+		const v2u32 render_size = engine->render_size;
+		const bool fixed_size = render_size.X > 0 && render_size.Y > 0;
+		if (fixed_size)
+			m_buffer->setTexture(0, core::dimension2du(render_size.X, render_size.Y),
+					"idk_lol", video::ECF_R8G8B8);
+		else
+			m_buffer->setTexture(0, v2f(1.0f, 1.0f), "idk_lol", video::ECF_R8G8B8);
+		if ((engine->capture_depth || engine->capture_segmentation) &&
+				!g_settings->getBool("enable_shaders")) {
+			// without post-processing the 3D stage renders into this buffer,
+			// otherwise the depth texture of the post-processing buffer is read
+			video::IVideoDriver *driver = device->getVideoDriver();
+			video::ECOLOR_FORMAT depth_format = video::ECF_D16;
+			if (engine->capture_segmentation) {
+				// surface positions are reconstructed from the depth,
+				// 16 bits are too coarse for distant nodes
+				if (driver->queryTextureFormat(video::ECF_D32))
+					depth_format = video::ECF_D32;
+				else if (driver->queryTextureFormat(video::ECF_D24S8))
+					depth_format = video::ECF_D24S8;
+			} else if (!driver->queryTextureFormat(depth_format)) {
+				depth_format = video::ECF_D32;
+			}
+			if (fixed_size)
+				m_buffer->setTexture(1, core::dimension2du(render_size.X, render_size.Y),
+						DEPTH_TEXTURE_NAME, depth_format);
+			else
+				m_buffer->setTexture(1, v2f(1.0f, 1.0f), DEPTH_TEXTURE_NAME, depth_format);
+			m_buffer_output = new TextureBufferOutput(m_buffer, std::vector<u8> { 0 }, 1);
+		} else {
+			m_buffer_output = new TextureBufferOutput(m_buffer, 0);
+		}
 	}
 }
 
 RenderingCore::~RenderingCore()
 {
 	delete pipeline;
+	delete m_buffer_output;
 	delete shadow_renderer;
+	if (screenshot)
+		screenshot->drop();
 }
 
 void RenderingCore::initialize()
@@ -64,34 +102,120 @@ void RenderingCore::draw(video::SColor _skycolor, bool _show_hud, bool _show_min
 	context.show_hud = _show_hud;
 	context.show_minimap = _show_minimap;
 
-    if(client->getRenderingEngine()->headless) {
-		auto tex = new TextureBufferOutput(m_buffer, 0);
-		pipeline->setRenderTarget(tex);
+	if (client->getRenderingEngine()->headless) {
+		pipeline->setRenderTarget(m_buffer_output);
+		pipeline->reset(context);
+		// the output is not owned by the pipeline, reset it to clear every frame
+		m_buffer_output->reset(context);
+		pipeline->run(context);
+		// activating the output with a depth texture resizes the viewport
+		// to the frame, restore the window size for the next frame and the HUD
+		device->getVideoDriver()->OnResize(
+				core::dimension2du(screensize.X, screensize.Y));
+		readFrame();
+		RenderingEngine *engine = client->getRenderingEngine();
+		if (engine->capture_depth || engine->capture_segmentation)
+			readDepth();
+	} else {
 		pipeline->reset(context);
 		pipeline->run(context);
+	}
+}
 
-		auto t = tex->buffer->getTexture(0);
-		auto raw_image = device->getVideoDriver()->createImageFromData(
-			t->getColorFormat(),
-			screensize,
-			t->lock(irr::video::E_TEXTURE_LOCK_MODE::ETLM_READ_ONLY),
-			false  //copy mem
-			);
-		if(screenshot)
+void RenderingCore::readFrame()
+{
+	video::IVideoDriver *driver = device->getVideoDriver();
+	video::ITexture *t = m_buffer->getTexture(0);
+	if (!t)
+		return;
+	const core::dimension2du size = t->getSize();
+	// the frame is only reallocated if the window was resized
+	if (!screenshot || screenshot->getDimension() != size) {
+		if (screenshot)
 			screenshot->drop();
-		screenshot =
-				device->getVideoDriver()->createImage(video::ECF_R8G8B8,
-				screensize
-				);
-		raw_image->copyTo(screenshot);
-		t->unlock();
+		screenshot = driver->createImage(video::ECF_R8G8B8, size);
+	}
 
-		raw_image->drop();
-		delete tex;
+	void *data = t->lock(video::ETLM_READ_ONLY);
+	if (!data)
+		return;
+	if (t->getColorFormat() == video::ECF_R8G8B8 &&
+			t->getPitch() == screenshot->getPitch()) {
+		memcpy(screenshot->getData(), data, screenshot->getImageDataSizeInBytes());
 	} else {
-		pipeline->reset(context);
-		pipeline->run(context);
+		// wrap the texture data without copying it and convert its format
+		video::IImage *raw_image = driver->createImageFromData(
+				t->getColorFormat(), size, data, true, false);
+		raw_image->copyTo(screenshot);
+		raw_image->drop();
+	}
+	t->unlock();
+}
+
+void RenderingCore::readDepth()
+{
+	video::ITexture *t = device->getVideoDriver()->findTexture(DEPTH_TEXTURE_NAME);
+	void *data = t ? t->lock(video::ETLM_READ_ONLY) : nullptr;
+	if (!data) {
+		m_depth_size = v2u32(0, 0);
+		return;
+	}
+	const core::dimension2du size = t->getSize();
+	const video::ECOLOR_FORMAT format = t->getColorFormat();
+	if (format != video::ECF_D16 && format != video::ECF_D32 &&
+			format != video::ECF_D24S8) {
+		m_depth_size = v2u32(0, 0);
+		t->unlock();
+		return;
 	}
+	m_depth_size = v2u32(size.Width, size.Height);
+	RenderingEngine *engine = client->getRenderingEngine();
+	// only reallocated if the window was resized
+	if (engine->capture_depth)
+		m_depth.resize(size.Width * size.Height);
+	if (engine->capture_segmentation)
+		m_scene_depth.resize(size.Width * size.Height);
+	const u32 pitch = t->getPitch();
+	for (u32 y = 0; y < size.Height; ++y) {
+		const u8 *row = (const u8 *)data + y * pitch;
+		if (engine->capture_depth) {
+			u16 *dst = &m_depth[y * size.Width];
+			if (format == video::ECF_D16) {
+				memcpy(dst, row, size.Width * sizeof(u16));
+			} else {
+				// keep the 16 most significant bits,
+				// D24S8 stores the stencil in the lower 8 bits
+				for (u32 x = 0; x < size.Width; ++x)
+					dst[x] = ((const u32 *)row)[x] >> 16;
+			}
+		}
+		if (engine->capture_segmentation) {
+			f32 *dst = &m_scene_depth[y * size.Width];
+			if (format == video::ECF_D16) {
+				for (u32 x = 0; x < size.Width; ++x)
+					dst[x] = ((const u16 *)row)[x] / 65535.0f;
+			} else if (format == video::ECF_D24S8) {
+				for (u32 x = 0; x < size.Width; ++x)
+					dst[x] = (((const u32 *)row)[x] >> 8) / 16777215.0f;
+			} else {
+				for (u32 x = 0; x < size.Width; ++x)
+					dst[x] = (f32)(((const u32 *)row)[x] / 4294967295.0);
+			}
+		}
+	}
+	t->unlock();
+}
+
+const u16 *RenderingCore::get_depth(v2u32 &size) const
+{
+	size = m_depth_size;
+	return m_depth_size.X > 0 && !m_depth.empty() ? m_depth.data() : nullptr;
+}
+
+const f32 *RenderingCore::get_scene_depth(v2u32 &size) const
+{
+	size = m_depth_size;
+	return m_depth_size.X > 0 && !m_scene_depth.empty() ? m_scene_depth.data() : nullptr;
 }
 
 video::IImage *RenderingCore::get_screenshot() {
@@ -44,8 +44,21 @@ class RenderingCore
 	v2u32 virtual_size { 0, 0 };
 
 	virtual void createPipeline() {}
-	video::IImage *screenshot = nullptr;
+	// render target and frame of the headless mode, allocated once
+	// and reused for every frame
 	TextureBuffer* m_buffer = nullptr;
+	TextureBufferOutput *m_buffer_output = nullptr;
+	video::IImage *screenshot = nullptr;
+	// copy the rendered texture into `screenshot`
+	void readFrame();
+	// depth plane of the headless mode, normalized to the full u16 range
+	std::vector<u16> m_depth;
+	// full precision depth plane in [0, 1] for the segmentation
+	std::vector<f32> m_scene_depth;
+	v2u32 m_depth_size { 0, 0 };
+	// copy the depth texture of the 3D stage into `m_depth`
+	// and `m_scene_depth`
+	void readDepth();
 
 public:
 	RenderingCore(IrrlichtDevice *device, Client *client, Hud *hud, 
@@ -66,5 +79,15 @@ class RenderingCore
 	v2u32 getVirtualSize() const;
 
 	ShadowRenderer *get_shadow_renderer() { return shadow_renderer; };
+	// frame of the headless mode, owned by the rendering core
+	// and overwritten by the next draw
+	video::IImage *get_frame() { return screenshot; }
+	// copy of the frame of the headless mode, dropped by the caller
 	video::IImage *get_screenshot();
+	// depth plane of the headless mode (row-major, `size` pixels),
+	// nullptr if depth capture is disabled or failed
+	const u16 *get_depth(v2u32 &size) const;
+	// full precision depth plane of the headless mode in [0, 1],
+	// nullptr if the segmentation is disabled or the capture failed
+	const f32 *get_scene_depth(v2u32 &size) const;
 };
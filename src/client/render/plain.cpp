@@ -64,6 +64,24 @@ void DrawHUD::run(PipelineContext &context)
 	context.device->getGUIEnvironment()->drawAll();
 }
 
+void DrawHUDOverlay::run(PipelineContext &context)
+{
+	// transparent where no HUD element is drawn
+	context.device->getVideoDriver()->setRenderTarget(m_source->getTexture(0),
+			true, true, video::SColor(0, 0, 0, 0));
+	DrawHUD::run(context);
+}
+
+void BlendOverlayStep::run(PipelineContext &context)
+{
+	video::IVideoDriver *driver = context.device->getVideoDriver();
+	video::ITexture *overlay = m_source->getTexture(0);
+	const core::dimension2du size = driver->getCurrentRenderTargetSize();
+	driver->draw2DImage(overlay,
+			core::rect<s32>(0, 0, size.Width, size.Height),
+			core::rect<s32>(0, 0, overlay->getSize().Width, overlay->getSize().Height),
+			nullptr, nullptr, true);
+}
 
 void MapPostFxStep::setRenderTarget(RenderTarget * _target)
 {
@@ -141,18 +159,42 @@ RenderStep* addUpscaling(RenderPipeline *pipeline, RenderStep *previousStep, v2f
 
 void populatePlainPipeline(RenderPipeline *pipeline, Client *client)
 {
+	RenderingEngine *engine = client->getRenderingEngine();
 	auto downscale_factor = getDownscaleFactor();
+
+	// the headless mode may render at a fixed size independent of the window,
+	// the HUD is still laid out for the window and blended onto the frame
+	const bool fixed_size = engine->headless && engine->render_size.X > 0 &&
+			engine->render_size.Y > 0;
+	TextureBuffer *hud_buffer = nullptr;
+	if (fixed_size) {
+		const v2u32 window_size = engine->get_video_driver()->getScreenSize();
+		downscale_factor = v2f((f32)engine->render_size.X / window_size.X,
+				(f32)engine->render_size.Y / window_size.Y);
+		hud_buffer = pipeline->createOwned<TextureBuffer>();
+		hud_buffer->setTexture(0, v2f(1.0f), "hud_overlay", video::ECF_A8R8G8B8);
+		RenderStep *draw_hud = pipeline->addStep<DrawHUDOverlay>();
+		draw_hud->setRenderSource(hud_buffer);
+	}
+
 	auto step3D = pipeline->own(create3DStage(client, downscale_factor));
 	pipeline->addStep(step3D);
 	pipeline->addStep<MapPostFxStep>();
 
-	step3D = addUpscaling(pipeline, step3D, downscale_factor);
+	// the output of the headless mode already has the fixed size
+	if (!fixed_size)
+		step3D = addUpscaling(pipeline, step3D, downscale_factor);
 
-	if(client->getRenderingEngine()->headless) {
+	if(engine->headless) {
 		step3D->setRenderTarget(&pipeline->m_output);
-		pipeline->addStep(step3D);
 	} else {
 		step3D->setRenderTarget(pipeline->createOwned<ScreenTarget>());
 	}
-	pipeline->addStep<DrawHUD>();
+
+	if (fixed_size) {
+		RenderStep *blend_hud = pipeline->addStep<BlendOverlayStep>();
+		blend_hud->setRenderSource(hud_buffer);
+	} else {
+		pipeline->addStep<DrawHUD>();
+	}
 }
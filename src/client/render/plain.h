@@ -51,6 +51,36 @@ class DrawHUD : public RenderStep
 	virtual void run(PipelineContext &context) override;
 };
 
+/**
+ * Draws the HUD at window resolution into texture 0 of the source,
+ * which is cleared to transparent, to blend it onto a frame of another size
+ */
+class DrawHUDOverlay : public DrawHUD
+{
+public:
+	virtual void setRenderSource(RenderSource *source) override { m_source = source; }
+	virtual void run(PipelineContext &context) override;
+
+private:
+	RenderSource *m_source {nullptr};
+};
+
+/**
+ * Blends texture 0 of the source onto the active render target,
+ * scaled to the size of the target
+ */
+class BlendOverlayStep : public RenderStep
+{
+public:
+	virtual void setRenderSource(RenderSource *source) override { m_source = source; }
+	virtual void setRenderTarget(RenderTarget *) override {}
+	virtual void reset(PipelineContext &context) override {}
+	virtual void run(PipelineContext &context) override;
+
+private:
+	RenderSource *m_source {nullptr};
+};
+
 class MapPostFxStep : public TrivialRenderStep
 {
 public:
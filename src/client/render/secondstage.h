@@ -22,6 +22,9 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "stereo.h"
 #include "pipeline.h"
 
+// name of the depth texture of the 3D stage, read back for depth observations
+static const char DEPTH_TEXTURE_NAME[] = "3d_depthmap";
+
 /**
  *  Step to apply post-processing filter to the rendered image
  */
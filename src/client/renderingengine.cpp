@@ -197,6 +197,18 @@ irr::video::IImage *RenderingEngine::get_screenshot() {
 	return core->get_screenshot();
 }
 
+irr::video::IImage *RenderingEngine::get_frame() {
+	return core->get_frame();
+}
+
+const u16 *RenderingEngine::get_depth(v2u32 &size) {
+	return core->get_depth(size);
+}
+
+const f32 *RenderingEngine::get_scene_depth(v2u32 &size) {
+	return core->get_scene_depth(size);
+}
+
 bool RenderingEngine::setupTopLevelWindow(const std::string &name)
 {
 	// FIXME: It would make more sense for there to be a switch of some
@@ -552,9 +564,13 @@ std::vector<irr::video::E_DRIVER_TYPE> RenderingEngine::getSupportedVideoDrivers
 	return drivers;
 }
 
-void RenderingEngine::initialize(Client *client, Hud *hud, bool headless)
+void RenderingEngine::initialize(Client *client, Hud *hud, bool headless, bool capture_depth,
+		v2u32 render_size, bool capture_segmentation)
 {
 	this->headless = headless;
+	this->capture_depth = headless && capture_depth;
+	this->capture_segmentation = headless && capture_segmentation;
+	this->render_size = headless ? render_size : v2u32(0, 0);
 	const std::string &draw_mode = g_settings->get("3d_mode");
 	core.reset(createRenderingCore(draw_mode, m_device, client, hud));
 	core->initialize();
@@ -115,7 +115,8 @@ class RenderingEngine
 	void draw_scene(video::SColor skycolor, bool show_hud,
 			bool show_minimap, bool draw_wield_tool, bool draw_crosshair);
 
-	void initialize(Client *client, Hud *hud, bool headless);
+	void initialize(Client *client, Hud *hud, bool headless, bool capture_depth = false,
+			v2u32 render_size = v2u32(0, 0), bool capture_segmentation = false);
 	void finalize();
 
 	bool run()
@@ -132,7 +133,19 @@ class RenderingEngine
 	}
 	static std::vector<irr::video::E_DRIVER_TYPE> getSupportedVideoDrivers();
 	irr::video::IImage *get_screenshot();
+	// frame of the headless mode, not to be dropped by the caller
+	irr::video::IImage *get_frame();
+	// depth plane of the headless mode, nullptr if not captured
+	const u16 *get_depth(v2u32 &size);
+	// full precision depth plane of the headless mode, nullptr if not captured
+	const f32 *get_scene_depth(v2u32 &size);
 	bool headless;
+	// whether the headless mode reads back the depth buffer
+	bool capture_depth = false;
+	// whether the headless mode reads back the depth buffer for the segmentation
+	bool capture_segmentation = false;
+	// fixed size of the frames of the headless mode, (0, 0) for the window size
+	v2u32 render_size { 0, 0 };
 
 private:
 	v2u32 _getWindowSize() const;
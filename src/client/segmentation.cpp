@@ -0,0 +1,251 @@
+/*
+Minetest
+Copyright (C) 2010-2013 celeron55, Perttu Ahola <celeron55@gmail.com>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*/
+
+#include "client/segmentation.h"
+#include "client/camera.h"
+#include "client/client.h"
+#include "client/clientenvironment.h"
+#include "client/clientobject.h"
+#include "map.h"
+#include "nodedef.h"
+#include "raycast.h"
+#include "util/directiontables.h"
+#include "voxelalgorithms.h"
+#include <algorithm>
+#include <vector>
+
+// tolerance of the reconstructed surface positions
+#define SURFACE_TOLERANCE (0.05f * BS)
+
+namespace {
+
+struct SegmentationContext
+{
+	Map &map;
+	const NodeDefManager *nodedef;
+	// world position of the camera
+	v3f start;
+	f32 max_d;
+	// selection boxes of the visible objects in world coordinates
+	std::vector<aabb3f> objects;
+	// selection boxes of the current node, reused for all nodes
+	std::vector<aabb3f> boxes;
+};
+
+// Whether node `n` is drawn, store its selection boxes in world coordinates
+bool getNodeBoxes(SegmentationContext &ctx, MapNode n, v3s16 p)
+{
+	const content_t c = n.getContent();
+	if (c == CONTENT_AIR || c == CONTENT_IGNORE ||
+			ctx.nodedef->get(c).drawtype == NDT_AIRLIKE)
+		return false;
+	ctx.boxes.clear();
+	n.getSelectionBoxes(ctx.nodedef, &ctx.boxes, n.getNeighbors(p, &ctx.map));
+	const v3f center = intToFloat(p, BS);
+	for (aabb3f &box : ctx.boxes) {
+		box.MinEdge += center;
+		box.MaxEdge += center;
+	}
+	return true;
+}
+
+// ID of the first node or object on the ray in direction `dir`
+u16 castRay(SegmentationContext &ctx, const v3f &dir)
+{
+	const v3f line = dir * ctx.max_d;
+	v3f point;
+	v3s16 normal;
+
+	// nearest object on the ray
+	f32 object_d = ctx.max_d;
+	bool object_hit = false;
+	for (const aabb3f &box : ctx.objects) {
+		if (boxLineCollision(box, ctx.start, line, &point, &normal)) {
+			f32 d = (point - ctx.start).getLength();
+			if (d < object_d) {
+				object_d = d;
+				object_hit = true;
+			}
+		}
+	}
+
+	// first node on the ray whose selection boxes are hit
+	voxalgo::VoxelLineIterator iterator(ctx.start / BS, line / BS);
+	do {
+		const v3s16 &p = iterator.m_current_node_pos;
+		MapNode n = ctx.map.getNode(p);
+		// nothing is drawn beyond the loaded blocks
+		if (n.getContent() == CONTENT_IGNORE)
+			break;
+		if (getNodeBoxes(ctx, n, p)) {
+			f32 node_d = ctx.max_d;
+			for (const aabb3f &box : ctx.boxes) {
+				if (boxLineCollision(box, ctx.start, line, &point, &normal))
+					node_d = std::min(node_d, (point - ctx.start).getLength());
+			}
+			// the node is only visible in front of the nearest object
+			if (node_d < object_d)
+				return n.getContent();
+			if (object_hit && node_d < ctx.max_d)
+				break;
+		}
+		iterator.next();
+	} while (iterator.m_current_index <= iterator.m_last_index);
+	return object_hit ? SEGMENTATION_OBJECT : CONTENT_AIR;
+}
+
+// Look up the node or object at a rasterized surface position,
+// returns false if there is none
+bool lookupSurface(SegmentationContext &ctx, const v3f &point, const v3f &dir,
+		u16 &id)
+{
+	const aabb3f probe(point - SURFACE_TOLERANCE, point + SURFACE_TOLERANCE);
+	// the surface usually belongs to the node just behind it, parts of
+	// node boxes and meshes can reach into the neighbouring nodes though
+	const v3s16 behind = floatToInt(point + dir * SURFACE_TOLERANCE, BS);
+	for (u32 i = 0; i < 27; ++i) {
+		// g_27dirs ends with the node itself
+		const v3s16 p = behind + g_27dirs[(i + 26) % 27];
+		MapNode n = ctx.map.getNode(p);
+		if (!getNodeBoxes(ctx, n, p))
+			continue;
+		for (const aabb3f &box : ctx.boxes) {
+			if (box.intersectsWithBox(probe)) {
+				id = n.getContent();
+				return true;
+			}
+		}
+	}
+	for (const aabb3f &box : ctx.objects) {
+		if (box.intersectsWithBox(probe)) {
+			id = SEGMENTATION_OBJECT;
+			return true;
+		}
+	}
+	return false;
+}
+
+} // namespace
+
+void renderSegmentation(Client *client, const core::recti &crop,
+		v2u32 view_size, u32 width, u32 height, f32 range, const f32 *depth,
+		std::string *data)
+{
+	data->resize(width * height * sizeof(u16));
+	u16 *dst = (u16 *)&(*data)[0];
+
+	Camera *camera = client->getCamera();
+	if (!camera || view_size.X == 0 || view_size.Y == 0) {
+		std::fill(dst, dst + width * height, (u16)CONTENT_AIR);
+		return;
+	}
+
+	// ray directions span the far plane of the view frustum,
+	// which is relative to the camera offset like all scene nodes
+	scene::ICameraSceneNode *node = camera->getCameraNode();
+	const scene::SViewFrustum *frustum = node->getViewFrustum();
+	const v3f left_up = frustum->getFarLeftUp() - node->getAbsolutePosition();
+	const v3f right = frustum->getFarRightUp() - frustum->getFarLeftUp();
+	const v3f down = frustum->getFarLeftDown() - frustum->getFarLeftUp();
+
+	ClientEnvironment &env = client->getEnv();
+	SegmentationContext ctx { env.getMap(), client->getNodeDefManager(),
+			camera->getPosition(), range * BS, {}, {} };
+
+	// selection boxes of the visible objects, collected once per frame
+	std::vector<DistanceSortedActiveObject> nearby;
+	env.getActiveObjects(ctx.start, ctx.max_d, nearby);
+	for (const auto &nearby_object : nearby) {
+		ClientActiveObject *obj = nearby_object.obj;
+		aabb3f box;
+		if (obj->isLocalPlayer() || !obj->getSelectionBox(&box))
+			continue;
+		const v3f pos = obj->getPosition();
+		ctx.objects.emplace_back(box.MinEdge + pos, box.MaxEdge + pos);
+	}
+
+	const f32 crop_w = crop.getWidth(), crop_h = crop.getHeight();
+	if (!depth) {
+		// cast rays on a coarser grid and scale it to the requested size
+		const u32 grid_w = std::min(width, (u32)SEGMENTATION_MAX_RAYS);
+		const u32 grid_h = std::min(height, (u32)SEGMENTATION_MAX_RAYS);
+		std::vector<u16> grid(grid_w * grid_h);
+		for (u32 y = 0; y < grid_h; ++y) {
+			const f32 v = (crop.UpperLeftCorner.Y + (y + 0.5f) * crop_h / grid_h) / view_size.Y;
+			for (u32 x = 0; x < grid_w; ++x) {
+				const f32 u = (crop.UpperLeftCorner.X + (x + 0.5f) * crop_w / grid_w) / view_size.X;
+				v3f dir = left_up + right * u + down * v;
+				dir.normalize();
+				grid[y * grid_w + x] = castRay(ctx, dir);
+			}
+		}
+		for (u32 y = 0; y < height; ++y) {
+			const u16 *row = &grid[(y * grid_h / height) * grid_w];
+			for (u32 x = 0; x < width; ++x)
+				*dst++ = row[x * grid_w / width];
+		}
+		return;
+	}
+
+	// eye space depth of a depth buffer value, from the projection of the
+	// frame, OpenGL maps the normalized device depth [-1, 1] to [0, 1]
+	const core::matrix4 &projection = node->getProjectionMatrix();
+	const f32 far_value = node->getFarValue();
+	for (u32 y = 0; y < height; ++y) {
+		const f32 v = (crop.UpperLeftCorner.Y + (y + 0.5f) * crop_h / height) / view_size.Y;
+		const u32 depth_y = std::min((u32)(v * view_size.Y), view_size.Y - 1);
+		for (u32 x = 0; x < width; ++x) {
+			const f32 u = (crop.UpperLeftCorner.X + (x + 0.5f) * crop_w / width) / view_size.X;
+			const u32 depth_x = std::min((u32)(u * view_size.X), view_size.X - 1);
+			const f32 d = depth[depth_y * view_size.X + depth_x];
+			// nothing but the sky was drawn
+			if (d >= 1.0f) {
+				*dst++ = CONTENT_AIR;
+				continue;
+			}
+			const f32 z = projection[14] / (2.0f * d - 1.0f - projection[10]);
+			// the far plane is at `far_value` along the view direction
+			const v3f ray = left_up + right * u + down * v;
+			const v3f point = ctx.start + ray * (z / far_value);
+			v3f dir = ray;
+			dir.normalize();
+
+			u16 id;
+			if (!lookupSurface(ctx, point, dir, id)) {
+				// the wielded item is drawn in front of the map,
+				// anything else left is e.g. clouds or particles
+				id = z < BS ? castRay(ctx, dir) : CONTENT_AIR;
+			}
+			*dst++ = id;
+		}
+	}
+}
+
+void getSegmentationLabels(const NodeDefManager *nodedef,
+		std::map<u16, std::string> &labels)
+{
+	labels.clear();
+	for (u32 c = 0; c <= MAX_REGISTERED_CONTENT; ++c) {
+		const ContentFeatures &f = nodedef->get((content_t)c);
+		// unregistered IDs resolve to the features of CONTENT_UNKNOWN
+		if (!f.name.empty() && nodedef->getId(f.name) == c)
+			labels[c] = f.name;
+	}
+	labels[SEGMENTATION_OBJECT] = "object";
+}
@@ -0,0 +1,63 @@
+/*
+Minetest
+Copyright (C) 2010-2013 celeron55, Perttu Ahola <celeron55@gmail.com>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*/
+
+#pragma once
+
+#include "irrlichttypes_extrabloated.h"
+#include <map>
+#include <string>
+
+class Client;
+class NodeDefManager;
+
+/*
+	Per-pixel segmentation of the current view into node content IDs.
+
+	The headless mode reconstructs the surface position of every pixel from
+	the depth buffer of the rendered frame, so the IDs follow the rasterized
+	geometry. The position is looked up in the client's map and tested
+	against the selection boxes of the node there and of the active objects
+	(other players and entities). Only pixels that show no node or object,
+	e.g. the wielded item, cast a ray through the map.
+
+	Without a depth buffer a ray is cast for every pixel of a grid of at
+	most SEGMENTATION_MAX_RAYS x SEGMENTATION_MAX_RAYS, which is scaled to
+	the requested size. Rays test the selection boxes of the nodes they pass.
+
+	Pixels showing an active object get SEGMENTATION_OBJECT, pixels that
+	show no node within the range or the loaded blocks get CONTENT_AIR.
+*/
+
+// ID of pixels that show an active object
+#define SEGMENTATION_OBJECT 0xffffU
+
+// Maximum number of rays per dimension without a depth buffer
+#define SEGMENTATION_MAX_RAYS 128
+
+// Write the IDs of the pixels of the region `crop` of the rendered view
+// (`view_size` pixels), resampled to `width` x `height`, as little-endian
+// u16 into `data`. `depth` is the depth buffer of the view in [0, 1] or
+// nullptr. Nodes further than `range` nodes are ignored.
+void renderSegmentation(Client *client, const core::recti &crop,
+		v2u32 view_size, u32 width, u32 height, f32 range, const f32 *depth,
+		std::string *data);
+
+// Names of all registered content IDs and of SEGMENTATION_OBJECT
+void getSegmentationLabels(const NodeDefManager *nodedef,
+		std::map<u16, std::string> &labels);
@@ -0,0 +1,94 @@
+/*
+Minetest
+Copyright (C) 2010-2013 celeron55, Perttu Ahola <celeron55@gmail.com>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*/
+
+#include "client/shmbuffer.h"
+#include "exceptions.h"
+#include "log.h"
+#include <cerrno>
+#include <cstring>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+SharedFrameBuffer::SharedFrameBuffer(const std::string &name) :
+	m_name(name)
+{
+	// POSIX shared memory names start with a slash,
+	// Python's multiprocessing.shared_memory omits it
+	if (m_name.empty() || m_name[0] != '/')
+		m_name = "/" + m_name;
+
+	int fd = shm_open(m_name.c_str(), O_RDWR, 0);
+	if (fd < 0)
+		throw BaseException("Unable to open shared memory " + m_name +
+				": " + strerror(errno));
+
+	struct stat st;
+	if (fstat(fd, &st) != 0 || (size_t)st.st_size < HEADER_SIZE) {
+		close(fd);
+		throw BaseException("Invalid shared memory segment " + m_name);
+	}
+	m_size = st.st_size;
+
+	void *addr = mmap(nullptr, m_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+	// the mapping stays valid after closing the file descriptor
+	close(fd);
+	if (addr == MAP_FAILED)
+		throw BaseException("Unable to map shared memory " + m_name +
+				": " + strerror(errno));
+	m_data = static_cast<u8 *>(addr);
+
+	if (memcmp(m_data, "MTSH", 4) != 0) {
+		munmap(m_data, m_size);
+		throw BaseException("Shared memory " + m_name + " has an invalid header");
+	}
+	u64 slot_size;
+	memcpy(&m_num_slots, m_data + 4, sizeof(u32));
+	memcpy(&slot_size, m_data + 8, sizeof(u64));
+	m_slot_size = slot_size;
+
+	if (m_num_slots == 0 || HEADER_SIZE + m_num_slots * m_slot_size > m_size) {
+		munmap(m_data, m_size);
+		throw BaseException("Shared memory " + m_name + " is too small");
+	}
+
+	infostream << "Mapped shared frame buffer " << m_name << " with "
+			<< m_num_slots << " slots of " << m_slot_size << " bytes" << std::endl;
+}
+
+SharedFrameBuffer::~SharedFrameBuffer()
+{
+	// the segment is unlinked by its owner, we only unmap it
+	if (m_data)
+		munmap(m_data, m_size);
+}
+
+s32 SharedFrameBuffer::write(const void *data, size_t size)
+{
+	if (size > m_slot_size) {
+		errorstream << "Frame of " << size << " bytes does not fit into shared memory slot of "
+				<< m_slot_size << " bytes" << std::endl;
+		return -1;
+	}
+	u32 slot = m_next_slot;
+	memcpy(m_data + HEADER_SIZE + slot * m_slot_size, data, size);
+	m_next_slot = (m_next_slot + 1) % m_num_slots;
+	return slot;
+}
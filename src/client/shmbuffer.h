@@ -0,0 +1,61 @@
+/*
+Minetest
+Copyright (C) 2010-2013 celeron55, Perttu Ahola <celeron55@gmail.com>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*/
+
+#pragma once
+
+#include "irrlichttypes.h"
+#include <string>
+
+/*
+	Ring buffer of frames in POSIX shared memory.
+
+	The segment is created and owned by the Python environment
+	(see minetester/shm.py) which also writes the header:
+
+		char magic[4]    "MTSH"
+		u32  num_slots
+		u64  slot_size   in bytes
+		                 (padding up to HEADER_SIZE)
+		u8   slots[num_slots][slot_size]
+
+	The client only opens, maps and writes into the segment.
+*/
+class SharedFrameBuffer
+{
+public:
+	static constexpr size_t HEADER_SIZE = 64;
+
+	SharedFrameBuffer(const std::string &name);
+	~SharedFrameBuffer();
+
+	// Copy a frame into the next slot of the ring buffer.
+	// Returns the index of the written slot or -1 if the frame does not fit.
+	s32 write(const void *data, size_t size);
+
+	u32 getNumSlots() const { return m_num_slots; }
+	size_t getSlotSize() const { return m_slot_size; }
+
+private:
+	std::string m_name;
+	u8 *m_data = nullptr;
+	size_t m_size = 0;
+	u32 m_num_slots = 0;
+	size_t m_slot_size = 0;
+	u32 m_next_slot = 0;
+};
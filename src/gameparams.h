@@ -20,6 +20,8 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #pragma once
 
 #include "irrlichttypes.h"
+#include "irr_v2d.h"
+#include <rect.h>
 #include "content/subgames.h"
 
 // Information provided from "main"
@@ -30,7 +32,7 @@ struct GameParams
 	u16 socket_port;
 	std::string world_path;
 	std::string sync_port = "";
-	float sync_dtime;
+	float sync_dtime = 0.0f;
 	SubgameSpec game_spec;
 	bool is_dedicated_server;
 };
@@ -64,6 +66,27 @@ struct GameStartData : GameParams
 	bool headless;
 	std::string cursor_image_path;
 	f32 custom_dtime;
+	// run the server inside the dumb client and step it in lock step
+	// with the game loop instead of synchronizing via the sync port
+	bool sync_local = false;
+	// send game loop phase durations with each observation
+	bool profile = false;
+	std::string shm_name = "";
+	// observation size, crop and color format of dumb clients,
+	// zero size / empty crop means the full window
+	v2u32 obs_size = v2u32(0, 0);
+	core::recti obs_crop;
+	bool obs_grayscale = false;
+	// fixed size of the frames rendered by headless clients,
+	// zero size means the window size
+	v2u32 render_size = v2u32(0, 0);
+	// send the depth plane of headless dumb clients with each observation
+	bool obs_depth = false;
+	// send the node content IDs of each pixel with each observation
+	bool obs_segmentation = false;
+	// observation compression, quality -1 selects the codec's default
+	std::string obs_codec = "raw";
+	s32 obs_quality = -1;
 
 	ELoginRegister allow_login_or_register = ELoginRegister::Any;
 
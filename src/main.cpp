@@ -400,8 +400,34 @@ static void set_allowed_options(OptionList *allowed_options)
 			_("Internal port used for syncing server and dumb clients."))));
 	allowed_options->insert(std::make_pair("sync-dtime", ValueSpec(VALUETYPE_STRING,
 			_("Ingame time difference between steps when using server-client synchronization."))));
+	allowed_options->insert(std::make_pair("sync-local", ValueSpec(VALUETYPE_FLAG,
+			_("Step the singleplayer server of a dumb client in lock step with the client."))));
 	allowed_options->insert(std::make_pair("dtime", ValueSpec(VALUETYPE_STRING,
 			_("Ingame time difference between steps."))));
+	allowed_options->insert(std::make_pair("profile", ValueSpec(VALUETYPE_FLAG,
+			_("Send the durations of the game loop phases with each observation (dumb client only)."))));
+	allowed_options->insert(std::make_pair("shm-name", ValueSpec(VALUETYPE_STRING,
+			_("Name of a shared memory frame buffer used to send observations (dumb client only)."))));
+	allowed_options->insert(std::make_pair("obs-width", ValueSpec(VALUETYPE_STRING,
+			_("Width of the observations sent by dumb clients (default: window width)."))));
+	allowed_options->insert(std::make_pair("obs-height", ValueSpec(VALUETYPE_STRING,
+			_("Height of the observations sent by dumb clients (default: window height)."))));
+	allowed_options->insert(std::make_pair("obs-crop", ValueSpec(VALUETYPE_STRING,
+			_("Region 'x,y,width,height' of the window that is sent as observation (dumb client only)."))));
+	allowed_options->insert(std::make_pair("obs-grayscale", ValueSpec(VALUETYPE_FLAG,
+			_("Send grayscale instead of RGB observations (dumb client only)."))));
+	allowed_options->insert(std::make_pair("render-width", ValueSpec(VALUETYPE_STRING,
+			_("Width the headless client renders the 3D scene at (default: window width)."))));
+	allowed_options->insert(std::make_pair("render-height", ValueSpec(VALUETYPE_STRING,
+			_("Height the headless client renders the 3D scene at (default: window height)."))));
+	allowed_options->insert(std::make_pair("obs-depth", ValueSpec(VALUETYPE_FLAG,
+			_("Send the depth buffer with each observation (headless dumb client only)."))));
+	allowed_options->insert(std::make_pair("obs-segmentation", ValueSpec(VALUETYPE_FLAG,
+			_("Send the node content ID of each pixel with each observation (dumb client only)."))));
+	allowed_options->insert(std::make_pair("obs-codec", ValueSpec(VALUETYPE_STRING,
+			_("Compression of the observations sent by dumb clients: raw, zlib, zstd, jpeg or png."))));
+	allowed_options->insert(std::make_pair("obs-quality", ValueSpec(VALUETYPE_STRING,
+			_("JPEG quality (1-100) or zlib/zstd compression level of the observations."))));
 
 
 
@@ -710,12 +736,10 @@ static bool game_configure(GameParams *game_params, const Settings &cmd_args)
 
 static void game_configure_port(GameParams *game_params, const Settings &cmd_args)
 {
-	if (cmd_args.exists("sync-port")) {
+	if (cmd_args.exists("sync-port"))
 		game_params->sync_port = cmd_args.get("sync-port");
-		if (cmd_args.exists("sync-dtime")) {
-			game_params->sync_dtime = cmd_args.getFloat("sync-dtime");
-		}
-	}
+	if (cmd_args.exists("sync-dtime"))
+		game_params->sync_dtime = cmd_args.getFloat("sync-dtime");
 	if (cmd_args.exists("port")) {
 		game_params->socket_port = cmd_args.getU16("port");
 	} else {
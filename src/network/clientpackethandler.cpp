@@ -1658,6 +1658,11 @@ void Client::handleCommand_ModChannelMsg(NetworkPacket *pkt)
 		return;
 	}
 
+	// acknowledgement of an episode reset by the `reset` server mod
+	if (channel_name == "minetester" &&
+			channel_msg == std::string("reset_done ") + m_env.getLocalPlayer()->getName())
+		m_reset_pending = false;
+
 	m_script->on_modchannel_message(channel_name, sender, channel_msg);
 }
 
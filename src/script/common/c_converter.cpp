@@ -420,6 +420,78 @@ size_t read_stringlist(lua_State *L, int index, std::vector<std::string> *result
 	return num_strings;
 }
 
+static bool is_valid_utf8(const std::string &str)
+{
+	size_t i = 0;
+	while (i < str.size()) {
+		u8 c = str[i];
+		size_t len = c < 0x80 ? 1 : (c >> 5) == 0x06 ? 2 :
+				(c >> 4) == 0x0E ? 3 : (c >> 3) == 0x1E ? 4 : 0;
+		if (len == 0 || i + len > str.size())
+			return false;
+		for (size_t j = 1; j < len; j++) {
+			if ((u8(str[i + j]) & 0xC0) != 0x80)
+				return false;
+		}
+		i += len;
+	}
+	return true;
+}
+
+void read_info_fields(lua_State *L, int index, InfoFields &fields,
+		const std::string &prefix)
+{
+	if (index < 0)
+		index = lua_gettop(L) + 1 + index;
+	if (!lua_istable(L, index))
+		return;
+
+	lua_pushnil(L);
+	while (lua_next(L, index)) {
+		// convert a copy of the key, lua_next needs the original
+		lua_pushvalue(L, -2);
+		const char *name = lua_tostring(L, -1);
+		std::string key = name ? prefix + name : "";
+		lua_pop(L, 1);
+		if (key.empty()) {
+			lua_pop(L, 1);
+			continue;
+		}
+
+		InfoField field;
+		switch (lua_type(L, -1)) {
+		case LUA_TNUMBER:
+			field.number = lua_tonumber(L, -1);
+			// numbers without fractional part are sent as integers
+			field.type = std::floor(field.number) == field.number &&
+					std::fabs(field.number) < 9007199254740992.0 ?
+					InfoField::INT : InfoField::FLOAT;
+			fields[key] = field;
+			break;
+		case LUA_TBOOLEAN:
+			field.type = InfoField::BOOL;
+			field.number = lua_toboolean(L, -1) ? 1.0 : 0.0;
+			fields[key] = field;
+			break;
+		case LUA_TSTRING: {
+			size_t len;
+			const char *str = lua_tolstring(L, -1, &len);
+			field.str.assign(str, len);
+			field.type = is_valid_utf8(field.str) ?
+					InfoField::STRING : InfoField::BYTES;
+			fields[key] = field;
+			break;
+		}
+		case LUA_TTABLE:
+			read_info_fields(L, -1, fields, key + ".");
+			break;
+		default:
+			break;
+		}
+		lua_pop(L, 1);
+	}
+}
+
 /*
 	Table field getters
 */
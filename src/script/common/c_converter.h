@@ -31,6 +31,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 
 #include "irrlichttypes_bloated.h"
 #include "common/c_types.h"
+#include "util/infofields.h"
 
 extern "C" {
 #include <lua.h>
@@ -103,6 +104,11 @@ bool                is_color_table      (lua_State *L, int index);
 aabb3f              read_aabb3f         (lua_State *L, int index, f32 scale);
 v3s16               read_v3s16          (lua_State *L, int index);
 std::vector<aabb3f> read_aabb3f_vector  (lua_State *L, int index, f32 scale);
+// Reads the numbers, strings and booleans of a table into info fields,
+// keys of nested tables are prefixed with the key of the table and a dot
+void                read_info_fields    (lua_State *L, int index,
+                                         InfoFields &fields,
+                                         const std::string &prefix = "");
 size_t              read_stringlist     (lua_State *L, int index,
                                          std::vector<std::string> *result);
 
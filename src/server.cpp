@@ -257,8 +257,8 @@ Server::Server(
 	m_sync_dtime(sync_dtime),
 	m_sync_port(sync_port)
 {
-
-	if (m_sync_port == "") {
+	m_synchronized = !m_sync_port.empty() || m_sync_dtime > 0.0f;
+	if (!m_synchronized) {
 		m_thread = new ServerThread(this);
 	}
 	if (m_path_world.empty())
@@ -570,15 +570,17 @@ void Server::stop()
 	infostream<<"Server: Stopping and waiting threads"<<std::endl;
 
 	// Stop threads (set run=false first so both start stopping)
-	m_thread->stop();
-	m_thread->wait();
+	if (m_thread) {
+		m_thread->stop();
+		m_thread->wait();
+	}
 
 	infostream<<"Server: Threads stopped"<<std::endl;
 }
 
 void Server::step(float dtime)
 {
-	if (m_sync_port == "") {
+	if (!m_synchronized) {
 		// Limit a bit
 		if (dtime > 2.0)
 			dtime = 2.0;
@@ -1072,33 +1074,82 @@ void Server::SyncRunStep(bool initial_step)
 
 	//warningstream << "Num connected clients " << m_clients.getClientIDs().size() << std::endl;
 	if (m_clients.getClientIDs().size() > 0 && sync_socket != nullptr) {
-		// Wait for client update TODO extend to multiple clients
-		zmqpp::message clientSyncMsg;
-		bool msgReceived = false;
-		try {
-			msgReceived = sync_socket->receive(clientSyncMsg);
-		} catch (zmqpp::zmq_internal_exception &e) {
-			warningstream << "ZeroMQ error: " << e.what() << "\n";
+		// Wait until all synchronized clients are done with their step
+		while (!allSyncClientsDone()) {
+			zmqpp::message clientSyncMsg;
+			bool msgReceived = false;
+			try {
+				msgReceived = sync_socket->receive(clientSyncMsg);
+			} catch (zmqpp::zmq_internal_exception &e) {
+				warningstream << "ZeroMQ error: " << e.what() << "\n";
+			}
+			// keep the gathered messages and try again in the next step
+			if (!msgReceived)
+				return;
+			// envelope of the REQ socket: identity, empty delimiter
+			std::string identity = clientSyncMsg.get(0);
+			bool clientConnected = clientSyncMsg.get<bool>(2);
+			// older clients do not send their name
+			std::string playername = clientSyncMsg.parts() > 3 ?
+					clientSyncMsg.get(3) : m_clients.getPlayerNames().at(0);
+			if (clientConnected) {
+				m_sync_clients.insert(playername);
+				m_sync_pending[playername] = identity;
+			} else {
+				m_sync_clients.erase(playername);
+				m_sync_pending.erase(playername);
+			}
 		}
-		if (!msgReceived)
-			return;
-		bool clientConnected;
-		clientSyncMsg >> clientConnected;
-		if (clientConnected) {
-			// Send custom dtime, reward and terminal values to client(s)
-			// TODO this thas to be adapted for multiplayer use!
-			std::string playername = m_clients.m_clients_names.at(0);
+
+		// Send custom dtime, reward and terminal values to each client
+		for (const auto &it : m_sync_pending) {
+			const std::string &playername = it.first;
 			float reward = getReward(playername);
 			bool terminal = getTerminal(playername);
-			std::string info = getInfo(playername);
+			InfoFields infoFields;
+			std::string info = getInfo(playername, infoFields);
 			zmqpp::message syncMsg;
+			syncMsg << it.second;
+			syncMsg << "";
 			syncMsg << m_sync_dtime;
 			syncMsg << reward;
 			syncMsg << terminal;
 			syncMsg << info;
+			// followed by key, type and value of each info field
+			for (const auto &field : infoFields) {
+				syncMsg << field.first;
+				syncMsg << static_cast<u8>(field.second.type);
+				if (field.second.type == InfoField::STRING ||
+						field.second.type == InfoField::BYTES)
+					syncMsg << field.second.str;
+				else
+					syncMsg << field.second.number;
+			}
 			sync_socket->send(syncMsg);
 		}
+		m_sync_pending.clear();
+	}
+}
+
+bool Server::allSyncClientsDone()
+{
+	// forget clients that left without saying goodbye
+	const std::vector<std::string> &names = m_clients.getPlayerNames();
+	for (auto it = m_sync_clients.begin(); it != m_sync_clients.end();) {
+		if (std::find(names.begin(), names.end(), *it) == names.end()) {
+			m_sync_pending.erase(*it);
+			it = m_sync_clients.erase(it);
+		} else {
+			++it;
+		}
+	}
+	if (m_sync_clients.empty())
+		return false;
+	for (const std::string &name : m_sync_clients) {
+		if (m_sync_pending.find(name) == m_sync_pending.end())
+			return false;
 	}
+	return true;
 }
 
 
@@ -1844,10 +1895,10 @@ void Server::handlePeerChanges()
 		{
 		case con::PEER_ADDED:
 			m_clients.CreateClient(c.peer_id);
-			// This socket is used to sync with the connected client
-			if (m_sync_port != "") {
+			// This socket is used to sync with all connected clients
+			if (m_sync_port != "" && sync_socket == nullptr) {
 				std::string sync_address = "tcp://" + m_bind_addr.serializeString() + ":" + m_sync_port;
-				zmqpp::socket_type socket_type = zmqpp::socket_type::reply;
+				zmqpp::socket_type socket_type = zmqpp::socket_type::router;
 				sync_socket = new zmqpp::socket(sync_context, socket_type);
 				sync_socket->set(zmqpp::socket_option::receive_timeout, 1000);
 				std::cout << "Try to bind to: " << sync_address << std::endl;
@@ -1861,13 +1912,8 @@ void Server::handlePeerChanges()
 			break;
 
 		case con::PEER_REMOVED:
+			// the sync socket is kept for the remaining and future clients
 			DeleteClient(c.peer_id, c.timeout?CDR_TIMEOUT:CDR_LEAVE);
-			if (sync_socket) {
-				// sync socket not anymore
-				sync_socket->close();
-				delete sync_socket;
-				sync_socket = nullptr;
-			}
 			break;
 
 		default:
@@ -4441,7 +4487,7 @@ void dedicated_server_loop(Server &server, bool &kill)
 	 * provides a way to main.cpp to kill the server externally (bool &kill).
 	 */
 
-	if (server.m_sync_port != "") {
+	if (server.isSynchronized()) {
 		try {
 			server.SyncRunStep(true);
 		} catch (con::ConnectionBindFailed &e) {
@@ -4699,19 +4745,29 @@ float Server::getReward(const std::string & playername) {
 }
 
 
-std::string Server::getInfo(const std::string & playername) {
+std::string Server::getInfo(const std::string & playername, InfoFields &fields) {
 	std::string info = "";
 	try {
 		if(m_script) {
 			lua_State *L = m_script->getStack();
 			// read out global INFO variable
 			lua_getglobal(L, "INFO"); // push global INFO value to stack
-			if (lua_istable(L, 1)) {
-				// get string of this player
-				getstringfield(L, 1, playername.c_str(), info);
+			int table = lua_gettop(L);
+			if (lua_istable(L, table)) {
+				lua_getfield(L, table, playername.c_str());
+				if (lua_istable(L, -1)) {
+					// structured info of this player
+					read_info_fields(L, -1, fields);
+				} else if (lua_isstring(L, -1)) {
+					// get string of this player
+					size_t len;
+					const char *str = lua_tolstring(L, -1, &len);
+					info.assign(str, len);
+				}
+				lua_pop(L, 1);
+				// reset info value to the empty string
+				setstringfield(L, table, playername.c_str(), "");
 			}
-			// reset info value to the empty string
-			setstringfield(L, 1, playername.c_str(), "");
 			lua_pop(L, 1); // remove INFO table from stack
 		}
 	} catch(LuaError &e) {
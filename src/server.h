@@ -35,6 +35,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include "util/thread.h"
 #include "util/basic_macros.h"
 #include "util/metricsbackend.h"
+#include "util/infofields.h"
 #include "serverenvironment.h"
 #include "clientiface.h"
 #include "chatmessage.h"
@@ -43,6 +44,7 @@ with this program; if not, write to the Free Software Foundation, Inc.,
 #include <list>
 #include <map>
 #include <vector>
+#include <set>
 #include <unordered_set>
 #include <zmqpp/zmqpp.hpp>
 
@@ -166,6 +168,9 @@ class Server : public con::PeerHandler, public MapEventReceiver,
 	void AsyncRunStep(bool initial_step=false);
 	// This is used in server-client-sync mode
 	void SyncRunStep(bool initial_step=false);
+	// Whether steps are driven by synchronized clients
+	// (via the sync port or by the game loop of an embedded server)
+	bool isSynchronized() const { return m_synchronized; }
 	void Receive();
 	PlayerSAO* StageTwoClientInit(session_t peer_id);
 
@@ -397,10 +402,17 @@ class Server : public con::PeerHandler, public MapEventReceiver,
 	zmqpp::context sync_context;
 	zmqpp::socket* sync_socket = nullptr;
 	std::string m_sync_port = "";
+	// Players synchronized via the sync socket and the routing identities
+	// of those that are done with the current step
+	std::set<std::string> m_sync_clients;
+	std::map<std::string, std::string> m_sync_pending;
+	bool allSyncClientsDone();
 
 	// RL framework
 	float getReward(const std::string & playername);
-	std::string getInfo(const std::string & playername);
+	// returns the player's INFO if it is a string,
+	// tables are read into `fields` instead
+	std::string getInfo(const std::string & playername, InfoFields &fields);
 	bool getTerminal(const std::string & playername);
 private:
 	friend class EmergeThread;
@@ -631,6 +643,7 @@ class Server : public con::PeerHandler, public MapEventReceiver,
 		Threads
 	*/
 	float m_sync_dtime = 0.0f;
+	bool m_synchronized = false;
 	// A buffer for time steps
 	// step() increments and AsyncRunStep() run by m_thread reads it.
 	float m_step_dtime = 0.0f;
@@ -0,0 +1,39 @@
+/*
+Minetest
+Copyright (C) 2010-2013 celeron55, Perttu Ahola <celeron55@gmail.com>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU Lesser General Public License as published by
+the Free Software Foundation; either version 2.1 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along
+with this program; if not, write to the Free Software Foundation, Inc.,
+51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*/
+
+#pragma once
+
+#include <map>
+#include <string>
+#include "irrlichttypes.h"
+
+// A typed field of the structured info that task mods set in `INFO`
+struct InfoField
+{
+	enum Type : u8 { FLOAT, INT, STRING, BYTES, BOOL };
+
+	Type type = FLOAT;
+	// value of FLOAT, INT and BOOL fields
+	f64 number = 0.0;
+	// value of STRING and BYTES fields
+	std::string str;
+};
+
+// Flat map of info fields, keys of nested tables are joined by dots
+typedef std::map<std::string, InfoField> InfoFields;